@@ -0,0 +1,352 @@
+import argparse
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Deque, Dict, Iterable, Iterator, Optional, Set, TextIO, Tuple, Union
+
+from Matrixcodes import Matrix, LazyModule, apply_operation
+from Matrixexpr import evaluate, parse, plan, references
+from Matrixserial import check_precision, serialize_result
+
+np = LazyModule('numpy', globals(), 'np')
+
+WINDOW_PER_WORKER = 4  # jobs in flight per worker process; bounds memory while streaming
+
+
+# -----------------------------
+# Job Parsing
+# -----------------------------
+class JobError(ValueError):
+    """
+    A line of a job file that could not be parsed; reported as that job's error.
+
+    Attributes:
+        id (Union[int, str]): The id the job would have had by default, "SOURCE:LINE".
+    """
+
+    def __init__(self, id: Union[int, str], message: str) -> None:
+        super().__init__(f'Line {id}: {message}')
+        self.id = id
+
+
+def parse_job(line: str, number: int, source: Optional[str] = None) -> Optional[Dict[str, Any]]:
+    """
+    Parse one line of a job file.
+
+    A line is either a JSON object or a script command:
+        load PATH [NAME ...]   load matrices from a matrix file into the workspace
+        save PATH              save the workspace to a matrix file
+        NAME = EXPRESSION      evaluate an expression and store the result
+        EXPRESSION             evaluate an expression and output the result
+
+    Args:
+        line: The line.
+        number: Its 1-based line number.
+        source: Name of the file the line comes from. A job without an id gets
+            "SOURCE:NUMBER", or the bare line number when there is no source.
+
+    Returns:
+        The job as a dictionary, or None for blank lines and # comments.
+
+    Raises:
+        ValueError: If the line cannot be parsed.
+    """
+    text = line.strip()
+    if not text or text.startswith('#'):
+        return None
+    if text.startswith('{'):
+        job = json.loads(text)
+        if not isinstance(job, dict):
+            raise ValueError('A job must be a JSON object')
+    else:
+        job = _parse_command(text)
+    job.setdefault('id', _line_id(number, source))
+    return job
+
+
+def _line_id(number: int, source: Optional[str]) -> Union[int, str]:
+    # Line numbers repeat across files, so default ids name the file too
+    return number if source is None else f'{source}:{number}'
+
+
+def _parse_command(text: str) -> Dict[str, Any]:
+    word, _, rest = text.partition(' ')
+    if word in ('load', 'save'):
+        args = rest.split()
+        if not args:
+            raise ValueError(f'{word} needs a file name')
+        job = {word: args[0]}
+        if word == 'load' and len(args) > 1:
+            job['names'] = args[1:]
+        return job
+    name, equals, expression = text.partition('=')
+    if equals and name.strip().isidentifier():
+        return {'expression': expression.strip(), 'store': name.strip()}
+    return {'expression': text}
+
+
+def _spec_matrix(spec: Any, workspace: Dict[str, Matrix]) -> Matrix:
+    # The same operand forms as the web API: {"ref": name}, {"array": rows} or inline rows
+    if isinstance(spec, dict) and 'ref' in spec:
+        if spec['ref'] not in workspace:
+            raise ValueError(f"Matrix {spec['ref']} not found")
+        return workspace[spec['ref']]
+    if isinstance(spec, dict) and 'array' in spec:
+        return Matrix.from_array(np.array(spec['array']))
+    return Matrix(spec)
+
+
+def _reads(job: Dict[str, Any]) -> Set[str]:
+    """
+    Names of workspace matrices a computing job reads.
+    """
+    if 'expression' in job:
+        inline = job.get('matrices') or {}
+        return {name for name in references(parse(job['expression'])) if name not in inline}
+    specs = (job.get('matrixA'), job.get('matrixB'))
+    return {spec['ref'] for spec in specs if isinstance(spec, dict) and 'ref' in spec}
+
+
+def _operands(job: Dict[str, Any], workspace: Dict[str, Matrix]) -> Dict[str, Matrix]:
+    if 'expression' in job:
+        inline = job.get('matrices') or {}
+        return {name: _spec_matrix(inline[name] if name in inline else {'ref': name}, workspace)
+                for name in references(parse(job['expression']))}
+    if 'operation' not in job:
+        raise ValueError('A job needs an operation, an expression, load or save')
+    operands = {'matrixA': _spec_matrix(job['matrixA'], workspace)}
+    if job.get('matrixB') is not None:
+        operands['matrixB'] = _spec_matrix(job['matrixB'], workspace)
+    return operands
+
+
+# -----------------------------
+# Job Execution
+# -----------------------------
+def run_job(job: Dict[str, Any], operands: Dict[str, Matrix]) -> Tuple[Any, float]:
+    """
+    Compute one job. Runs in a worker process when jobs run in parallel.
+
+    Expressions are planned as by the /evaluate endpoint: floating-point or
+    array input runs on numpy unless the job sets "exact", everything else
+    stays exact.
+
+    Args:
+        job: The job.
+        operands: Its resolved matrices, from _operands().
+
+    Returns:
+        Tuple of (result, seconds taken).
+    """
+    start = time.perf_counter()
+    if 'expression' in job:
+        numeric = not job.get('exact') and all(m.is_floating() for m in operands.values())
+        if numeric:
+            operands = {name: m.to_numeric() for name, m in operands.items()}
+        planned = plan(parse(job['expression']), {name: (m.rows, m.cols) for name, m in operands.items()},
+                       expand_powers=not numeric)
+        result = evaluate(planned, operands, apply_operation)[0]
+    else:
+        result = apply_operation(job['operation'], operands['matrixA'], operands.get('matrixB'), job.get('scalar'))
+    return result, time.perf_counter() - start
+
+
+def _done(value: Any) -> Future:
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def _failed(error: Exception) -> Future:
+    future = Future()
+    future.set_exception(error)
+    return future
+
+
+class BatchRunner:
+    """
+    Runs a stream of jobs against a workspace of named matrices.
+
+    Jobs are read and started one at a time and their records are written in
+    input order, so memory stays bounded however long the stream is. With
+    more than one worker, computing jobs run in parallel processes; a job
+    that reads or stores a name still to be stored by an earlier job waits
+    for it, and load and save wait for everything before them, so the
+    results are the same as running the jobs one after another.
+
+    Attributes:
+        workspace (Dict[str, Matrix]): Matrices by name.
+        workers (int): Worker processes; 1 runs every job in this process.
+        precision (Optional[int]): Significant digits for floating-point output.
+        typed (bool): Emit the typed form of results.
+        fail_fast (bool): Stop at the first failed job.
+        failed (int): Number of jobs that failed so far.
+    """
+
+    def __init__(self, output: TextIO, workspace: Optional[Dict[str, Matrix]] = None, workers: int = 1,
+                 precision: Optional[int] = None, typed: bool = False, fail_fast: bool = False) -> None:
+        self.output = output
+        self.workspace = workspace if workspace is not None else {}
+        self.workers = workers
+        self.precision = check_precision(precision)
+        self.typed = typed
+        self.fail_fast = fail_fast
+        self.failed = 0
+        self._pending: Deque[Tuple[Dict[str, Any], Future]] = deque()
+        self._executor = ProcessPoolExecutor(workers) if workers > 1 else None
+
+    def run(self, jobs: Iterable[Union[Dict[str, Any], JobError]]) -> int:
+        """
+        Run every job and write one JSON record per job.
+
+        Args:
+            jobs: Jobs, or JobErrors for lines that could not be parsed.
+
+        Returns:
+            The number of failed jobs.
+        """
+        try:
+            for job in jobs:
+                if self.fail_fast and self.failed:
+                    break
+                self._submit(job)
+            self._drain(lambda: True)
+        finally:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+        return self.failed
+
+    def _submit(self, job: Union[Dict[str, Any], JobError]) -> None:
+        if isinstance(job, JobError):
+            self._pending.append(({'id': job.id}, _failed(job)))
+        elif 'load' in job or 'save' in job:
+            self._drain(lambda: True)
+            self._pending.append((job, self._file_job(job)))
+        else:
+            try:
+                reads = _reads(job) | {job['store']} if job.get('store') else _reads(job)
+                self._drain(lambda: any(p.get('store') in reads for p, _ in self._pending))
+                operands = _operands(job, self.workspace)
+            except Exception as e:
+                self._pending.append((job, _failed(e)))
+            else:
+                if self._executor is None:
+                    try:
+                        future = _done(run_job(job, operands))
+                    except Exception as e:
+                        future = _failed(e)
+                else:
+                    future = self._executor.submit(run_job, job, operands)
+                self._pending.append((job, future))
+        self._drain(lambda: len(self._pending) >= self.workers * WINDOW_PER_WORKER)
+
+    def _file_job(self, job: Dict[str, Any]) -> Future:
+        from Matrixfile import load, save
+        try:
+            if 'load' in job:
+                loaded = load(job['load'], job.get('names'))
+                self.workspace.update(loaded)
+                return _done({'loaded': list(loaded)})
+            save(job['save'], self.workspace)
+            return _done({'saved': job['save'], 'matrices': len(self.workspace)})
+        except Exception as e:
+            return _failed(e)
+
+    def _drain(self, blocked) -> None:
+        # Emit jobs in order: finished ones, and unfinished ones (waiting) while blocked() holds
+        while self._pending and (blocked() or self._pending[0][1].done()):
+            job, future = self._pending.popleft()
+            self._emit(job, future)
+
+    def _emit(self, job: Dict[str, Any], future: Future) -> None:
+        record = {'id': job.get('id')}
+        try:
+            value = future.result()
+            if 'load' in job or 'save' in job:
+                record.update(value)
+            else:
+                result, seconds = value
+                if job.get('store'):
+                    if not isinstance(result, Matrix):
+                        raise ValueError(f"Cannot store a {type(result).__name__} result as a matrix")
+                    self.workspace[job['store']] = result
+                    record['stored'] = job['store']
+                if not job.get('store') or job.get('output'):
+                    record['result'] = serialize_result(result, self.precision, self.typed)
+                record['seconds'] = round(seconds, 6)
+        except Exception as e:
+            self.failed += 1
+            record = {'id': job.get('id'), 'error': str(e) or type(e).__name__}
+        self.output.write(json.dumps(record) + '\n')
+        self.output.flush()
+
+
+# -----------------------------
+# Command Line
+# -----------------------------
+def read_jobs(paths: Iterable[str]) -> Iterator[Union[Dict[str, Any], JobError]]:
+    """
+    Read jobs lazily from files, "-" meaning standard input.
+
+    Lines that fail to parse are yielded as JobErrors, so the rest still run.
+    Jobs without an id are named after their file and line ("jobs.txt:3",
+    "<stdin>:1"). Files are closed once read; standard input is left open.
+    """
+    for path in paths:
+        f = open(path) if path != '-' else sys.stdin
+        source = path if path != '-' else '<stdin>'
+        try:
+            for number, line in enumerate(f, start=1):
+                try:
+                    job = parse_job(line, number, source)
+                except ValueError as e:
+                    job = JobError(_line_id(number, source), str(e))
+                if job is not None:
+                    yield job
+        finally:
+            if f is not sys.stdin:
+                f.close()
+
+
+def main(argv: Optional[Iterable[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        description='Run matrix jobs from JSON-lines or script files without prompts; '
+                    'writes one JSON record per job.')
+    parser.add_argument('files', nargs='*', default=['-'], help='job files, "-" for standard input (default)')
+    parser.add_argument('--workspace', help='matrix file to load into the workspace first')
+    parser.add_argument('--save', help='matrix file to save the workspace to at the end')
+    parser.add_argument('--jobs', type=int, default=1, help='worker processes, 0 for one per core (default 1)')
+    parser.add_argument('--output', help='file for the result records (default standard output)')
+    parser.add_argument('--precision', type=int, help='significant digits for floating-point results')
+    parser.add_argument('--typed', action='store_true', help='emit results in the typed form')
+    parser.add_argument('--fail-fast', action='store_true', help='stop at the first failed job')
+    args = parser.parse_args(argv)
+
+    jobs = read_jobs(args.files)
+    if args.workspace:
+        jobs = _chain({'id': 'workspace', 'load': args.workspace}, jobs)
+    if args.save:
+        jobs = _chain(jobs, {'id': 'save', 'save': args.save})
+    output = open(args.output, 'w') if args.output else sys.stdout
+    try:
+        runner = BatchRunner(output, workers=args.jobs or os.cpu_count() or 1, precision=args.precision,
+                             typed=args.typed, fail_fast=args.fail_fast)
+        return 1 if runner.run(jobs) else 0
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+def _chain(*parts) -> Iterator[Union[Dict[str, Any], JobError]]:
+    for part in parts:
+        if isinstance(part, dict):
+            yield part
+        else:
+            yield from part
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -1,8 +1,252 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
 import copy
+import hashlib
+import importlib
 import math
-from typing import List, Union, Optional, Tuple
-import numpy as np
-import sympy as sp
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Union, Optional, Tuple
+
+
+class LazyModule:
+    """
+    Stand-in for a module that is imported on first attribute access.
+
+    On first use the real module replaces the stand-in in the owning module's
+    namespace, so later lookups cost nothing extra.
+    """
+
+    def __init__(self, name: str, namespace: Dict[str, Any], alias: str) -> None:
+        self._name = name
+        self._namespace = namespace
+        self._alias = alias
+
+    def __getattr__(self, attr: str) -> Any:
+        module = importlib.import_module(self._name)
+        self._namespace[self._alias] = module
+        return getattr(module, attr)
+
+
+# sympy and numpy take most of the import time and are only needed once a
+# matrix is built, so they are loaded on first use
+np = LazyModule('numpy', globals(), 'np')
+sp = LazyModule('sympy', globals(), 'sp')
+
+# Operations understood by apply_operation
+OPERATIONS = (
+    'add', 'subtract', 'multiply', 'scalar_multiply', 'transpose', 'determinant', 'inverse',
+    'eigenvalues', 'characteristic', 'power', 'trace', 'solve',
+)
+
+# Properties reported by Matrix.analyze
+PROPERTIES = (
+    'square', 'symmetric', 'orthogonal', 'invertible', 'diagonalizable', 'positive_definite',
+    'upper_triangular', 'lower_triangular', 'triangular', 'diagonal', 'bandwidth', 'density',
+    'sparse', 'rank',
+)
+SPARSE_DENSITY = 0.5  # at most this fraction of non-zero elements counts as sparse
+# Array-backed matrices are floating point, so equalities such as A == A^T hold within
+# this tolerance (numpy.allclose); sympy matrices are compared exactly
+NUMERIC_TOLERANCE = {'rtol': 1e-05, 'atol': 1e-08}
+TOLERANT_PROPERTIES = ('symmetric', 'orthogonal', 'positive_definite')
+
+# How MatrixManager names the kinds of change it can undo and redo
+CHANGE_NOUNS = {'create': 'creation', 'edit': 'edit', 'delete': 'deletion'}
+
+
+# -----------------------------
+# Progress Reporting
+# -----------------------------
+class Cancelled(Exception):
+    """Raised inside a computation whose progress reporter was cancelled."""
+
+
+class Progress:
+    """
+    Receives progress from the engine's loops while a computation runs.
+
+    Operations announce phases (for example "eliminate" with the number of
+    pivot rows) and advance through them; each update is also a point at
+    which a cancelled computation stops by raising Cancelled. While a reporter
+    is active, elimination on the sympy backend runs in the engine's own loops
+    so that it can report each row; otherwise sympy's routines are used.
+
+    Attributes:
+        callback (Optional[Callable[[Dict[str, Any]], None]]): Called with a snapshot()
+            at every phase change and at most every interval seconds in between.
+        interval (float): Minimum seconds between callbacks within a phase.
+        expected (Optional[float]): Estimated total seconds, used for the ETA of
+            phases that cannot count their steps.
+    """
+
+    def __init__(self, callback: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 interval: float = 0.25, expected: Optional[float] = None) -> None:
+        self.callback = callback
+        self.interval = interval
+        self.expected = expected
+        self.phase: Optional[str] = None
+        self.done = 0
+        self.total: Optional[int] = None
+        self._started = time.monotonic()
+        self._phase_started = self._started
+        self._reported = 0.0
+        self._cancelled = threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._cancelled.is_set()
+
+    def cancel(self) -> None:
+        """
+        Ask the computation to stop at its next progress update.
+        """
+        self._cancelled.set()
+
+    def begin(self, phase: str, total: Optional[int] = None) -> None:
+        """
+        Start a phase of total steps (None if the phase cannot count them).
+
+        Raises:
+            Cancelled: If the computation was cancelled.
+        """
+        self.phase, self.done, self.total = phase, 0, total
+        self._phase_started = time.monotonic()
+        self._report(force=True)
+
+    def advance(self, steps: int = 1) -> None:
+        """
+        Record steps completed in the current phase.
+
+        Raises:
+            Cancelled: If the computation was cancelled.
+        """
+        self.done += steps
+        self._report(force=self.done == self.total)
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Return the current phase, steps done and total, seconds elapsed and
+        the estimated seconds remaining (None when unknown).
+        """
+        now = time.monotonic()
+        elapsed = now - self._started
+        eta = None
+        if self.total and self.done:
+            # Extrapolated from the rate of the current phase
+            eta = (now - self._phase_started) / self.done * (self.total - self.done)
+        elif self.expected is not None:
+            eta = max(self.expected - elapsed, 0.0)
+        return {'phase': self.phase, 'done': self.done, 'total': self.total, 'elapsed': elapsed, 'eta': eta}
+
+    def _report(self, force: bool = False) -> None:
+        if self.cancelled:
+            raise Cancelled('Computation cancelled')
+        now = time.monotonic()
+        if self.callback is not None and (force or now - self._reported >= self.interval):
+            self._reported = now
+            self.callback(self.snapshot())
+        if self.cancelled:
+            raise Cancelled('Computation cancelled')
+
+
+_progress: contextvars.ContextVar[Optional[Progress]] = contextvars.ContextVar('matrix_progress', default=None)
+
+
+@contextlib.contextmanager
+def reporting(progress: Progress):
+    """
+    Send the progress of computations in this context to a reporter.
+
+    Example:
+        >>> with reporting(Progress(print)):
+        ...     Matrix([[1, 2], [3, 4]]).inverse()
+    """
+    token = _progress.set(progress)
+    try:
+        yield progress
+    finally:
+        _progress.reset(token)
+
+
+def current_progress() -> Optional[Progress]:
+    """
+    Return the reporter active in this context, if any.
+    """
+    return _progress.get()
+
+
+def _begin(phase: str, total: Optional[int] = None) -> None:
+    progress = _progress.get()
+    if progress is not None:
+        progress.begin(phase, total)
+
+
+def _advance(steps: int = 1) -> None:
+    progress = _progress.get()
+    if progress is not None:
+        progress.advance(steps)
+
+
+def _is_zero(elem: sp.Expr) -> bool:
+    return (sp.cancel(elem) if elem.free_symbols else elem) == 0
+
+
+def _gauss_jordan(rows: List[List[sp.Expr]], rhs: List[List[sp.Expr]]) -> List[List[sp.Expr]]:
+    """
+    Solve rows * X = rhs by Gauss-Jordan elimination, reporting each pivot row.
+
+    Raises:
+        ValueError: If the matrix is singular.
+    """
+    n = len(rows)
+    symbolic = any(elem.free_symbols for row in rows + rhs for elem in row)
+    tidy = (lambda row: [sp.cancel(elem) for elem in row]) if symbolic else (lambda row: row)
+    aug = [list(row) + list(extra) for row, extra in zip(rows, rhs)]
+    _begin('eliminate', n)
+    for col in range(n):
+        pivot = next((r for r in range(col, n) if not _is_zero(aug[r][col])), None)
+        if pivot is None:
+            raise ValueError("Matrix is singular (determinant is zero).")
+        aug[col], aug[pivot] = aug[pivot], aug[col]
+        pivot_row = tidy([elem / aug[col][col] for elem in aug[col]])
+        aug[col] = pivot_row
+        for r in range(n):
+            factor = aug[r][col]
+            if r != col and factor != 0:
+                aug[r] = tidy([a - factor * b for a, b in zip(aug[r], pivot_row)])
+        _advance()
+    return [row[n:] for row in aug]
+
+
+def _bareiss(rows: List[List[sp.Expr]]) -> sp.Expr:
+    """
+    Fraction-free determinant by Bareiss elimination, reporting each pivot row.
+    """
+    n = len(rows)
+    if n == 0:
+        return sp.Integer(1)
+    symbolic = any(elem.free_symbols for row in rows for elem in row)
+    m = [list(row) for row in rows]
+    sign, previous = 1, sp.Integer(1)
+    _begin('eliminate', n - 1)
+    for k in range(n - 1):
+        pivot = next((r for r in range(k, n) if not _is_zero(m[r][k])), None)
+        if pivot is None:
+            return sp.Integer(0)
+        if pivot != k:
+            m[k], m[pivot] = m[pivot], m[k]
+            sign = -sign
+        for i in range(k + 1, n):
+            for j in range(k + 1, n):
+                value = (m[i][j] * m[k][k] - m[i][k] * m[k][j]) / previous
+                m[i][j] = sp.cancel(value) if symbolic else value  # the division is exact
+        previous = m[k][k]
+        _advance()
+    return sign * m[n - 1][n - 1]
 
 # -----------------------------
 # Matrix Class
@@ -15,6 +259,10 @@ class Matrix:
     multiplication, transpose, determinant, inverse, eigenvalues, and more.
     All elements are stored as sympy expressions to support symbolic computations.
     
+    Matrices built with from_array() are backed by a numpy array instead. Their
+    arithmetic runs in floating point through numpy, and the sympy elements are
+    only created if a symbolic-only operation asks for them.
+    
     Attributes:
         data (List[List[sp.Expr]]): The matrix elements as sympy expressions
         rows (int): Number of rows in the matrix
@@ -45,6 +293,58 @@ class Matrix:
         self.data = [[sp.sympify(elem) for elem in row] for row in data]
         self.rows = len(data)
         self.cols = len(data[0])
+
+    @classmethod
+    def from_array(cls, array: np.ndarray) -> 'Matrix':
+        """
+        Create a numeric matrix backed directly by a numpy array.
+        
+        No per-element conversion takes place; the array is used as-is.
+        
+        Args:
+            array: A non-empty 2D array of booleans, integers, floats or complex numbers.
+        
+        Returns:
+            A new array-backed matrix.
+        
+        Raises:
+            ValueError: If the array is not 2D, is empty, or has a non-numeric dtype.
+        """
+        array = np.asarray(array)
+        if array.ndim != 2 or array.size == 0:
+            raise ValueError("Data must be a non-empty 2D array.")
+        if array.dtype.kind not in 'biufc':
+            raise ValueError(f"Unsupported array dtype: {array.dtype}")
+        matrix = cls.__new__(cls)
+        matrix._data = None
+        matrix._array = array
+        matrix.rows, matrix.cols = array.shape
+        return matrix
+
+    @property
+    def data(self) -> List[List[sp.Expr]]:
+        if self._data is None:
+            # Materialize sympy elements for an array-backed matrix on first use
+            self._data = [[sp.sympify(elem) for elem in row] for row in self._array.tolist()]
+        return self._data
+
+    @data.setter
+    def data(self, value: List[List[sp.Expr]]) -> None:
+        self._data = value
+        self._array = None
+
+    @property
+    def array(self) -> Optional[np.ndarray]:
+        """
+        The backing numpy array, or None for a symbolic matrix.
+        """
+        return self._array
+
+    def _numeric(self, other: Optional['Matrix'] = None) -> bool:
+        """
+        Check if this matrix (and other, if given) can use the numpy fast path.
+        """
+        return self._array is not None and (other is None or getattr(other, '_array', None) is not None)
     
     def __str__(self) -> str:
         """
@@ -59,6 +359,30 @@ class Matrix:
             s += row_str + "\n"
         return s
 
+    def fingerprint(self) -> str:
+        """
+        Return a canonical hash of the matrix contents.
+
+        Elements are hashed in their sympified form, so inputs that normalize to
+        the same expression (e.g. "x+1" and "1+x") share a fingerprint.
+
+        Returns:
+            A hex SHA-256 digest of the dimensions and elements.
+        """
+        cached = getattr(self, '_fingerprint', None)
+        if cached is None and self._array is not None:
+            h = hashlib.sha256(f"{self.rows}x{self.cols}:{self._array.dtype.str}".encode())
+            h.update(np.ascontiguousarray(self._array).tobytes())
+            cached = self._fingerprint = h.hexdigest()
+        elif cached is None:
+            h = hashlib.sha256(f"{self.rows}x{self.cols}".encode())
+            for row in self.data:
+                for elem in row:
+                    h.update(b"\0")
+                    h.update(sp.srepr(elem).encode())
+            cached = self._fingerprint = h.hexdigest()
+        return cached
+
     def is_square(self) -> bool:
         """
         Check if the matrix is square (equal number of rows and columns).
@@ -68,6 +392,44 @@ class Matrix:
         """
         return self.rows == self.cols
 
+    def to_numeric(self) -> Optional['Matrix']:
+        """
+        Return an array-backed floating-point copy of this matrix.
+        
+        Returns:
+            A matrix using the numpy backend, or None if any element has free symbols.
+        """
+        if self._array is not None:
+            return self
+        if not self.is_numeric():
+            return None
+        values = [[complex(elem) for elem in row] for row in self.data]
+        array = np.array(values)
+        return Matrix.from_array(array.real if not array.imag.any() else array)
+
+    def is_numeric(self) -> bool:
+        """
+        Check if every element is a plain number (no free symbols).
+        
+        Returns:
+            True if the matrix contains only numbers, False otherwise.
+        """
+        if self._array is not None:
+            return True
+        return all(elem.is_number for row in self.data for elem in row)
+
+    def is_floating(self) -> bool:
+        """
+        Check if the matrix holds floating-point data: it is array-backed, or
+        its elements are numbers of which at least one is a float.
+        
+        Returns:
+            True for floating-point input, False for exact or symbolic input.
+        """
+        if self._array is not None:
+            return True
+        return self.is_numeric() and any(elem.has(sp.Float) for row in self.data for elem in row)
+
     def add(self, other: 'Matrix') -> 'Matrix':
         """
         Add this matrix with another matrix.
@@ -83,6 +445,8 @@ class Matrix:
         """
         if self.rows != other.rows or self.cols != other.cols:
             raise ValueError("Addition requires matrices of the same dimensions.")
+        if self._numeric(other):
+            return Matrix.from_array(self._array + other._array)
         result = [[self.data[i][j] + other.data[i][j] for j in range(self.cols)]
                   for i in range(self.rows)]
         return Matrix(result)
@@ -102,16 +466,18 @@ class Matrix:
         """
         if self.rows != other.rows or self.cols != other.cols:
             raise ValueError("Subtraction requires matrices of the same dimensions.")
+        if self._numeric(other):
+            return Matrix.from_array(self._array - other._array)
         result = [[self.data[i][j] - other.data[i][j] for j in range(self.cols)]
                   for i in range(self.rows)]
         return Matrix(result)
 
-    def multiply(self, other: Union['Matrix', int, float, sp.Number]) -> 'Matrix':
+    def multiply(self, other: Union['Matrix', int, float, complex, sp.Expr]) -> 'Matrix':
         """
         Multiply this matrix by another matrix or a scalar.
         
         Args:
-            other: Either a Matrix instance or a scalar number.
+            other: Either a Matrix instance, a scalar number or a scalar sympy expression.
         
         Returns:
             A new matrix containing the product.
@@ -122,9 +488,20 @@ class Matrix:
         if isinstance(other, Matrix):
             if self.cols != other.rows:
                 raise ValueError("For matrix multiplication, the number of columns in the first matrix must equal the number of rows in the second.")
-            result = [[sum(self.data[i][k] * other.data[k][j] for k in range(self.cols))
-                       for j in range(other.cols)] for i in range(self.rows)]
-        elif isinstance(other, (int, float, sp.Number)):
+            if self._numeric(other):
+                _begin('multiply')
+                return Matrix.from_array(self._array @ other._array)
+            _begin('multiply', self.rows)
+            result = []
+            for i in range(self.rows):
+                result.append([sum(self.data[i][k] * other.data[k][j] for k in range(self.cols))
+                               for j in range(other.cols)])
+                _advance()
+        elif isinstance(other, (int, float, complex)) or isinstance(other, sp.Expr):
+            if self._numeric() and (isinstance(other, (int, float, complex)) or other.is_number):
+                if isinstance(other, sp.Expr):
+                    other = float(other) if other.is_real else complex(other)
+                return Matrix.from_array(self._array * other)
             result = [[self.data[i][j] * other for j in range(self.cols)] for i in range(self.rows)]
         else:
             raise ValueError("Multiplication is only supported with a matrix or a scalar number.")
@@ -137,6 +514,8 @@ class Matrix:
         Returns:
             A new matrix containing the transpose.
         """
+        if self._numeric():
+            return Matrix.from_array(self._array.T)
         try:
             result = [[self.data[j][i] for j in range(self.rows)]
                       for i in range(self.cols)]
@@ -156,6 +535,8 @@ class Matrix:
         """
         if not self.is_square():
             raise ValueError("Trace is defined only for square matrices.")
+        if self._numeric():
+            return self._array.trace().item()
         try:
             return sum(self.data[i][i] for i in range(self.rows))
         except Exception as e:
@@ -173,6 +554,11 @@ class Matrix:
         """
         if not self.is_square():
             raise ValueError("Determinant is defined only for square matrices.")
+        if self._numeric():
+            _begin('determinant')
+            return np.linalg.det(self._array).item()
+        if _progress.get() is not None:
+            return _bareiss(self.data)
         try:
             # Use sympy's built-in determinant computation
             return sp.Matrix(self.data).det()
@@ -191,6 +577,15 @@ class Matrix:
         """
         if not self.is_square():
             raise ValueError("Inverse is defined only for square matrices.")
+        if self._numeric():
+            _begin('inverse')
+            try:
+                return Matrix.from_array(np.linalg.inv(self._array))
+            except np.linalg.LinAlgError:
+                raise ValueError("Matrix is singular (determinant is zero).")
+        if _progress.get() is not None:
+            identity = [[sp.Integer(int(i == j)) for j in range(self.rows)] for i in range(self.rows)]
+            return Matrix(_gauss_jordan(self.data, identity))
         try:
             # Check if determinant is zero (matrix is singular)
             det = self.determinant()
@@ -204,6 +599,41 @@ class Matrix:
         except Exception as e:
             raise ValueError(f"Error computing inverse: {str(e)}")
 
+    def solve(self, other: 'Matrix') -> 'Matrix':
+        """
+        Solve the linear system self * X = other for X.
+        
+        Cheaper and more accurate than multiplying by the inverse.
+        
+        Args:
+            other: The right-hand side, with as many rows as this matrix.
+        
+        Returns:
+            A new matrix X with the shape of other.
+        
+        Raises:
+            ValueError: If this matrix is not square, the shapes do not match
+                        or this matrix is singular.
+        """
+        if not self.is_square():
+            raise ValueError("Solving is defined only for square coefficient matrices.")
+        if self.rows != other.rows:
+            raise ValueError("The right-hand side must have as many rows as the coefficient matrix.")
+        if self._numeric(other):
+            _begin('solve')
+            try:
+                return Matrix.from_array(np.linalg.solve(self._array, other._array))
+            except np.linalg.LinAlgError:
+                raise ValueError("Matrix is singular (determinant is zero).")
+        if _progress.get() is not None:
+            return Matrix(_gauss_jordan(self.data, other.data))
+        try:
+            solution = sp.Matrix(self.data).LUsolve(sp.Matrix(other.data))
+        except (ValueError, ZeroDivisionError):
+            raise ValueError("Matrix is singular (determinant is zero).")
+        return Matrix([[sp.cancel(elem) if elem.free_symbols else elem for elem in row]
+                       for row in solution.tolist()])
+
     def eigenvalues(self, numeric: bool = False) -> List[sp.Expr]:
         """
         Compute the eigenvalues of this matrix.
@@ -220,6 +650,9 @@ class Matrix:
         """
         if not self.is_square():
             raise ValueError("Eigenvalues are defined only for square matrices.")
+        _begin('eigenvalues')
+        if self._numeric():
+            return [v.real if v.imag == 0 else v for v in np.linalg.eigvals(self._array).tolist()]
         try:
             sym_eigs = list(sp.Matrix(self.data).eigenvals().keys())
             if numeric:
@@ -240,9 +673,18 @@ class Matrix:
         """
         if not self.is_square():
             raise ValueError("Characteristic equation is defined only for square matrices.")
+        if self._numeric():
+            # Coefficients from the eigenvalues, highest degree first
+            _begin('characteristic')
+            X = sp.symbols('X')
+            coeffs = np.poly(self._array).tolist()
+            return sp.expand(X**self.rows + sum(sp.sympify(c) * X**(self.rows - k)
+                                                for k, c in enumerate(coeffs) if k))
         try:
             X = sp.symbols('X')
             A_sym = sp.Matrix(self.data)
+            if _progress.get() is not None:
+                return sp.expand(_bareiss((X * sp.eye(self.rows) - A_sym).tolist()))
             char_poly = sp.expand((X * sp.eye(self.rows) - A_sym).det())
             return char_poly
         except Exception as e:
@@ -263,14 +705,23 @@ class Matrix:
         """
         if not self.is_square():
             raise ValueError("Matrix power is defined only for square matrices.")
+        if self._numeric():
+            _begin('power')
+            return Matrix.from_array(self._array_power(exponent))
         try:
             M = sp.Matrix(self.data)
             # Try diagonalization first
             try:
+                _begin('diagonalize')
                 P, D = M.diagonalize()
                 # Raise each diagonal entry to the exponent
-                diag_entries = [d**exponent for d in D.diagonal()]
+                _begin('power', self.rows)
+                diag_entries = []
+                for d in D.diagonal():
+                    diag_entries.append(d**exponent)
+                    _advance()
                 D_power = sp.diag(*diag_entries)
+                _begin('assemble')
                 M_power = P * D_power * P.inv()
                 return Matrix(M_power.tolist())
             except sp.MatrixError:
@@ -284,15 +735,37 @@ class Matrix:
         except Exception as e:
             raise ValueError(f"Error computing matrix power: {str(e)}")
 
+    def _array_power(self, exponent: Union[int, float]) -> np.ndarray:
+        """
+        Raise the backing array to a power: repeated squaring for integer
+        exponents, eigendecomposition otherwise.
+        """
+        array = self._array if self._array.dtype.kind in 'fc' else self._array.astype(float)
+        if float(exponent).is_integer():
+            try:
+                return np.linalg.matrix_power(array, int(exponent))
+            except np.linalg.LinAlgError:
+                raise ValueError("Matrix is singular (determinant is zero).")
+        w, V = np.linalg.eig(array)
+        if np.linalg.cond(V) > 1e12:
+            raise ValueError("Matrix power for real exponent is not defined for this matrix: "
+                             "matrix is not diagonalizable")
+        result = V @ np.diag(w.astype(complex) ** exponent) @ np.linalg.inv(V)
+        return result.real if np.allclose(result.imag, 0) else result
+
     def is_symmetric(self) -> bool:
         """
         Check if the matrix is symmetric (equal to its transpose).
         
+        Array-backed matrices are compared within NUMERIC_TOLERANCE.
+        
         Returns:
             True if the matrix is symmetric, False otherwise.
         """
         if not self.is_square():
             return False
+        if self._numeric():
+            return bool(np.allclose(self._array, self._array.T, **NUMERIC_TOLERANCE))
         try:
             return self.data == self.transpose().data
         except Exception:
@@ -302,11 +775,15 @@ class Matrix:
         """
         Check if the matrix is orthogonal (its transpose equals its inverse).
         
+        Array-backed matrices are compared within NUMERIC_TOLERANCE.
+        
         Returns:
             True if the matrix is orthogonal, False otherwise.
         """
         if not self.is_square():
             return False
+        if self._numeric():
+            return bool(np.allclose(self._array @ self._array.T, np.eye(self.rows), **NUMERIC_TOLERANCE))
         try:
             # Check if A * A^T = I
             product = self.multiply(self.transpose())
@@ -315,6 +792,175 @@ class Matrix:
         except Exception:
             return False
 
+    def analyze(self, properties: Optional[Iterable[str]] = None) -> Dict[str, Any]:
+        """
+        Report several structural and spectral properties in one pass.
+        
+        Intermediate results (the zero pattern, the rank and the eigen-structure)
+        are computed at most once and shared between the properties that need
+        them; properties that are not requested cost nothing. Numeric
+        array-backed matrices are analyzed with numpy, everything else with
+        sympy. Positive definiteness is decided by attempting a Cholesky
+        factorization.
+        
+        Args:
+            properties: Names from PROPERTIES to report. Defaults to all of them.
+        
+        Returns:
+            Dictionary mapping each property to its value. Boolean properties are
+            None when they cannot be decided for symbolic entries; bandwidth is a
+            {"lower": p, "upper": q} dictionary, density a fraction and rank an int.
+            When any of TOLERANT_PROPERTIES is requested, "tolerance" gives the
+            NUMERIC_TOLERANCE they were decided with, or None for exact comparison.
+        
+        Raises:
+            ValueError: If an unknown property is requested.
+        """
+        names = list(PROPERTIES if properties is None else properties)
+        unknown = [name for name in names if name not in PROPERTIES]
+        if unknown:
+            raise ValueError(f"Unknown properties: {', '.join(unknown)}")
+
+        numeric = self._numeric()
+        square = self.is_square()
+        memo = {}
+
+        def shared(name, compute):
+            if name not in memo:
+                memo[name] = compute()
+            return memo[name]
+
+        def nonzero():
+            # Zero pattern; None marks entries whose zero-ness is undecidable
+            if numeric:
+                return (self._array != 0).tolist()
+            return [[None if elem.is_zero is None else not elem.is_zero for elem in row] for row in self.data]
+
+        def bandwidth():
+            pattern = shared('nonzero', nonzero)
+            cells = [(i, j) for i in range(self.rows) for j in range(self.cols) if pattern[i][j] is not False]
+            return {'lower': max((i - j for i, j in cells), default=0),
+                    'upper': max((j - i for i, j in cells), default=0)}
+
+        def sympy_matrix():
+            return sp.Matrix(self.data)
+
+        def rank():
+            if numeric:
+                return int(np.linalg.matrix_rank(self._array))
+            return shared('M', sympy_matrix).rank()
+
+        def symmetric():
+            return square and self.is_symmetric()
+
+        def orthogonal():
+            return square and self.is_orthogonal()
+
+        def diagonalizable():
+            if not square:
+                return False
+            if numeric:
+                # Diagonalizable iff the eigenvectors span the space
+                _, vectors = np.linalg.eig(self._array)
+                return bool(np.linalg.matrix_rank(vectors) == self.rows)
+            try:
+                return shared('M', sympy_matrix).is_diagonalizable()
+            except Exception:
+                return None
+
+        def positive_definite():
+            if not square or not shared('symmetric', symmetric):
+                return False
+            if numeric:
+                try:
+                    np.linalg.cholesky(self._array)
+                    return True
+                except np.linalg.LinAlgError:
+                    return False
+            if not self.is_numeric():
+                return None
+            try:
+                L = shared('M', sympy_matrix).cholesky(hermitian=False)
+            except ValueError:
+                return False
+            return all(d.is_positive for d in L.diagonal())
+
+        def density():
+            pattern = shared('nonzero', nonzero)
+            return sum(1 for row in pattern for cell in row if cell is not False) / (self.rows * self.cols)
+
+        computations = {
+            'square': lambda: square,
+            'symmetric': lambda: shared('symmetric', symmetric),
+            'orthogonal': orthogonal,
+            'invertible': lambda: square and shared('rank', rank) == self.rows,
+            'diagonalizable': diagonalizable,
+            'positive_definite': positive_definite,
+            'upper_triangular': lambda: square and shared('bandwidth', bandwidth)['lower'] == 0,
+            'lower_triangular': lambda: square and shared('bandwidth', bandwidth)['upper'] == 0,
+            'triangular': lambda: square and min(shared('bandwidth', bandwidth).values()) == 0,
+            'diagonal': lambda: square and max(shared('bandwidth', bandwidth).values()) == 0,
+            'bandwidth': lambda: shared('bandwidth', bandwidth),
+            'density': lambda: shared('density', density),
+            'sparse': lambda: shared('density', density) <= SPARSE_DENSITY,
+            'rank': lambda: shared('rank', rank),
+        }
+        result = {name: computations[name]() for name in names}
+        if any(name in TOLERANT_PROPERTIES for name in names):
+            result['tolerance'] = dict(NUMERIC_TOLERANCE) if numeric else None
+        return result
+
+# -----------------------------
+# Operation Dispatch
+# -----------------------------
+def apply_operation(operation: str, matrix_a: Matrix, matrix_b: Optional[Matrix] = None,
+                    scalar: Optional[Union[int, float]] = None) -> Union[Matrix, sp.Expr, List[sp.Expr]]:
+    """
+    Apply a named operation to one or two matrices.
+
+    Args:
+        operation: One of add, subtract, multiply, scalar_multiply, transpose,
+                  determinant, inverse, eigenvalues, characteristic, power, trace, solve.
+        matrix_a: The first operand.
+        matrix_b: The second operand for binary operations (the right-hand side for solve).
+        scalar: The scalar for scalar_multiply, or the exponent for power.
+
+    Returns:
+        A Matrix, a sympy expression, or a list of eigenvalues.
+
+    Raises:
+        ValueError: If the operation is unknown or its operands are invalid.
+    """
+    if operation == 'add':
+        return matrix_a.add(matrix_b)
+    elif operation == 'subtract':
+        return matrix_a.subtract(matrix_b)
+    elif operation == 'multiply':
+        return matrix_a.multiply(matrix_b)
+    elif operation == 'scalar_multiply':
+        return matrix_a.multiply(scalar)
+    elif operation == 'transpose':
+        return matrix_a.transpose()
+    elif operation == 'determinant':
+        return matrix_a.determinant()
+    elif operation == 'inverse':
+        return matrix_a.inverse()
+    elif operation == 'eigenvalues':
+        return matrix_a.eigenvalues(numeric=True)
+    elif operation == 'characteristic':
+        return matrix_a.characteristic_equation()
+    elif operation == 'power':
+        if scalar is None:
+            raise ValueError("Please provide a power value")
+        return matrix_a.power(scalar)
+    elif operation == 'trace':
+        return matrix_a.trace()
+    elif operation == 'solve':
+        if matrix_b is None:
+            raise ValueError("Please provide a right-hand side matrix")
+        return matrix_a.solve(matrix_b)
+    raise ValueError("Invalid operation")
+
 # -----------------------------
 # Matrix Manager Class
 # -----------------------------
@@ -324,18 +970,18 @@ class MatrixManager:
     
     This class provides functionality to create, delete, edit, and perform operations
     on multiple matrices. It maintains a dictionary of named matrices and provides
-    a user interface for matrix management.
+    a user interface for matrix management. Every change to the matrices is
+    versioned, so any number of operations can be undone and redone.
     
     Attributes:
-        matrices (Dict[str, Matrix]): Dictionary mapping matrix names to Matrix instances
+        matrices (VersionedMatrices): Mapping of matrix names to Matrix instances, with history
         counter (int): Counter for generating unique matrix names
-        history (List[Tuple[str, str]]): List of operations performed (operation, matrix name)
     """
     
     def __init__(self):
-        self.matrices = {}  # maps a name (like "A", "B", etc.) to a Matrix instance
+        from Matrixhistory import VersionedMatrices  # Matrixhistory imports Matrix from here
+        self.matrices = VersionedMatrices()  # maps a name (like "A", "B", etc.) to a Matrix instance
         self.counter = 0   # for assigning names
-        self.history = []  # track operation history
 
     def _get_new_name(self) -> str:
         """
@@ -385,7 +1031,6 @@ class MatrixManager:
                 data.append(row)
             
             self.matrices[name] = Matrix(data)
-            self.history.append(("create", name))
             print(f"Matrix {name} has been created successfully.")
             
         except Exception as e:
@@ -403,7 +1048,6 @@ class MatrixManager:
         name, _ = chosen
         try:
             del self.matrices[name]
-            self.history.append(("delete", name))
             print(f"Matrix {name} has been deleted successfully.")
         except Exception as e:
             print(f"Error deleting matrix: {str(e)}")
@@ -442,7 +1086,6 @@ class MatrixManager:
                 new_data.append(row)
             
             self.matrices[name] = Matrix(new_data)
-            self.history.append(("edit", name))
             print(f"Matrix {name} has been updated successfully.")
             
         except Exception as e:
@@ -535,7 +1178,6 @@ class MatrixManager:
             if choice == '1':
                 name = self._get_new_name()
                 self.matrices[name] = result_matrix
-                self.history.append(("store_result", name))
                 print(f"Result stored as Matrix {name}.")
         except Exception as e:
             print(f"Error storing result: {str(e)}")
@@ -544,51 +1186,61 @@ class MatrixManager:
         """
         Undo the last operation performed on matrices.
         """
-        if not self.history:
+        undone = self.matrices.undo()
+        if undone is None:
             print("No operations to undo.")
             return
-        
-        operation, name = self.history.pop()
-        if operation == "create":
-            if name in self.matrices:
-                del self.matrices[name]
-            print(f"Undid creation of Matrix {name}")
-        elif operation == "delete":
-            # Note: We can't restore deleted matrices without storing their data
-            print(f"Undid deletion of Matrix {name}")
-        elif operation == "edit":
-            # Note: We can't restore previous matrix state without storing it
-            print(f"Undid edit of Matrix {name}")
-        elif operation == "store_result":
-            if name in self.matrices:
-                del self.matrices[name]
-            print(f"Undid storing of result Matrix {name}")
+        name, kind = undone
+        print(f"Undid {CHANGE_NOUNS[kind]} of Matrix {name}")
+
+    def redo_last_operation(self) -> None:
+        """
+        Redo the last operation that was undone.
+        """
+        redone = self.matrices.redo()
+        if redone is None:
+            print("No operations to redo.")
+            return
+        name, kind = redone
+        print(f"Redid {CHANGE_NOUNS[kind]} of Matrix {name}")
 
     def save_matrices(self, filename: str) -> None:
         """
         Save all matrices to a file.
+
+        Files use the readable text format, unless the name ends in .mtx: those
+        get the binary format of Matrixfile, which is lossless and fast to load.
         
         Args:
             filename: Name of the file to save matrices to.
         """
         try:
-            with open(filename, 'w') as f:
-                for name, matrix in self.matrices.items():
-                    f.write(f"Matrix {name}:\n")
-                    f.write(str(matrix))
-                    f.write("\n\n")
+            if filename.lower().endswith('.mtx'):
+                from Matrixfile import save
+                save(filename, dict(self.matrices))
+            else:
+                with open(filename, 'w') as f:
+                    for name, matrix in self.matrices.items():
+                        f.write(f"Matrix {name}:\n")
+                        f.write(str(matrix))
+                        f.write("\n\n")
             print(f"Matrices saved to {filename}")
         except Exception as e:
             print(f"Error saving matrices: {str(e)}")
 
     def load_matrices(self, filename: str) -> None:
         """
-        Load matrices from a file.
+        Load matrices from a file in either format.
         
         Args:
             filename: Name of the file to load matrices from.
         """
         try:
+            from Matrixfile import is_matrix_file, load
+            if is_matrix_file(filename):
+                self.matrices.update(load(filename))
+                print(f"Matrices loaded from {filename}")
+                return
             with open(filename, 'r') as f:
                 content = f.read()
                 matrices_data = content.split("\n\n")
@@ -609,6 +1261,24 @@ class MatrixManager:
         except Exception as e:
             print(f"Error loading matrices: {str(e)}")
 
+    def load_matrix(self, filename: str, name: str) -> None:
+        """
+        Load one matrix from a binary matrix file, reading only its block.
+
+        Args:
+            filename: Name of the file to load from.
+            name: Name of the matrix to load.
+        """
+        try:
+            from Matrixfile import MatrixFile
+            with MatrixFile(filename) as f:
+                self.matrices[name] = f.matrix(name)
+            print(f"Matrix {name} loaded from {filename}")
+        except KeyError:
+            print(f"Matrix {name} not found in {filename}")
+        except Exception as e:
+            print(f"Error loading matrix: {str(e)}")
+
 # -----------------------------
 # Menus
 # -----------------------------
@@ -626,9 +1296,10 @@ def management_menu(manager: MatrixManager) -> None:
         print("3. Edit Matrix")
         print("4. List/Show Matrices")
         print("5. Undo Last Operation")
-        print("6. Save Matrices to File")
-        print("7. Load Matrices from File")
-        print("8. Back to Main Menu")
+        print("6. Redo Last Operation")
+        print("7. Save Matrices to File")
+        print("8. Load Matrices from File")
+        print("9. Back to Main Menu")
         
         choice = input("\nSelect an option: ").strip()
         if choice == '1':
@@ -642,18 +1313,24 @@ def management_menu(manager: MatrixManager) -> None:
         elif choice == '5':
             manager.undo_last_operation()
         elif choice == '6':
-            filename = input("Enter filename to save matrices: ").strip()
+            manager.redo_last_operation()
+        elif choice == '7':
+            filename = input("Enter filename to save matrices (.mtx for the binary format): ").strip()
             if filename:
                 manager.save_matrices(filename)
             else:
                 print("Invalid filename.")
-        elif choice == '7':
+        elif choice == '8':
             filename = input("Enter filename to load matrices: ").strip()
             if filename:
-                manager.load_matrices(filename)
+                name = input("Enter a matrix name to load only that one (blank for all): ").strip()
+                if name:
+                    manager.load_matrix(filename, name)
+                else:
+                    manager.load_matrices(filename)
             else:
                 print("Invalid filename.")
-        elif choice == '8':
+        elif choice == '9':
             break
         else:
             print("Invalid choice. Please try again.")
@@ -834,4 +1511,8 @@ def main_menu() -> None:
             print("Invalid choice. Please try again.")
 
 if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        # Arguments select the non-interactive batch mode, e.g. python Matrixcodes.py jobs.jsonl
+        from Matrixbatch import main
+        sys.exit(main(sys.argv[1:]))
     main_menu()
@@ -0,0 +1,289 @@
+from __future__ import annotations
+
+import math
+import sys
+from typing import Any, Dict, Optional
+
+from Matrixcodes import Matrix, LazyModule
+
+np = LazyModule('numpy', globals(), 'np')
+sp = LazyModule('sympy', globals(), 'sp')
+
+# Cost model, fitted on a reference machine. The estimated seconds for an
+# n x n operand are coefficient * n ** exponent (rows * cols for element-wise
+# operations, rows * inner * cols for products). On the sympy backend this is
+# scaled by density and multiplied by growth ** n for expression swell; for
+# symbolic input n is scaled down when fewer than half the elements are symbolic.
+# Exact integer powers add a term for computing entries that grow with the exponent.
+NUMPY_COSTS = {
+    'add': (6e-9, 2), 'subtract': (6e-9, 2), 'scalar_multiply': (6e-9, 2), 'transpose': (1e-9, 2),
+    'trace': (1e-8, 1), 'multiply': (1e-10, 3), 'determinant': (1e-10, 3), 'inverse': (3e-10, 3),
+    'eigenvalues': (2e-9, 3), 'characteristic': (2e-9, 3), 'power': (3e-10, 3), 'solve': (1e-10, 3),
+}
+SYMPY_COSTS = {
+    'add': (2e-6, 2), 'subtract': (2e-6, 2), 'scalar_multiply': (2e-6, 2), 'transpose': (1e-6, 2),
+    'trace': (5e-6, 1), 'multiply': (3e-6, 3), 'determinant': (1e-5, 3), 'inverse': (1e-5, 3),
+    'eigenvalues': (3e-4, 5), 'characteristic': (5e-5, 5), 'power': (3e-4, 5), 'solve': (1e-5, 3),
+}
+SYMBOLIC_FACTOR = 20  # constant slowdown of symbolic over exact arithmetic
+POWER_WORD_COST = 7e-9  # seconds per entry of an exact power, times its size in words ** 1.5
+GROWTH = {
+    'symbolic': {'multiply': 1.1, 'determinant': 2.7, 'inverse': 2.7, 'solve': 2.7, 'eigenvalues': 2.7,
+                 'characteristic': 1.5, 'power': 2.7},
+    'float': {'eigenvalues': 1.7, 'characteristic': 1.7, 'power': 1.7},
+    'exact': {'power': 3.0},  # diagonalization brings in radicals
+}
+WORD_BITS = 64  # exact numbers up to this size cost about as much as machine words
+MAX_POWER_BITS = 1 << 13  # largest exact scalar power computed (about 2,500 digits)
+MAX_SECONDS = 1e18  # estimates saturate here, far above any limit, so they stay finite in JSON
+_LOG_MAX_FLOAT = math.log(sys.float_info.max)
+DENSITY_SENSITIVE = {'multiply', 'determinant', 'inverse', 'solve', 'eigenvalues', 'characteristic', 'power'}
+
+
+# -----------------------------
+# Cost Estimation
+# -----------------------------
+def describe(matrix: Matrix) -> Dict[str, Any]:
+    """
+    Summarize the features of a matrix that drive computation cost.
+
+    Args:
+        matrix: The matrix to describe.
+
+    Returns:
+        Dictionary with rows, cols, density (fraction of non-zero elements),
+        symbolic (number of elements with free symbols), bits (size of the
+        largest rational element) and kind: "numpy" for array-backed matrices,
+        otherwise "symbolic", "float" or "exact".
+    """
+    if matrix.array is not None:
+        density = np.count_nonzero(matrix.array) / matrix.array.size
+        return {'rows': matrix.rows, 'cols': matrix.cols, 'density': density, 'symbolic': 0, 'bits': 0,
+                'kind': 'numpy'}
+    nonzero = symbolic = bits = 0
+    inexact = False
+    for row in matrix.data:
+        for elem in row:
+            if elem.free_symbols:
+                symbolic += 1
+                nonzero += 1
+            elif elem != 0:
+                nonzero += 1
+                inexact = inexact or elem.has(sp.Float)
+                if elem.is_Rational:
+                    bits = max(bits, abs(elem.p).bit_length(), elem.q.bit_length())
+    kind = 'symbolic' if symbolic else 'float' if inexact else 'exact'
+    return {'rows': matrix.rows, 'cols': matrix.cols, 'density': nonzero / (matrix.rows * matrix.cols),
+            'symbolic': symbolic, 'bits': bits, 'kind': kind}
+
+
+def _integer(value: Any) -> Optional[int]:
+    # Exact integer exponents: Python ints and sympy Integers
+    if isinstance(value, int):
+        return int(value)
+    if getattr(value, 'is_Integer', False):
+        return int(value)
+    return None
+
+
+def power_bits(base: Any, exponent: Any) -> int:
+    """
+    Estimate the size in bits of the exact scalar power base ** exponent.
+
+    Only rational bases raised to integer exponents grow with the exponent;
+    floating-point and symbolic powers, and bases 0, 1 and -1, count as 0.
+    """
+    k = _integer(exponent)
+    if k is None:
+        return 0
+    if isinstance(base, int):
+        bits = abs(int(base)).bit_length()
+    elif getattr(base, 'is_Rational', False):
+        bits = max(abs(base.p).bit_length(), base.q.bit_length())
+    else:
+        return 0
+    return abs(k) * bits if bits > 1 else 0
+
+
+def check_scalar_power(base: Any, exponent: Any) -> None:
+    """
+    Refuse an exact scalar power too large to compute.
+
+    Raises:
+        ValueError: If the result would exceed MAX_POWER_BITS.
+    """
+    if power_bits(base, exponent) > MAX_POWER_BITS:
+        raise ValueError(f'Scalar power is too large to compute exactly (limit {MAX_POWER_BITS} bits)')
+
+
+def _work(operation: str, exponent: int, a: Dict[str, Any], b: Optional[Dict[str, Any]]) -> float:
+    if operation == 'multiply' and b is not None:
+        return a['rows'] * a['cols'] * b['cols']
+    if exponent == 2:
+        return a['rows'] * a['cols']
+    return float(a['rows']) ** exponent
+
+
+def _growth(base: float, power: float) -> float:
+    # base ** power, saturating at infinity instead of overflowing for large operands
+    exponent = power * math.log(base)
+    return math.exp(exponent) if exponent < _LOG_MAX_FLOAT else math.inf
+
+
+def _seconds(operation: str, kind: str, a: Dict[str, Any], b: Optional[Dict[str, Any]], scalar: Any) -> float:
+    costs = NUMPY_COSTS if kind == 'numpy' else SYMPY_COSTS
+    coefficient, exponent = costs[operation]
+    seconds = coefficient * _work(operation, exponent, a, b)
+    if kind == 'numpy':
+        if operation == 'power' and isinstance(scalar, (int, float)) and float(scalar).is_integer():
+            seconds *= max(1.0, math.log2(abs(scalar) or 1))  # repeated squaring
+        return seconds
+
+    n = a['rows']
+    density = max(a['density'], b['density'] if b else 0.0)
+    if operation in DENSITY_SENSITIVE:
+        seconds *= max(density, 1.0 / n)
+    if kind == 'symbolic':
+        fraction = max(a['symbolic'] / (a['rows'] * a['cols']), b['symbolic'] / (b['rows'] * b['cols']) if b else 0.0)
+        seconds *= SYMBOLIC_FACTOR * _growth(GROWTH['symbolic'].get(operation, 1.0), n * min(1.0, 2 * fraction))
+    else:
+        seconds *= _growth(GROWTH[kind].get(operation, 1.0), n)
+    k = _integer(scalar) if operation == 'power' else None
+    if k is not None and abs(k) > 1:
+        # Entries of A^k have about k times the bits of A's entries
+        words = math.log2(abs(k)) + math.log2((max(a['bits'], 1) + math.log2(n)) / WORD_BITS)
+        seconds += POWER_WORD_COST * n * n * _growth(2.0, 1.5 * words)
+    return seconds
+
+
+def estimate(operation: str, matrix_a: Matrix, matrix_b: Optional[Matrix] = None,
+             scalar: Any = None, scale: float = 1.0) -> Dict[str, Any]:
+    """
+    Estimate how long an operation will take before running it.
+
+    Args:
+        operation: One of the operations understood by apply_operation.
+        matrix_a: The first operand.
+        matrix_b: The second operand for binary operations.
+        scalar: The scalar or exponent, if any.
+        scale: Multiplier for the fitted costs, to adjust for the host's speed.
+
+    Returns:
+        Dictionary with the operation, the backend that will run it, the
+        estimated seconds (at most MAX_SECONDS), the estimated seconds on the
+        numpy backend if the input could be converted to floating point
+        (otherwise None), and the described operands.
+
+    Raises:
+        ValueError: If the operation is unknown.
+    """
+    if operation not in NUMPY_COSTS:
+        raise ValueError("Invalid operation")
+    a = describe(matrix_a)
+    b = describe(matrix_b) if matrix_b is not None else None
+    kinds = [a['kind']] + ([b['kind']] if b else [])
+    if all(kind == 'numpy' for kind in kinds):
+        kind = 'numpy'
+    else:
+        kind = next((k for k in ('symbolic', 'float', 'exact') if k in kinds))
+    seconds = min(_seconds(operation, kind, a, b, scalar) * scale, MAX_SECONDS)
+    numeric = None
+    if kind != 'symbolic':
+        numeric = seconds if kind == 'numpy' else min(_seconds(operation, 'numpy', a, b, scalar) * scale, MAX_SECONDS)
+    return {'operation': operation, 'backend': kind, 'seconds': seconds, 'numeric_seconds': numeric,
+            'matrixA': a, 'matrixB': b}
+
+
+# -----------------------------
+# Admission Policy Class
+# -----------------------------
+class AdmissionPolicy:
+    """
+    Decides, from a cost estimate, how a request is served.
+
+    Each operation has four limits, falling back to the "default" entry:
+    inline (estimated seconds allowed during the request), queue (estimated
+    seconds allowed for a background job), max_dim (largest row or column
+    count accepted at all) and max_elements (largest number of elements of an
+    exact or symbolic matrix, whose elements are each parsed by sympy). The
+    "downgrade" flag sets whether, for requests that do not say, exact input
+    may be converted to floating point when that brings the cost within the
+    inline limit. The size limits only need a matrix's shape, so check_shape()
+    can apply them to raw input before any of it is parsed.
+
+    Attributes:
+        limits (Dict[str, Dict[str, Any]]): Limits per operation name, plus "default".
+    """
+
+    DEFAULTS = {'inline': 2.0, 'queue': 600.0, 'max_dim': 5000, 'max_elements': 250000, 'downgrade': False}
+
+    def __init__(self, limits: Optional[Dict[str, Dict[str, Any]]] = None) -> None:
+        self.limits = {'default': dict(self.DEFAULTS)}
+        for name, values in (limits or {}).items():
+            self.limits[name] = {**self.limits.get(name, {}), **values}
+
+    def limits_for(self, operation: str) -> Dict[str, Any]:
+        return {**self.limits['default'], **self.limits.get(operation, {})}
+
+    def check_shape(self, operation: str, rows: int, cols: int, kind: str = 'exact') -> Optional[Dict[str, Any]]:
+        """
+        Apply the size limits to a matrix's shape alone.
+
+        Args:
+            operation: The operation the matrix is an operand of.
+            rows: Number of rows.
+            cols: Number of columns.
+            kind: "numpy" for array data, which max_elements does not limit.
+
+        Returns:
+            A rejection as returned by decide(), or None if the shape is accepted.
+        """
+        limits = self.limits_for(operation)
+        if max(rows, cols) > limits['max_dim']:
+            return {'action': 'reject', 'exceeded': 'max_dim', 'limit': limits['max_dim'],
+                    'reason': f"Matrix dimensions exceed the limit of {limits['max_dim']}"}
+        if kind != 'numpy' and rows * cols > limits['max_elements']:
+            return {'action': 'reject', 'exceeded': 'max_elements', 'limit': limits['max_elements'],
+                    'reason': f"Matrix has more than {limits['max_elements']} exact elements"}
+        return None
+
+    def decide(self, cost: Dict[str, Any], can_queue: bool = True, prefer_queue: Optional[bool] = None,
+               exact: Optional[bool] = None) -> Dict[str, Any]:
+        """
+        Choose how to serve a request.
+
+        Args:
+            cost: An estimate from estimate().
+            can_queue: Whether a background job is possible for this request.
+            prefer_queue: True to run as a job if allowed, False to never queue,
+                          None to queue only when too expensive to run inline.
+            exact: True if the client needs an exact answer, False if a
+                   floating-point one will do, None to apply the policy's default.
+
+        Returns:
+            Dictionary with action ("inline", "downgrade", "queue" or "reject"),
+            the estimated seconds of the chosen path and, on rejection, which
+            limit was exceeded ("max_dim", "max_elements", "inline" or "queue"),
+            its value and a reason.
+        """
+        limits = self.limits_for(cost['operation'])
+        seconds = cost['seconds']
+        for operand in (cost['matrixA'], cost['matrixB']):
+            rejected = operand and self.check_shape(cost['operation'], operand['rows'], operand['cols'], operand['kind'])
+            if rejected:
+                return {**rejected, 'seconds': seconds}
+        if can_queue and prefer_queue and seconds <= limits['queue']:
+            return {'action': 'queue', 'seconds': seconds}
+        if seconds <= limits['inline']:
+            return {'action': 'inline', 'seconds': seconds}
+        numeric = cost['numeric_seconds']
+        allow_downgrade = limits['downgrade'] if exact is None else not exact
+        if (allow_downgrade and cost['backend'] != 'numpy'
+                and numeric is not None and numeric <= limits['inline']):
+            return {'action': 'downgrade', 'seconds': numeric}
+        if can_queue and prefer_queue is not False and seconds <= limits['queue']:
+            return {'action': 'queue', 'seconds': seconds}
+        exceeded = 'queue' if can_queue and prefer_queue is not False else 'inline'
+        limit = limits[exceeded]
+        return {'action': 'reject', 'seconds': seconds, 'exceeded': exceeded, 'limit': limit,
+                'reason': f"Estimated cost of {seconds:.3g}s exceeds the limit of {limit:g}s"}
@@ -0,0 +1,557 @@
+import re
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from Matrixcodes import Matrix
+from Matrixcost import check_scalar_power
+
+# Functions available in expressions, with their number of arguments
+FUNCTIONS = {'inv': 1, 'transpose': 1, 'det': 1, 'trace': 1, 'solve': 2}
+MAX_EXPANDED_POWER = 1024  # larger integer powers are left to Matrix.power
+
+_TOKEN = re.compile(r'\s*(?:(\d+\.?\d*(?:[eE][-+]?\d+)?|\.\d+(?:[eE][-+]?\d+)?)|([A-Za-z_]\w*)|"([^"]+)"|(\S))')
+
+# Expression trees are nested tuples, so that equal subexpressions compare and
+# hash equal and can be evaluated once. Parsed trees use:
+#   ('num', value), ('ref', name), ('neg', x), ('add', a, b), ('sub', a, b),
+#   ('mul', a, b), ('div', a, b), ('pow', a, b) and (function, *args).
+# Planned trees separate matrix operations from scalar arithmetic:
+#   matrix: ('madd', a, b), ('msub', a, b), ('matmul', a, b), ('scale', s, m),
+#           ('mpow', m, k), ('inv', m), ('transpose', m), ('solve', a, b)
+#   scalar: ('num', v), ('neg', x), ('add' | 'sub' | 'mul' | 'div' | 'pow', a, b),
+#           ('det', m), ('trace', m)
+
+# Matrix operation run for each planned node, as understood by apply_operation
+_OPERATIONS = {
+    'madd': 'add', 'msub': 'subtract', 'matmul': 'multiply', 'scale': 'scalar_multiply',
+    'mpow': 'power', 'inv': 'inverse', 'transpose': 'transpose', 'solve': 'solve',
+    'det': 'determinant', 'trace': 'trace',
+}
+
+
+# -----------------------------
+# Parsing
+# -----------------------------
+class _Parser:
+    """
+    Recursive descent parser for matrix expressions.
+
+    Grammar, loosest binding first:
+        expr   := term (('+' | '-') term)*
+        term   := unary (('*' | '/') unary)*
+        unary  := '-' unary | power
+        power  := atom ('^' unary)?
+        atom   := number | name | "quoted name" | function '(' expr (',' expr)* ')' | '(' expr ')'
+    """
+
+    def __init__(self, text: str) -> None:
+        self.tokens = []
+        for number, name, quoted, symbol in _TOKEN.findall(text):
+            if number:
+                value = float(number)
+                self.tokens.append(('num', int(value) if value.is_integer() and '.' not in number
+                                    and 'e' not in number.lower() else value))
+            elif name or quoted:
+                self.tokens.append(('name', name or quoted))
+            else:
+                self.tokens.append(('op', symbol))
+        self.pos = 0
+
+    def peek(self) -> Optional[Tuple[str, Any]]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self, symbol: Optional[str] = None) -> Tuple[str, Any]:
+        token = self.peek()
+        if token is None:
+            raise ValueError('Unexpected end of expression')
+        if symbol is not None and token != ('op', symbol):
+            raise ValueError(f"Expected '{symbol}' but found '{token[1]}'")
+        self.pos += 1
+        return token
+
+    def at(self, *symbols: str) -> bool:
+        token = self.peek()
+        return token is not None and token[0] == 'op' and token[1] in symbols
+
+    def parse(self) -> tuple:
+        if not self.tokens:
+            raise ValueError('Expression is empty')
+        node = self.expr()
+        if self.peek() is not None:
+            raise ValueError(f"Unexpected '{self.peek()[1]}'")
+        return node
+
+    def expr(self) -> tuple:
+        node = self.term()
+        while self.at('+', '-'):
+            op = 'add' if self.take()[1] == '+' else 'sub'
+            node = (op, node, self.term())
+        return node
+
+    def term(self) -> tuple:
+        node = self.unary()
+        while self.at('*', '/'):
+            op = 'mul' if self.take()[1] == '*' else 'div'
+            node = (op, node, self.unary())
+        return node
+
+    def unary(self) -> tuple:
+        if self.at('-'):
+            self.take()
+            return ('neg', self.unary())
+        if self.at('+'):
+            self.take()
+            return self.unary()
+        return self.power()
+
+    def power(self) -> tuple:
+        node = self.atom()
+        if self.at('^'):
+            self.take()
+            return ('pow', node, self.unary())
+        return node
+
+    def atom(self) -> tuple:
+        kind, value = self.take()
+        if kind == 'num':
+            return ('num', value)
+        if kind == 'name':
+            if self.at('('):
+                if value not in FUNCTIONS:
+                    raise ValueError(f'Unknown function {value}()')
+                self.take('(')
+                args = [self.expr()]
+                while self.at(','):
+                    self.take()
+                    args.append(self.expr())
+                self.take(')')
+                if len(args) != FUNCTIONS[value]:
+                    raise ValueError(f"{value}() takes {FUNCTIONS[value]} argument(s)")
+                return (value, *args)
+            return ('ref', value)
+        if value == '(':
+            node = self.expr()
+            self.take(')')
+            return node
+        raise ValueError(f"Unexpected '{value}'")
+
+
+@lru_cache(maxsize=256)
+def parse(text: str) -> tuple:
+    """
+    Parse a matrix expression such as "inv(A) * B + transpose(C)^2 - 3*D".
+
+    Names refer to matrices; names containing spaces or symbols can be written
+    in double quotes. Results are memoized, so repeated expressions skip parsing.
+
+    Args:
+        text: The expression.
+
+    Returns:
+        The expression tree.
+
+    Raises:
+        ValueError: If the expression is malformed.
+    """
+    return _Parser(text).parse()
+
+
+def references(node: tuple) -> Set[str]:
+    """
+    Return the names of all matrices an expression refers to.
+    """
+    if node[0] == 'ref':
+        return {node[1]}
+    if node[0] == 'num':
+        return set()
+    names = set()
+    for child in node[1:]:
+        if isinstance(child, tuple):
+            names |= references(child)
+    return names
+
+
+# -----------------------------
+# Planning
+# -----------------------------
+def _power(base: Any, exponent: Any) -> Any:
+    """
+    Raise a scalar to a power, within the cost model's bound on exact powers.
+    """
+    check_scalar_power(base, exponent)
+    try:
+        return base ** exponent
+    except OverflowError:
+        raise ValueError('Scalar power overflows')
+    except ZeroDivisionError:
+        raise ValueError('Division by zero')
+
+
+def _constant(node: tuple) -> Optional[float]:
+    """
+    Fold a scalar expression made only of numbers, or return None.
+    """
+    kind = node[0]
+    if kind == 'num':
+        return node[1]
+    if kind == 'neg':
+        value = _constant(node[1])
+        return None if value is None else -value
+    if kind in ('add', 'sub', 'mul', 'div', 'pow'):
+        a, b = _constant(node[1]), _constant(node[2])
+        if a is None or b is None:
+            return None
+        if kind == 'add':
+            return a + b
+        if kind == 'sub':
+            return a - b
+        if kind == 'mul':
+            return a * b
+        if kind == 'div':
+            if b == 0:
+                raise ValueError('Division by zero')
+            return a / b
+        return _power(a, b)
+    return None
+
+
+def _fold(node: tuple) -> tuple:
+    value = _constant(node)
+    return node if value is None else ('num', value)
+
+
+def _dims(shape: Tuple[int, int]) -> str:
+    return f'{shape[0]}x{shape[1]}'
+
+
+def _check(node: tuple, shapes: Dict[str, Tuple[int, int]]) -> Tuple[tuple, Optional[Tuple[int, int]]]:
+    """
+    Type-check a parsed tree and translate it into planned node types.
+
+    Returns:
+        The translated tree and its shape (None for a scalar).
+    """
+    kind = node[0]
+    if kind == 'num':
+        return node, None
+    if kind == 'ref':
+        if node[1] not in shapes:
+            raise ValueError(f'Matrix {node[1]} not found')
+        return node, shapes[node[1]]
+    if kind == 'neg':
+        x, shape = _check(node[1], shapes)
+        return (('neg', x), None) if shape is None else (('scale', ('num', -1), x), shape)
+
+    if kind in ('add', 'sub'):
+        (a, sa), (b, sb) = _check(node[1], shapes), _check(node[2], shapes)
+        if sa is None and sb is None:
+            return (kind, a, b), None
+        if sa is None or sb is None:
+            raise ValueError('Cannot add or subtract a scalar and a matrix')
+        if sa != sb:
+            raise ValueError(f'Matrix dimensions must agree for addition and subtraction: {_dims(sa)} and {_dims(sb)}')
+        if kind == 'add':
+            a, b = sorted((a, b), key=repr)  # A+B and B+A share one evaluation
+            return ('madd', a, b), sa
+        return ('msub', a, b), sa
+
+    if kind == 'mul':
+        (a, sa), (b, sb) = _check(node[1], shapes), _check(node[2], shapes)
+        if sa is None and sb is None:
+            return ('mul', a, b), None
+        if sa is None:
+            return ('scale', a, b), sb
+        if sb is None:
+            return ('scale', b, a), sa
+        if sa[1] != sb[0]:
+            raise ValueError(f'Cannot multiply a {_dims(sa)} matrix by a {_dims(sb)} matrix')
+        return ('matmul', a, b), (sa[0], sb[1])
+
+    if kind == 'div':
+        (a, sa), (b, sb) = _check(node[1], shapes), _check(node[2], shapes)
+        if sb is not None:
+            raise ValueError('Cannot divide by a matrix; use inv() or solve()')
+        if sa is None:
+            return ('div', a, b), None
+        return ('scale', ('div', ('num', 1), b), a), sa
+
+    if kind == 'pow':
+        (base, shape), (exponent, es) = _check(node[1], shapes), _check(node[2], shapes)
+        if es is not None:
+            raise ValueError('Exponents must be scalars')
+        if shape is None:
+            return ('pow', base, exponent), None
+        k = _constant(exponent)
+        if k is None:
+            raise ValueError('Matrix exponents must be constant numbers')
+        if shape[0] != shape[1]:
+            raise ValueError('Matrix powers are defined only for square matrices')
+        if k == -1:
+            return ('inv', base), shape
+        return ('mpow', base, k), shape
+
+    args = [_check(arg, shapes) for arg in node[1:]]
+    for _, shape in args:
+        if shape is None:
+            raise ValueError(f'{kind}() expects matrix arguments')
+    (a, sa) = args[0]
+    if kind == 'transpose':
+        return ('transpose', a), (sa[1], sa[0])
+    if sa[0] != sa[1]:
+        raise ValueError(f'{kind}() is defined only for square matrices')
+    if kind == 'inv':
+        return ('inv', a), sa
+    if kind in ('det', 'trace'):
+        return (kind, a), None
+    (b, sb) = args[1]
+    if sb[0] != sa[0]:
+        raise ValueError(f'solve() needs a right-hand side with {sa[0]} rows')
+    return ('solve', a, b), sb
+
+
+def _shape(node: tuple, shapes: Dict[str, Tuple[int, int]]) -> Optional[Tuple[int, int]]:
+    kind = node[0]
+    if kind == 'ref':
+        return shapes[node[1]]
+    if kind in ('madd', 'msub', 'inv', 'mpow'):
+        return _shape(node[1], shapes)
+    if kind == 'scale':
+        return _shape(node[2], shapes)
+    if kind == 'transpose':
+        rows, cols = _shape(node[1], shapes)
+        return cols, rows
+    if kind == 'matmul':
+        return _shape(node[1], shapes)[0], _shape(node[2], shapes)[1]
+    if kind == 'solve':
+        return _shape(node[2], shapes)
+    return None
+
+
+def _chain_order(factors: List[tuple], dims: List[int]) -> tuple:
+    """
+    Parenthesize a product chain with the fewest scalar multiplications.
+
+    Classic O(k^3) dynamic program over the k factors, where factor i has
+    shape dims[i] x dims[i + 1].
+    """
+    k = len(factors)
+    cost = [[0] * k for _ in range(k)]
+    split = [[0] * k for _ in range(k)]
+    for length in range(2, k + 1):
+        for i in range(k - length + 1):
+            j = i + length - 1
+            cost[i][j] = None
+            for s in range(i, j):
+                c = cost[i][s] + cost[s + 1][j] + dims[i] * dims[s + 1] * dims[j + 1]
+                if cost[i][j] is None or c < cost[i][j]:
+                    cost[i][j], split[i][j] = c, s
+
+    def build(i, j):
+        if i == j:
+            return factors[i]
+        return ('matmul', build(i, split[i][j]), build(split[i][j] + 1, j))
+    return build(0, k - 1)
+
+
+def _reorder(node: tuple, shapes: Dict[str, Tuple[int, int]]) -> tuple:
+    """
+    Re-associate every product chain optimally, pulling scalar factors out.
+    """
+    kind = node[0]
+    if kind in ('num', 'ref'):
+        return node
+    if kind == 'scale':
+        scalar, matrix = _reorder(node[1], shapes), _reorder(node[2], shapes)
+        if matrix[0] == 'scale':
+            scalar, matrix = ('mul', scalar, matrix[1]), matrix[2]
+        return ('scale', _fold(scalar), matrix)
+    if kind != 'matmul':
+        return (kind, *[_reorder(child, shapes) if isinstance(child, tuple) else child for child in node[1:]])
+
+    factors, scalars = [], []
+
+    def collect(n):
+        if n[0] == 'matmul':
+            collect(n[1])
+            collect(n[2])
+        elif n[0] == 'scale':
+            scalars.append(_reorder(n[1], shapes))
+            collect(n[2])
+        else:
+            factors.append(_reorder(n, shapes))
+    collect(node)
+    dims = [_shape(factors[0], shapes)[0]] + [_shape(f, shapes)[1] for f in factors]
+    product = _chain_order(factors, dims)
+    if not scalars:
+        return product
+    scalar = scalars[0]
+    for s in scalars[1:]:
+        scalar = ('mul', scalar, s)
+    return ('scale', _fold(scalar), product)
+
+
+def _use_solve(node: tuple) -> tuple:
+    """
+    Rewrite products with an inverse into linear solves:
+    inv(A)*B becomes solve(A, B) and B*inv(A) becomes transpose(solve(transpose(A), transpose(B))).
+    """
+    if node[0] in ('num', 'ref'):
+        return node
+    node = (node[0], *[_use_solve(child) if isinstance(child, tuple) else child for child in node[1:]])
+    if node[0] == 'matmul':
+        left, right = node[1], node[2]
+        if left[0] == 'inv':
+            return ('solve', left[1], right)
+        if right[0] == 'inv':
+            return ('transpose', ('solve', ('transpose', right[1]), ('transpose', left)))
+    return node
+
+
+def _expand_powers(node: tuple) -> tuple:
+    """
+    Replace integer matrix powers by repeated squaring, sharing the squares.
+    """
+    if node[0] in ('num', 'ref'):
+        return node
+    node = (node[0], *[_expand_powers(child) if isinstance(child, tuple) else child for child in node[1:]])
+    if node[0] != 'mpow':
+        return node
+    base, k = node[1], node[2]
+    if not float(k).is_integer() or k == 0 or abs(k) > MAX_EXPANDED_POWER:
+        return node
+    result, square, n = None, base, abs(int(k))
+    while n:
+        if n & 1:
+            result = square if result is None else ('matmul', result, square)
+        n >>= 1
+        if n:
+            square = ('matmul', square, square)
+    return ('inv', result) if k < 0 else result
+
+
+def plan(node: tuple, shapes: Dict[str, Tuple[int, int]], expand_powers: bool = False) -> tuple:
+    """
+    Check an expression against the operand shapes and optimize it.
+
+    The planner orders every product chain to minimize work (matrix-chain
+    dynamic programming), rewrites multiplications by an inverse into linear
+    solves and, if asked, turns integer powers into repeated squaring. Equal
+    subexpressions become equal subtrees, which evaluate() computes once.
+
+    Args:
+        node: A tree from parse().
+        shapes: (rows, cols) of every matrix the expression refers to.
+        expand_powers: Replace integer powers by multiplications; worthwhile
+                       for exact arithmetic, where Matrix.power diagonalizes.
+
+    Returns:
+        The planned tree.
+
+    Raises:
+        ValueError: If a matrix is unknown or the shapes do not fit.
+    """
+    planned, _ = _check(node, shapes)
+    planned = _use_solve(_reorder(planned, shapes))
+    if expand_powers:
+        planned = _expand_powers(planned)
+    return planned
+
+
+# -----------------------------
+# Evaluation
+# -----------------------------
+def evaluate(node: tuple, matrices: Dict[str, Matrix],
+             run: Callable[[str, Matrix, Optional[Matrix], Any], Any]) -> Tuple[Any, Dict[str, int]]:
+    """
+    Evaluate a planned expression, computing each distinct subexpression once.
+
+    Args:
+        node: A tree from plan().
+        matrices: The matrices referred to, by name.
+        run: Called as run(operation, matrix_a, matrix_b, scalar) for every
+             matrix operation, with the operation names of apply_operation.
+
+    Returns:
+        A tuple of the result (a Matrix or a scalar) and a dictionary with the
+        number of operations run ("steps") and of repeated subexpressions that
+        were reused instead ("reused").
+    """
+    memo: Dict[tuple, Any] = {}
+    stats = {'steps': 0, 'reused': 0}
+
+    def ev(n):
+        if n in memo:
+            if n[0] not in ('num', 'ref'):
+                stats['reused'] += 1
+            return memo[n]
+        kind = n[0]
+        if kind == 'num':
+            value = n[1]
+        elif kind == 'ref':
+            value = matrices[n[1]]
+        elif kind == 'neg':
+            value = -ev(n[1])
+        elif kind == 'add':
+            value = ev(n[1]) + ev(n[2])
+        elif kind == 'sub':
+            value = ev(n[1]) - ev(n[2])
+        elif kind == 'mul':
+            value = ev(n[1]) * ev(n[2])
+        elif kind == 'div':
+            divisor = ev(n[2])
+            if divisor == 0:
+                raise ValueError('Division by zero')
+            value = ev(n[1]) / divisor
+        elif kind == 'pow':
+            value = _power(ev(n[1]), ev(n[2]))
+        elif kind == 'scale':
+            value = run('scalar_multiply', ev(n[2]), None, ev(n[1]))
+        elif kind == 'mpow':
+            value = run('power', ev(n[1]), None, n[2])
+        elif kind in ('madd', 'msub', 'matmul', 'solve'):
+            value = run(_OPERATIONS[kind], ev(n[1]), ev(n[2]), None)
+        else:
+            value = run(_OPERATIONS[kind], ev(n[1]), None, None)
+        if kind not in ('num', 'ref', 'neg', 'add', 'sub', 'mul', 'div', 'pow'):
+            stats['steps'] += 1
+        memo[n] = value
+        return value
+
+    return ev(node), stats
+
+
+# -----------------------------
+# Printing
+# -----------------------------
+_PRECEDENCE = {'add': 1, 'sub': 1, 'madd': 1, 'msub': 1, 'mul': 2, 'div': 2, 'matmul': 2, 'scale': 2,
+               'neg': 3, 'pow': 4, 'mpow': 4}
+_SYMBOLS = {'add': '+', 'madd': '+', 'sub': '-', 'msub': '-', 'mul': '*', 'matmul': '*', 'scale': '*',
+            'div': '/', 'pow': '^', 'mpow': '^'}
+
+
+def unparse(node: tuple) -> str:
+    """
+    Format a parsed or planned tree as an expression, e.g. to show a plan.
+    """
+    kind = node[0]
+    if kind == 'num':
+        return repr(node[1])
+    if kind == 'ref':
+        name = node[1]
+        return name if re.fullmatch(r'[A-Za-z_]\w*', name) else f'"{name}"'
+    if kind not in _PRECEDENCE:
+        return f"{kind}({', '.join(unparse(arg) for arg in node[1:])})"
+
+    precedence = _PRECEDENCE[kind]
+
+    def operand(child, right=False):
+        text = unparse(child) if isinstance(child, tuple) else repr(child)
+        inner = _PRECEDENCE.get(child[0]) if isinstance(child, tuple) else None
+        if inner is not None and (inner < precedence or (right and inner == precedence and kind not in ('madd', 'add'))
+                                  or (kind in ('pow', 'mpow') and inner == precedence)):
+            return f'({text})'
+        return text
+
+    if kind == 'neg':
+        return f'-{operand(node[1])}'
+    return f'{operand(node[1])} {_SYMBOLS[kind]} {operand(node[2], right=True)}'
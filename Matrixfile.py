@@ -0,0 +1,240 @@
+import ast
+import json
+import mmap
+import os
+import stat
+import struct
+import tempfile
+from typing import Any, Dict, Iterable, List, Optional
+
+from Matrixcodes import Matrix, LazyModule
+
+np = LazyModule('numpy', globals(), 'np')
+sp = LazyModule('sympy', globals(), 'sp')
+
+# File layout, version 1 (all integers little-endian):
+#   header  magic "MTXF", u16 version, u16 flags (0), u64 index offset, u64 index length
+#   blocks  one per matrix, each starting on a BLOCK_ALIGN boundary: raw C-order array
+#           bytes for numeric blocks, or a JSON list of srepr strings (row-major)
+#   index   JSON {"matrices": [{"name", "rows", "cols", "backend", "dtype", "offset", "length"}]}
+# The index is written last, so a file is streamed out in one pass and a reader
+# needs only the header and the index to find any one matrix.
+MAGIC = b'MTXF'
+FORMAT_VERSION = 1
+_HEADER = struct.Struct('<4sHHQQ')
+BLOCK_ALIGN = 64  # numeric blocks can be mapped as aligned arrays
+SREPR = 'srepr'
+_INT64 = (-2 ** 63, 2 ** 63 - 1)
+
+
+# -----------------------------
+# Element Encoding
+# -----------------------------
+def _encode(matrix: Matrix):
+    """
+    Choose the block for a matrix: (backend, dtype, bytes).
+
+    Array-backed matrices keep their array. Sympy matrices of 64-bit integers
+    or of double-precision floats are stored as arrays too, and come back as
+    the same exact sympy elements; anything else is stored as srepr text.
+    """
+    if matrix.array is not None:
+        array = matrix.array
+        array = np.ascontiguousarray(array, dtype=array.dtype.newbyteorder('<'))
+        return 'array', array.dtype.str, array.tobytes()
+
+    elements = [elem for row in matrix.data for elem in row]
+    if all(elem.is_Integer and _INT64[0] <= elem <= _INT64[1] for elem in elements):
+        return 'sympy', '<i8', np.array([int(elem) for elem in elements], dtype='<i8').tobytes()
+    # Float equality includes precision, so this holds only for double-precision values
+    if all(elem.is_Float and sp.Float(float(elem)) == elem for elem in elements):
+        return 'sympy', '<f8', np.array([float(elem) for elem in elements], dtype='<f8').tobytes()
+    return 'sympy', SREPR, json.dumps([sp.srepr(elem) for elem in elements]).encode()
+
+
+def _from_srepr(text: str) -> Any:
+    """
+    Rebuild a sympy expression from its srepr without evaluating code.
+
+    Only literals, sympy constants and calls of sympy classes are accepted,
+    so a file cannot run arbitrary Python the way eval or pickle would allow.
+    """
+    return _build(ast.parse(text, mode='eval').body)
+
+
+def _build(node: ast.AST) -> Any:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float, str, bool, type(None))):
+        return node.value
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        return -_build(node.operand)
+    if isinstance(node, ast.Name) and isinstance(getattr(sp, node.id, None), sp.Basic):
+        return getattr(sp, node.id)  # constants such as pi, I and oo
+    if isinstance(node, ast.Tuple):
+        return tuple(_build(elt) for elt in node.elts)
+    if isinstance(node, ast.Call):
+        if isinstance(node.func, ast.Name):
+            func = getattr(sp, node.func.id, None)
+        else:
+            func = _build(node.func)  # e.g. Function('f')(Symbol('x'))
+        if isinstance(func, type) and issubclass(func, sp.Basic):
+            args = [_build(arg) for arg in node.args]
+            kwargs = {kw.arg: _build(kw.value) for kw in node.keywords}
+            return func(*args, **kwargs)
+    raise ValueError(f'Unsupported expression in matrix file: {ast.dump(node)[:80]}')
+
+
+def _decode(entry: Dict[str, Any], buffer, mapped: bool) -> Matrix:
+    """
+    Build the Matrix for an index entry from the file's bytes.
+    """
+    rows, cols, offset, length = entry['rows'], entry['cols'], entry['offset'], entry['length']
+    if entry['dtype'] == SREPR:
+        elements = [_from_srepr(text) for text in json.loads(bytes(buffer[offset:offset + length]))]
+        return Matrix([elements[i * cols:(i + 1) * cols] for i in range(rows)])
+    array = np.frombuffer(buffer, dtype=entry['dtype'], count=rows * cols, offset=offset).reshape(rows, cols)
+    if entry['backend'] == 'array':
+        return Matrix.from_array(array if mapped else array.copy())
+    return Matrix(array.tolist())
+
+
+# -----------------------------
+# Reading and Writing
+# -----------------------------
+def _file_mode(path: str) -> int:
+    """
+    Return the permission bits of an existing file, or those open() would give a new one.
+    """
+    try:
+        return stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        umask = os.umask(0)
+        os.umask(umask)
+        return 0o666 & ~umask
+
+
+def save(path: str, matrices: Dict[str, Matrix]) -> None:
+    """
+    Write named matrices to a binary matrix file, replacing it atomically.
+
+    Args:
+        path: Destination file.
+        matrices: Matrices by name, in the order to store them.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        # mkstemp creates the file private; give it the permissions the file had or a new file would get
+        os.chmod(tmp, _file_mode(path))
+        with os.fdopen(fd, 'wb') as f:
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, 0, 0))
+            entries = []
+            for name, matrix in matrices.items():
+                backend, dtype, block = _encode(matrix)
+                f.write(b'\0' * (-f.tell() % BLOCK_ALIGN))
+                entries.append({'name': name, 'rows': matrix.rows, 'cols': matrix.cols, 'backend': backend,
+                                'dtype': dtype, 'offset': f.tell(), 'length': len(block)})
+                f.write(block)
+            index = json.dumps({'matrices': entries}).encode()
+            index_offset = f.tell()
+            f.write(index)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, 0, index_offset, len(index)))
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def is_matrix_file(path: str) -> bool:
+    """
+    Return True if the file starts with the binary matrix file signature.
+    """
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+class MatrixFile:
+    """
+    A binary matrix file opened for reading.
+
+    Only the header and the index are read on opening; each matrix is decoded
+    when asked for. The file is memory-mapped, so numeric blocks are read
+    straight from the page cache.
+
+    Attributes:
+        path (str): The file.
+        entries (Dict[str, Dict[str, Any]]): Index entries by matrix name.
+
+    Examples:
+        >>> with MatrixFile('workspace.mtx') as f:
+        ...     a = f.matrix('A')
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, 'rb') as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if len(self._map) < _HEADER.size:
+                raise ValueError(f'{path} is not a matrix file')
+            magic, version, _, index_offset, index_length = _HEADER.unpack_from(self._map)
+            if magic != MAGIC:
+                raise ValueError(f'{path} is not a matrix file')
+            if version > FORMAT_VERSION:
+                raise ValueError(f'{path} uses format version {version}; this version reads up to {FORMAT_VERSION}')
+            index = json.loads(bytes(self._map[index_offset:index_offset + index_length]))
+        except BaseException:
+            self._map.close()
+            raise
+        self.entries = {entry['name']: entry for entry in index['matrices']}
+
+    def names(self) -> List[str]:
+        return list(self.entries)
+
+    def matrix(self, name: str, mapped: bool = False) -> Matrix:
+        """
+        Load one matrix.
+
+        Args:
+            name: Name of the matrix.
+            mapped: Back numeric arrays directly by the file mapping instead
+                    of copying them; the file then stays mapped while they live.
+
+        Raises:
+            KeyError: If the file has no matrix of that name.
+        """
+        return _decode(self.entries[name], self._map, mapped)
+
+    def close(self) -> None:
+        # Arrays still viewing the mapping keep it alive until they are released
+        try:
+            self._map.close()
+        except BufferError:
+            pass
+
+    def __enter__(self) -> 'MatrixFile':
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def load(path: str, names: Optional[Iterable[str]] = None, mapped: bool = False) -> Dict[str, Matrix]:
+    """
+    Read matrices from a binary matrix file.
+
+    Args:
+        path: The file.
+        names: Load only these matrices; all of them if None.
+        mapped: See MatrixFile.matrix.
+
+    Returns:
+        Matrices by name, in file order.
+
+    Raises:
+        ValueError: If the file is not a matrix file or is too new.
+        KeyError: If a requested name is missing.
+    """
+    with MatrixFile(path) as f:
+        wanted = f.names() if names is None else list(names)
+        return {name: f.matrix(name, mapped) for name in wanted}
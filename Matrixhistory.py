@@ -0,0 +1,230 @@
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from Matrixcodes import Matrix
+
+# Edits that change at most this fraction of a matrix's cells, without changing
+# its shape, are recorded as cell deltas instead of whole snapshots
+DELTA_MAX_FRACTION = 0.25
+
+
+# -----------------------------
+# Change Encoding
+# -----------------------------
+def diff(before: Optional[List[List[Any]]], after: Optional[List[List[Any]]]) -> Dict[str, Any]:
+    """
+    Encode the change from one version of a matrix to the next.
+
+    Args:
+        before: The previous rows, or None if the matrix did not exist.
+        after: The new rows, or None if the matrix was deleted.
+
+    Returns:
+        {"delta": [[row, col, old, new], ...]} for a small edit of a matrix
+        that keeps its shape, otherwise {"before": before, "after": after}.
+        Snapshots share the row lists they are given, so callers must treat
+        rows as immutable (copy on write).
+    """
+    if before is not None and after is not None and len(before) == len(after) and before:
+        cells = len(before) * len(before[0])
+        if all(len(old) == len(new) for old, new in zip(before, after)):
+            delta = []
+            for i, (old_row, new_row) in enumerate(zip(before, after)):
+                if old_row is new_row:
+                    continue
+                for j, (old, new) in enumerate(zip(old_row, new_row)):
+                    if old != new or type(old) is not type(new):
+                        delta.append([i, j, old, new])
+                if len(delta) > cells * DELTA_MAX_FRACTION:
+                    break
+            else:
+                return {'delta': delta}
+    return {'before': before, 'after': after}
+
+
+def patch(rows: List[List[Any]], delta: List[List[Any]], reverse: bool = False) -> List[List[Any]]:
+    """
+    Apply a cell delta, copying only the rows it touches.
+
+    Args:
+        rows: The rows the delta applies to.
+        delta: Cells as [row, col, old, new].
+        reverse: Restore the old values instead of writing the new ones.
+
+    Returns:
+        New rows; untouched rows are shared with the input.
+    """
+    result = list(rows)
+    copied = set()
+    for i, j, old, new in delta:
+        if i not in copied:
+            result[i] = list(result[i])
+            copied.add(i)
+        result[i][j] = old if reverse else new
+    return result
+
+
+def apply(rows: Optional[List[List[Any]]], change: Dict[str, Any]) -> Optional[List[List[Any]]]:
+    """
+    Return the rows after a change, given the rows before it.
+    """
+    return patch(rows, change['delta']) if 'delta' in change else change['after']
+
+
+def revert(rows: Optional[List[List[Any]]], change: Dict[str, Any]) -> Optional[List[List[Any]]]:
+    """
+    Return the rows before a change, given the rows after it.
+    """
+    return patch(rows, change['delta'], reverse=True) if 'delta' in change else change['before']
+
+
+def describe(change: Dict[str, Any]) -> str:
+    """
+    Name the kind of change: "create", "edit" or "delete".
+    """
+    if 'delta' in change:
+        return 'edit'
+    if change['before'] is None:
+        return 'create'
+    return 'delete' if change['after'] is None else 'edit'
+
+
+# -----------------------------
+# Versioned Matrices Class
+# -----------------------------
+class VersionedMatrices(MutableMapping):
+    """
+    A dictionary of named matrices that remembers every change.
+
+    Assigning or deleting a name records a revision. Revisions form one line
+    with a head: undo() and redo() move the head by one revision, in time
+    independent of the length of the history, and a new change after an undo
+    discards the revisions that could have been redone. Small edits are kept
+    as cell deltas; other changes keep references to the immutable Matrix
+    objects involved, so unchanged matrices are never copied.
+
+    Attributes:
+        limit (int): Number of revisions kept; older ones are forgotten.
+
+    Examples:
+        >>> matrices = VersionedMatrices()
+        >>> matrices['A'] = Matrix([[1, 2], [3, 4]])
+        >>> del matrices['A']
+        >>> matrices.undo()
+        ('A', 'delete')
+        >>> 'A' in matrices
+        True
+    """
+
+    def __init__(self, limit: int = 1000) -> None:
+        self.limit = limit
+        self._current: Dict[str, Matrix] = {}
+        self._log: List[Tuple[str, Dict[str, Any]]] = []  # (name, change) per revision
+        self._head = 0   # number of revisions in _log currently applied
+        self._base = 0   # revisions forgotten before _log[0]
+
+    @property
+    def revision(self) -> int:
+        """
+        The number of the latest applied revision (0 before any change).
+        """
+        return self._base + self._head
+
+    def __getitem__(self, name: str) -> Matrix:
+        return self._current[name]
+
+    def __setitem__(self, name: str, matrix: Matrix) -> None:
+        before = self._current.get(name)
+        self._current[name] = matrix
+        self._record(name, before, matrix)
+
+    def __delitem__(self, name: str) -> None:
+        before = self._current.pop(name)
+        self._record(name, before, None)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._current)
+
+    def __len__(self) -> int:
+        return len(self._current)
+
+    def _record(self, name: str, before: Optional[Matrix], after: Optional[Matrix]) -> None:
+        del self._log[self._head:]
+        change = {'before': before, 'after': after}
+        if before is not None and after is not None and before.rows == after.rows and before.cols == after.cols:
+            encoded = diff(before.data, after.data)
+            if 'delta' in encoded:
+                change = encoded
+        self._log.append((name, change))
+        self._head += 1
+        if len(self._log) > self.limit:
+            del self._log[0]
+            self._base += 1
+            self._head -= 1
+
+    def _restore(self, name: str, matrix: Optional[Matrix]) -> None:
+        if matrix is None:
+            self._current.pop(name, None)
+        else:
+            self._current[name] = matrix
+
+    def _undone(self, name: str, change: Dict[str, Any], current: Optional[Matrix]) -> Optional[Matrix]:
+        return Matrix(revert(current.data, change)) if 'delta' in change else change['before']
+
+    def undo(self) -> Optional[Tuple[str, str]]:
+        """
+        Revert the latest applied revision.
+
+        Returns:
+            Tuple of (matrix name, kind of change undone), or None if there is
+            nothing to undo.
+        """
+        if self._head == 0:
+            return None
+        self._head -= 1
+        name, change = self._log[self._head]
+        self._restore(name, self._undone(name, change, self._current.get(name)))
+        return name, describe(change)
+
+    def redo(self) -> Optional[Tuple[str, str]]:
+        """
+        Re-apply the revision most recently undone.
+
+        Returns:
+            Tuple of (matrix name, kind of change redone), or None if there is
+            nothing to redo.
+        """
+        if self._head == len(self._log):
+            return None
+        name, change = self._log[self._head]
+        self._head += 1
+        current = self._current.get(name)
+        self._restore(name, Matrix(apply(current.data, change)) if 'delta' in change else change['after'])
+        return name, describe(change)
+
+    def at(self, revision: int) -> Dict[str, Matrix]:
+        """
+        Read every matrix as it was at a revision.
+
+        The state is rebuilt from the current one by reverting later revisions,
+        so the cost grows with how far back the revision is.
+
+        Args:
+            revision: A revision number between the oldest kept and the current one.
+
+        Returns:
+            Dictionary mapping names to matrices.
+
+        Raises:
+            ValueError: If the revision is not available.
+        """
+        if not self._base <= revision <= self.revision:
+            raise ValueError(f'Revision {revision} is not available')
+        state = dict(self._current)
+        for name, change in reversed(self._log[revision - self._base:self._head]):
+            matrix = self._undone(name, change, state.get(name))
+            if matrix is None:
+                state.pop(name, None)
+            else:
+                state[name] = matrix
+        return state
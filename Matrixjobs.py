@@ -0,0 +1,356 @@
+import json
+import multiprocessing
+import os
+import signal
+import threading
+import time
+import uuid
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from Matrixcodes import Progress, reporting
+from Matrixstore import _schema_connection
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (DONE, FAILED, CANCELLED)
+
+SWEEP_INTERVAL = 5.0  # seconds between checks for jobs left running by a runner that died
+INTERRUPTED = 'Job was interrupted by a server restart'
+
+
+class QueueFullError(Exception):
+    """Raised when a job is submitted while the queue is at capacity."""
+
+
+# -----------------------------
+# Job Queue Class
+# -----------------------------
+class JobQueue:
+    """
+    A pool of job-runner processes for long-running computations.
+
+    Jobs are rows of a SQLite table: submitting a job inserts it as queued, and
+    runner processes claim queued jobs in priority order, run them and store
+    their result or error. Runners are separate processes, so a CPU-bound job
+    never holds the interpreter lock of the process serving requests, and as
+    the queue lives in the table, a queued job waits there until some runner
+    takes it, even if the process that submitted it has exited.
+
+    Every process using the queue starts its own runners on first use. They
+    exit with it; close() lets them finish their current jobs first. A job left
+    running by a runner that died is marked failed, by the process that started
+    the runner or, if that process is gone too, by the other runners.
+
+    Runners execute under a matrix Progress reporter: its snapshots are saved
+    as the job's progress, and cancelling the job stops the computation at its
+    next progress update.
+
+    Attributes:
+        path (str): Location of the SQLite database file.
+        runner (Callable[[Dict], Any]): Function computing a job's JSON-serializable result.
+        workers (int): Number of runner processes started by each process using the queue.
+        maxsize (int): Maximum number of queued jobs.
+        retention (float): Seconds finished jobs are kept before being purged.
+        interval (float): Minimum seconds between progress updates of a running job.
+        poll (float): Seconds an idle runner waits before looking for queued jobs again.
+    """
+
+    def __init__(self, path: str, runner: Callable[[Dict[str, Any]], Any], workers: int = 2,
+                 maxsize: int = 100, retention: float = 86400.0, timeout: float = 30.0,
+                 interval: float = 0.25, poll: float = 0.1) -> None:
+        self.path = path
+        self.runner = runner
+        self.workers = workers
+        self.maxsize = maxsize
+        self.retention = retention
+        self.timeout = timeout
+        self.interval = interval
+        self.poll = poll
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._pid = None        # process whose runners are in _processes
+        self._processes = []
+        self._stop = None       # set to make this process's runners exit
+        self._parent = None     # in a runner process, the process that started it
+        self._ready = False
+        self._schema_lock = threading.Lock()
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # Runner processes started without fork receive the queue pickled
+        state = dict(self.__dict__)
+        for name in ('_local', '_lock', '_schema_lock', '_processes', '_stop'):
+            del state[name]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state, _local=threading.local(), _lock=threading.Lock(),
+                             _schema_lock=threading.Lock(), _processes=[], _stop=None)
+
+    def _connect(self):
+        return _schema_connection(self)
+
+    def _init_schema(self, conn) -> None:
+        """
+        Create the jobs table on first use.
+        """
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' status TEXT NOT NULL,'
+            ' priority INTEGER NOT NULL,'
+            ' owner INTEGER NOT NULL,'
+            ' payload TEXT NOT NULL,'
+            ' result TEXT,'
+            ' error TEXT,'
+            ' created_at REAL NOT NULL,'
+            ' started_at REAL,'
+            ' finished_at REAL,'
+            ' progress TEXT)'
+        )
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(jobs)')}
+        if 'progress' not in columns:  # databases created before progress reporting
+            conn.execute('ALTER TABLE jobs ADD COLUMN progress TEXT')
+        conn.execute('CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority)')
+
+    def start(self) -> None:
+        """
+        Start the runner processes for the current process, replacing any that died.
+
+        Called by every method that submits or looks up a job, so a process using
+        the queue always runs queued jobs; servers call it when a worker starts, so
+        that queued jobs keep running while other workers are replaced.
+        """
+        self._connect()  # create the database before runners open it too
+        with self._lock:
+            if self._pid != os.getpid():
+                # Runners belong to the process that started them, not to its forks
+                self._stop = multiprocessing.get_context().Event()
+                self._processes = []
+                self._pid = os.getpid()
+            for process in [p for p in self._processes if not p.is_alive()]:
+                self._processes.remove(process)
+                self._fail_owned(process.pid)
+            while len(self._processes) < self.workers:
+                process = multiprocessing.get_context().Process(
+                    target=_run_jobs, args=(self, self._stop, os.getpid()), daemon=True)
+                process.start()
+                self._processes.append(process)
+
+    def submit(self, payload: Dict[str, Any], priority: int = 0) -> str:
+        """
+        Queue a job.
+
+        Args:
+            payload: The job description passed to the runner.
+            priority: Higher values run first; equal priorities run in submission order.
+
+        Returns:
+            The new job's id.
+
+        Raises:
+            QueueFullError: If the queue is at capacity.
+        """
+        self.start()
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        conn = self._connect()
+        # One statement, so that concurrent submitters cannot overfill the queue
+        cur = conn.execute(
+            'INSERT INTO jobs (id, status, priority, owner, payload, created_at)'
+            ' SELECT ?, ?, ?, ?, ?, ? WHERE (SELECT COUNT(*) FROM jobs WHERE status = ?) < ?',
+            (job_id, QUEUED, priority, os.getpid(), json.dumps(payload), now, QUEUED, self.maxsize),
+        )
+        if not cur.rowcount:
+            raise QueueFullError('Job queue is full, please retry later')
+        conn.execute('DELETE FROM jobs WHERE finished_at < ?', (now - self.retention,))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the status record of a job.
+
+        Args:
+            job_id: The job's id.
+
+        Returns:
+            Dictionary with id, status, priority, timestamps, the latest progress
+            snapshot once running and, once finished, result or error; None if
+            the job is unknown.
+        """
+        self.start()
+        row = self._connect().execute(
+            'SELECT id, status, priority, result, error, created_at, started_at, finished_at, progress'
+            ' FROM jobs WHERE id = ?',
+            (job_id,),
+        ).fetchone()
+        if row is None:
+            return None
+        job = {
+            'id': row[0],
+            'status': row[1],
+            'priority': row[2],
+            'created_at': row[5],
+            'started_at': row[6],
+            'finished_at': row[7],
+        }
+        if row[3] is not None:
+            job['result'] = json.loads(row[3])
+        if row[4] is not None:
+            job['error'] = row[4]
+        if row[8] is not None:
+            job['progress'] = json.loads(row[8])
+        return job
+
+    def status(self, job_id: str) -> Optional[str]:
+        row = self._connect().execute('SELECT status FROM jobs WHERE id = ?', (job_id,)).fetchone()
+        return row[0] if row else None
+
+    def cancel(self, job_id: str) -> Optional[bool]:
+        """
+        Cancel a queued or running job.
+
+        A queued job is never started. A running job stops at its next progress
+        update, when its runner finds the job cancelled in the table;
+        computations that do not report progress run to completion and their
+        result is discarded.
+
+        Args:
+            job_id: The job's id.
+
+        Returns:
+            True if the job was cancelled, False if it had already finished,
+            None if it is unknown.
+        """
+        cur = self._connect().execute(
+            'UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status IN (?, ?)',
+            (CANCELLED, time.time(), job_id, QUEUED, RUNNING),
+        )
+        if cur.rowcount:
+            return True
+        return False if self.status(job_id) is not None else None
+
+    def pending(self) -> int:
+        """
+        Return the number of jobs waiting for a runner.
+        """
+        return self._connect().execute('SELECT COUNT(*) FROM jobs WHERE status = ?', (QUEUED,)).fetchone()[0]
+
+    def close(self, timeout: float = 30.0) -> None:
+        """
+        Stop this process's runners.
+
+        Runners take no new jobs once closing starts, and queued jobs stay in the
+        table for the runners of other processes. Jobs still running after
+        timeout seconds are stopped and marked failed.
+
+        Args:
+            timeout: Seconds running jobs may take to finish.
+        """
+        if self._pid != os.getpid():
+            return
+        with self._lock:
+            self._stop.set()
+            deadline = time.monotonic() + timeout
+            for process in self._processes:
+                process.join(max(deadline - time.monotonic(), 0.0))
+            for process in self._processes:
+                if process.is_alive():
+                    process.terminate()
+                    process.join()
+                self._fail_owned(process.pid)
+            self._processes = []
+            self._pid = None
+
+    def _finish(self, job_id: str, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        # Never overwrite a cancellation that arrived while the job was running
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ? WHERE id = ? AND status != ?',
+            (status, json.dumps(result) if status == DONE else None, error, time.time(), job_id, CANCELLED),
+        )
+
+    def _fail_owned(self, pid: int) -> None:
+        # Fail the jobs a runner that is gone left running
+        self._connect().execute(
+            'UPDATE jobs SET status = ?, error = ?, finished_at = ? WHERE owner = ? AND status = ?',
+            (FAILED, INTERRUPTED, time.time(), pid, RUNNING),
+        )
+
+    def _sweep(self) -> None:
+        owners = self._connect().execute('SELECT DISTINCT owner FROM jobs WHERE status = ?', (RUNNING,)).fetchall()
+        for (owner,) in owners:
+            if not _pid_alive(owner):
+                self._fail_owned(owner)
+
+    def _claim(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        # Take the next queued job; another runner may get there first, so retry until one sticks
+        conn = self._connect()
+        while True:
+            row = conn.execute(
+                'SELECT id, payload FROM jobs WHERE status = ? ORDER BY priority DESC, rowid LIMIT 1',
+                (QUEUED,),
+            ).fetchone()
+            if row is None:
+                return None
+            cur = conn.execute(
+                'UPDATE jobs SET status = ?, owner = ?, started_at = ? WHERE id = ? AND status = ?',
+                (RUNNING, os.getpid(), time.time(), row[0], QUEUED),
+            )
+            if cur.rowcount:
+                return row[0], json.loads(row[1])
+
+    def _orphaned(self) -> bool:
+        return self._parent is not None and os.getppid() != self._parent
+
+    def _record_progress(self, job_id: str, progress: Progress, snapshot: Dict[str, Any]) -> None:
+        # Publish the snapshot; a job that is no longer running was cancelled elsewhere
+        cur = self._connect().execute(
+            'UPDATE jobs SET progress = ? WHERE id = ? AND status = ?', (json.dumps(snapshot), job_id, RUNNING))
+        if not cur.rowcount or self._orphaned():
+            progress.cancel()
+
+    def _run(self, job_id: str, payload: Dict[str, Any]) -> None:
+        progress = Progress(interval=self.interval)
+        progress.callback = lambda snapshot: self._record_progress(job_id, progress, snapshot)
+        try:
+            with reporting(progress):
+                result = self.runner(payload)
+        except Exception as e:
+            self._finish(job_id, FAILED, error=INTERRUPTED if self._orphaned() else str(e))
+        else:
+            self._finish(job_id, DONE, result=result)
+
+
+def _run_jobs(jobs: JobQueue, stop, parent: int) -> None:
+    """
+    Main loop of a runner process: run queued jobs until stopped or orphaned.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)  # the parent decides when runners stop
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    jobs._parent = parent
+    swept = 0.0
+    while not stop.is_set() and not jobs._orphaned():
+        if time.monotonic() - swept >= SWEEP_INTERVAL:
+            jobs._sweep()
+            swept = time.monotonic()
+        claimed = jobs._claim()
+        if claimed is None:
+            stop.wait(jobs.poll)
+        else:
+            jobs._run(*claimed)
+
+
+def _pid_alive(pid: int) -> bool:
+    """
+    Return True if a process with the given id exists.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
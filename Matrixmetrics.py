@@ -0,0 +1,183 @@
+import bisect
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+# Default bucket boundaries
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DIMENSION_BUCKETS = (1, 2, 3, 4, 6, 8, 12, 16, 32, 64, 128, 256, 512)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# -----------------------------
+# Metric Classes
+# -----------------------------
+class _Metric:
+    """
+    Base class for a labelled metric family.
+
+    Attributes:
+        name (str): Metric name as exposed to Prometheus.
+        help (str): One-line description.
+        labels (Tuple[str, ...]): Label names, in order.
+    """
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (),
+                 callback: Optional[Callable[[], Any]] = None) -> None:
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.callback = callback
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Sequence[str]) -> Tuple[str, ...]:
+        if len(labels) != len(self.labels):
+            raise ValueError(f'{self.name} expects labels {self.labels}')
+        return tuple(str(label) for label in labels)
+
+    def render(self) -> List[str]:
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        if self.callback is not None:
+            # Values owned elsewhere: a number, or {label values: number} for labelled metrics
+            value = self.callback()
+            items = sorted(value.items()) if isinstance(value, dict) else [((), value)]
+        else:
+            with self._lock:
+                items = sorted(self._values.items())
+        for labels, value in items:
+            lines.extend(self._samples(labels, value))
+        return lines
+
+    def _samples(self, labels: Tuple[str, ...], value) -> List[str]:
+        return [f'{self.name}{_format_labels(self.labels, labels)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    """
+    A monotonically increasing count.
+
+    Counters and gauges may be given a callback instead of being updated
+    directly; it is called when the metrics are rendered.
+    """
+
+    kind = 'counter'
+
+    def inc(self, *labels: str, amount: float = 1) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+
+class Gauge(_Metric):
+    """A value that can go up and down."""
+
+    kind = 'gauge'
+
+    def set(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """
+    A distribution of observations over fixed, cumulative buckets.
+
+    Observing costs one binary search and a few additions under a lock, so
+    histograms can stay enabled permanently.
+    """
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labels: Iterable[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, *labels: str, value: float) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # Per-bucket counts (last slot is +Inf), then sum and count
+                state = self._values[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    def _samples(self, labels: Tuple[str, ...], value) -> List[str]:
+        counts, total, count = value
+        lines, cumulative = [], 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            le = _format_labels(self.labels, labels, ('le', _format_value(bound)))
+            lines.append(f'{self.name}_bucket{le} {cumulative}')
+        base = _format_labels(self.labels, labels)
+        lines.append(f'{self.name}_sum{base} {_format_value(total)}')
+        lines.append(f'{self.name}_count{base} {count}')
+        return lines
+
+
+# -----------------------------
+# Registry Class
+# -----------------------------
+class Registry:
+    """
+    A collection of metrics rendered together in the Prometheus text format.
+
+    Metrics live in the memory of the current process; nothing is sent to an
+    external service. Each worker process of a multi-process server reports
+    its own values.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, help: str, labels: Iterable[str] = (),
+                callback: Optional[Callable[[], Any]] = None) -> Counter:
+        return self.register(Counter(name, help, labels, callback))
+
+    def gauge(self, name: str, help: str, labels: Iterable[str] = (),
+              callback: Optional[Callable[[], Any]] = None) -> Gauge:
+        return self.register(Gauge(name, help, labels, callback))
+
+    def histogram(self, name: str, help: str, labels: Iterable[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labels, buckets))
+
+    def render(self) -> str:
+        """
+        Render every registered metric.
+
+        Returns:
+            The exposition text, ending in a newline.
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
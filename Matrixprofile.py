@@ -0,0 +1,144 @@
+import contextvars
+import cProfile
+import pstats
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+# The profile of the request being handled in the current context, if any
+_current: contextvars.ContextVar = contextvars.ContextVar('matrix_profile', default=None)
+
+# cProfile cannot always run in two threads at once (Python 3.12+ allows a single
+# profiling tool per process), so profiled requests take turns.
+_profiler_lock = threading.Lock()
+
+
+# -----------------------------
+# Request Profile Class
+# -----------------------------
+class RequestProfile:
+    """
+    A deterministic profile of one request, split into named phases.
+
+    Phase time is exclusive: entering a nested phase pauses the enclosing one,
+    so the phase totals add up to at most the request's wall time.
+
+    Attributes:
+        top (int): Number of hotspots kept in the report.
+        phases (Dict[str, float]): Seconds spent in each phase.
+    """
+
+    def __init__(self, top: int = 25) -> None:
+        self.top = top
+        self.phases: Dict[str, float] = {}
+        self._profiler = cProfile.Profile()
+        self._stack: List[List[Any]] = []
+        self._start = None
+        self._elapsed = 0.0
+        self._token = None
+
+    def start(self) -> bool:
+        """
+        Start profiling the current thread.
+
+        Returns:
+            False if another request is being profiled in this process.
+        """
+        if not _profiler_lock.acquire(blocking=False):
+            return False
+        try:
+            self._profiler.enable()
+        except ValueError:
+            # Another profiling tool owns the interpreter
+            _profiler_lock.release()
+            return False
+        self._token = _current.set(self)
+        self._start = time.perf_counter()
+        return True
+
+    def stop(self) -> None:
+        """
+        Stop profiling. Safe to call only after a successful start().
+        """
+        self._elapsed = time.perf_counter() - self._start
+        self._profiler.disable()
+        _current.reset(self._token)
+        _profiler_lock.release()
+
+    def _add(self, name: str, now: float) -> None:
+        entry = self._stack[-1]
+        self.phases[name] = self.phases.get(name, 0.0) + now - entry[1]
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        now = time.perf_counter()
+        if self._stack:
+            self._add(self._stack[-1][0], now)
+        self._stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            self._add(name, now)
+            self._stack.pop()
+            if self._stack:
+                self._stack[-1][1] = now
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize the profile.
+
+        Returns:
+            Dictionary with the total wall time, seconds per phase (time outside
+            any phase is reported as "other") and the top functions by internal
+            time, each with call counts and internal and cumulative seconds.
+        """
+        phases = dict(self.phases)
+        phases['other'] = max(self._elapsed - sum(phases.values()), 0.0)
+        stats = pstats.Stats(self._profiler)
+        hotspots = []
+        for (filename, line, function), (primitive, calls, internal, cumulative, _) in stats.stats.items():
+            hotspots.append({
+                'function': function,
+                'file': filename,
+                'line': line,
+                'calls': calls,
+                'primitive_calls': primitive,
+                'internal': internal,
+                'cumulative': cumulative,
+            })
+        hotspots.sort(key=lambda entry: entry['internal'], reverse=True)
+        return {'total': self._elapsed, 'phases': phases, 'hotspots': hotspots[:self.top]}
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """
+    Attribute the enclosed code to a phase of the current request's profile.
+
+    Costs a single context variable lookup when the request is not being profiled.
+
+    Args:
+        name: The phase name, e.g. "parse" or "operation".
+    """
+    profile: Optional[RequestProfile] = _current.get()
+    if profile is None:
+        yield
+        return
+    with profile.phase(name):
+        yield
+
+
+def in_phase(name: str):
+    """
+    Decorator form of phase().
+    """
+    def decorate(fn):
+        def wrapper(*args, **kwargs):
+            with phase(name):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__doc__ = fn.__doc__
+        return wrapper
+    return decorate
@@ -0,0 +1,233 @@
+from __future__ import annotations
+
+import math
+from typing import Any, Iterator, List, Optional, Union
+
+from Matrixcodes import Matrix, LazyModule
+
+np = LazyModule('numpy', globals(), 'np')
+sp = LazyModule('sympy', globals(), 'sp')
+
+MAX_PRECISION = 100
+
+# -----------------------------
+# Element Conversion
+# -----------------------------
+def _round(x: float, precision: Optional[int]) -> float:
+    """
+    Round a float to the given number of significant digits.
+    """
+    if precision is None or x == 0 or not math.isfinite(x):
+        return x
+    return float(f"{x:.{precision}g}")
+
+
+def _float(x: float, precision: Optional[int], typed: bool) -> Any:
+    """
+    Serialize a float; infinities and NaN, which JSON cannot represent, become typed strings.
+    """
+    x = _round(x, precision)
+    if not math.isfinite(x):
+        return {'type': 'float', 'value': str(x)}
+    return {'type': 'float', 'value': x} if typed else x
+
+
+def _part(x: float, precision: Optional[int]) -> Any:
+    """
+    Serialize one part of a complex number, as a string if it is not finite.
+    """
+    x = _round(x, precision)
+    return x if math.isfinite(x) else str(x)
+
+
+def _round_array(array: np.ndarray, precision: Optional[int]) -> np.ndarray:
+    """
+    Round every element of a real array to the given number of significant digits.
+    """
+    if precision is None:
+        return array
+    with np.errstate(divide='ignore', invalid='ignore'):
+        magnitude = np.floor(np.log10(np.abs(array)))
+        magnitude = np.where(np.isfinite(magnitude), magnitude, 0)
+        scale = 10.0 ** (precision - 1 - magnitude)
+        return np.round(array * scale) / scale
+
+
+def serialize_value(value: Any, precision: Optional[int] = None, typed: bool = False) -> Any:
+    """
+    Convert a single result element to a JSON-serializable value.
+
+    In the default form real numbers become floats, complex numbers become
+    {"re": ..., "im": ...} and expressions with free symbols become strings.
+    In the typed form every element is a dictionary tagged with its kind, and
+    integers and rationals are kept exact. Infinities and NaN are not valid
+    JSON, so in both forms they become {"type": "float", "value": "inf"}
+    (or "-inf", "nan"), and complex parts become those strings.
+
+    Args:
+        value: A sympy expression or a Python/numpy number.
+        precision: Significant digits for floating-point output, or None for full precision.
+        typed: If True, return the typed form.
+
+    Returns:
+        A float, a dictionary or a string.
+    """
+    if isinstance(value, (bool, int, float, complex, np.number)):
+        value = complex(value) if isinstance(value, (complex, np.complexfloating)) else value
+        if isinstance(value, complex):
+            if value.imag == 0:
+                value = value.real
+            else:
+                re, im = _part(value.real, precision), _part(value.imag, precision)
+                return {'type': 'complex', 're': re, 'im': im} if typed else {'re': re, 'im': im}
+        if typed and isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+            return {'type': 'integer', 'value': str(int(value))}
+        return _float(float(value), precision, typed)
+
+    value = sp.sympify(value)
+    if typed and value.is_Integer:
+        return {'type': 'integer', 'value': str(value)}
+    if typed and value.is_Rational:
+        return {'type': 'rational', 'p': str(value.p), 'q': str(value.q),
+                'approx': _round(float(value), precision)}
+    if value.is_Number and not value.is_Rational and value.is_real:
+        return _float(float(value), precision, typed)
+    if value.is_Rational:
+        return _round(float(value), precision)
+    if not value.is_number:
+        # Free symbols: there is no numeric value to give
+        return {'type': 'expr', 'value': str(value)} if typed else str(value)
+
+    approx = value.evalf(precision or 15)
+    re, im = approx.as_real_imag()
+    re, im = float(re), float(im)
+    if im != 0:
+        re, im = _part(re, precision), _part(im, precision)
+        return {'type': 'complex', 're': re, 'im': im} if typed else {'re': re, 'im': im}
+    if typed:
+        return {'type': 'expr', 'value': str(value), 'approx': _part(re, precision)}
+    return _float(re, precision, typed)
+
+
+# -----------------------------
+# Bulk Conversion
+# -----------------------------
+def _array_rows(array: np.ndarray, precision: Optional[int], typed: bool) -> Optional[List[List[Any]]]:
+    """
+    Convert a numeric array in bulk, or return None if it needs per-element handling.
+    """
+    if array.dtype.kind == 'c':
+        if np.any(array.imag != 0):
+            return None
+        array = array.real
+    if typed or array.dtype.kind not in 'biuf':
+        return None
+    array = array.astype(float)
+    if not np.isfinite(array).all():
+        return None
+    return _round_array(array, precision).tolist()
+
+
+def serialize_rows(matrix: Matrix, precision: Optional[int] = None, typed: bool = False) -> Iterator[List[Any]]:
+    """
+    Yield the rows of a matrix in serialized form, one row at a time.
+
+    Array-backed real matrices are converted with a single numpy operation.
+    Symbolic matrices whose elements are all plain numbers take a fast path
+    through float(); only genuinely symbolic or complex elements go through
+    sympy evaluation.
+
+    Args:
+        matrix: The matrix to serialize.
+        precision: Significant digits for floating-point output, or None for full precision.
+        typed: If True, emit the typed form for every element.
+
+    Yields:
+        Lists of serialized elements.
+    """
+    if matrix.array is not None:
+        rows = _array_rows(matrix.array, precision, typed)
+        if rows is not None:
+            yield from rows
+            return
+        for row in matrix.array.tolist():
+            yield [serialize_value(elem, precision, typed) for elem in row]
+        return
+
+    for row in matrix.data:
+        if not typed and all(elem.is_Number for elem in row):
+            yield [_float(float(elem), precision, False) for elem in row]
+        else:
+            yield [serialize_value(elem, precision, typed) for elem in row]
+
+
+def serialize_result(result: Union[Matrix, List[Any], Any], precision: Optional[int] = None,
+                     typed: bool = False) -> Any:
+    """
+    Convert an operation result to a JSON-serializable value.
+
+    Args:
+        result: A Matrix, a list of values (e.g. eigenvalues) or a single value.
+        precision: Significant digits for floating-point output, or None for full precision.
+        typed: If True, emit the typed form for every element.
+
+    Returns:
+        A nested list for matrices, a list for lists, otherwise a single value.
+    """
+    if isinstance(result, Matrix):
+        return list(serialize_rows(result, precision, typed))
+    if isinstance(result, list):
+        return [serialize_value(elem, precision, typed) for elem in result]
+    return serialize_value(result, precision, typed)
+
+
+def check_precision(precision: Any) -> Optional[int]:
+    """
+    Validate a client-supplied precision.
+
+    Args:
+        precision: The requested number of significant digits, or None.
+
+    Returns:
+        The precision as an int, or None.
+
+    Raises:
+        ValueError: If precision is not an integer between 1 and MAX_PRECISION.
+    """
+    if precision is None:
+        return None
+    if isinstance(precision, bool) or not isinstance(precision, int) or not 1 <= precision <= MAX_PRECISION:
+        raise ValueError(f"Precision must be an integer between 1 and {MAX_PRECISION}")
+    return precision
+
+
+def to_array(value: Any) -> Optional[np.ndarray]:
+    """
+    Turn a serialized numeric result back into a numpy array.
+
+    Used by binary encodings. Complex elements in {"re", "im"} form produce a
+    complex array.
+
+    Args:
+        value: A serialized result in the default (untyped) form.
+
+    Returns:
+        A float or complex array, or None if the result contains expressions.
+    """
+    try:
+        return np.asarray(value, dtype=float)
+    except (TypeError, ValueError):
+        pass
+
+    def to_complex(elem):
+        if isinstance(elem, list):
+            return [to_complex(e) for e in elem]
+        if isinstance(elem, dict) and 're' in elem and 'im' in elem:
+            return complex(elem['re'], elem['im'])
+        if isinstance(elem, (int, float)):
+            return elem
+        raise ValueError(f"Non-numeric element: {elem!r}")
+    try:
+        return np.asarray(to_complex(value), dtype=complex)
+    except (TypeError, ValueError):
+        return None
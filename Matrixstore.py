@@ -0,0 +1,1021 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from Matrixcodes import Matrix
+from Matrixhistory import apply, describe, diff, revert
+
+def _thread_connection(local: threading.local, path: str, timeout: float) -> sqlite3.Connection:
+    """
+    Return the SQLite connection for the current thread and process.
+
+    SQLite connections must not be shared across threads or inherited across a
+    fork, so one is opened lazily per (process, thread) and kept in ``local``.
+
+    Args:
+        local: Thread-local holder owned by the caller.
+        path: Location of the SQLite database file.
+        timeout: Seconds to wait for a competing writer's lock.
+
+    Returns:
+        An open sqlite3 connection in autocommit mode with WAL enabled.
+    """
+    conn = getattr(local, 'conn', None)
+    if conn is not None and local.pid == os.getpid():
+        return conn
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    conn = sqlite3.connect(path, timeout=timeout, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    local.conn = conn
+    local.pid = os.getpid()
+    return conn
+
+def _schema_connection(owner: Any) -> sqlite3.Connection:
+    """
+    Return the owner's connection for the current thread, creating its tables on first use.
+
+    Stores are built when the application is imported but only touch their
+    database file once they are used, so importing creates no files.
+
+    Args:
+        owner: An object with ``path``, ``timeout``, ``_local``, ``_ready`` and
+            ``_schema_lock`` attributes and an ``_init_schema(conn)`` method.
+
+    Returns:
+        The connection returned by _thread_connection.
+    """
+    conn = _thread_connection(owner._local, owner.path, owner.timeout)
+    if not owner._ready:
+        with owner._schema_lock:
+            if not owner._ready:
+                owner._init_schema(conn)
+                owner._ready = True
+    return conn
+
+# -----------------------------
+# Matrix Store Class
+# -----------------------------
+class MatrixStore:
+    """
+    A transactional store for named matrices backed by SQLite.
+
+    Every matrix lives in its own row, so reading or writing one matrix does not
+    touch the others. The database runs in WAL mode: readers never block writers,
+    and writes are serialized across processes by SQLite's own file locking.
+    A global generation counter is bumped inside every write transaction so that
+    callers can cheaply detect changes made by any process. Each matrix has a
+    version that grows with every write to it; a new matrix starts above the
+    current generation, so a name that is deleted and saved again never reuses
+    an earlier version.
+
+    Every write is also recorded as a numbered revision in a history table,
+    encoded by Matrixhistory (cell deltas for small edits, snapshots
+    otherwise). Revisions form one line with a head: undo() and redo() move
+    the head by one revision, and get() and get_all() can read the store as it
+    was at any kept revision.
+
+    Attributes:
+        path (str): Location of the SQLite database file.
+        timeout (float): Seconds to wait for a competing writer's lock.
+        history_limit (int): Number of revisions kept.
+
+    Examples:
+        >>> store = MatrixStore('matrices.db')
+        >>> store.put('A', [[1, 2], [3, 4]])
+        1
+        >>> store.get('A')
+        [[1, 2], [3, 4]]
+    """
+
+    def __init__(self, path: str, timeout: float = 30.0, history_limit: int = 1000) -> None:
+        """
+        Set up the store at the given path; the database is created on first use.
+
+        Args:
+            path: Location of the SQLite database file.
+            timeout: Seconds to wait for a competing writer's lock.
+            history_limit: Number of revisions kept for undo and past reads.
+        """
+        self.path = path
+        self.timeout = timeout
+        self.history_limit = history_limit
+        self._local = threading.local()
+        self._ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Return the connection for the current thread and process.
+        """
+        return _schema_connection(self)
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """
+        Run a block inside an immediate write transaction.
+
+        The write lock is taken up front, so concurrent writers queue instead of
+        failing halfway through with a busy error. The generation counter is
+        bumped before commit.
+
+        Yields:
+            The connection the transaction runs on.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield conn
+            conn.execute("UPDATE meta SET value = value + 1 WHERE key = 'generation'")
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    def _init_schema(self, conn: sqlite3.Connection) -> None:
+        """
+        Create the tables on first use.
+        """
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS matrices ('
+                ' name TEXT PRIMARY KEY,'
+                ' data TEXT NOT NULL,'
+                ' rows INTEGER NOT NULL,'
+                ' cols INTEGER NOT NULL,'
+                ' version INTEGER NOT NULL,'
+                ' updated_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER NOT NULL)')
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('generation', 0)")
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS history ('
+                ' rev INTEGER PRIMARY KEY,'
+                ' name TEXT NOT NULL,'
+                ' change TEXT NOT NULL,'
+                ' created_at REAL NOT NULL)'
+            )
+            conn.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('head', 0)")
+            conn.execute('COMMIT')
+        except BaseException:
+            conn.execute('ROLLBACK')
+            raise
+
+    @staticmethod
+    def _shape(data: Any) -> tuple:
+        """
+        Return (rows, cols) of a nested list, tolerating malformed input.
+        """
+        rows = len(data) if isinstance(data, list) else 0
+        cols = len(data[0]) if rows and isinstance(data[0], list) else 0
+        return rows, cols
+
+    def generation(self) -> int:
+        """
+        Return the store-wide change counter.
+
+        Returns:
+            An integer that increases with every committed write.
+        """
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return row[0]
+
+    def revision(self) -> int:
+        """
+        Return the number of the latest applied revision (0 before any write).
+        """
+        return self._head(self._connect())
+
+    def get(self, name: str, at: Optional[int] = None) -> Optional[List[List[Any]]]:
+        """
+        Read a single matrix.
+
+        Args:
+            name: Name of the matrix.
+            at: Read the matrix as it was at this revision instead of now.
+
+        Returns:
+            The matrix data as a nested list, or None if it does not exist.
+
+        Raises:
+            ValueError: If the revision is not available.
+        """
+        conn = self._connect()
+        if at is None:
+            return self._read(conn, name)
+        conn.execute('BEGIN')
+        try:
+            changes = self._changes_since(conn, at, name)
+            data = self._read(conn, name)
+        finally:
+            conn.execute('COMMIT')
+        for _, change in changes:
+            data = revert(data, change)
+        return data
+
+    def get_all_with_versions(self) -> Tuple[int, Dict[str, Tuple[int, List[List[Any]]]]]:
+        """
+        Read every stored matrix with its version, as one consistent snapshot.
+
+        Returns:
+            Tuple of (generation, {name: (version, data)}).
+        """
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            rows = conn.execute('SELECT name, version, data FROM matrices ORDER BY rowid').fetchall()
+        finally:
+            conn.execute('COMMIT')
+        return generation, {name: (version, json.loads(data)) for name, version, data in rows}
+
+    def versions(self) -> Tuple[int, Dict[str, int]]:
+        """
+        Read every matrix's version, without the matrix data.
+
+        Returns:
+            Tuple of (generation, {name: version}) from one consistent snapshot,
+            in insertion order.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            rows = conn.execute('SELECT name, version FROM matrices ORDER BY rowid').fetchall()
+        finally:
+            conn.execute('COMMIT')
+        return generation, dict(rows)
+
+    def get_many(self, names: List[str]) -> Dict[str, Tuple[int, List[List[Any]]]]:
+        """
+        Read several matrices with their versions.
+
+        Args:
+            names: Names of the matrices; unknown names are left out.
+
+        Returns:
+            Dictionary mapping names to (version, data).
+        """
+        conn = self._connect()
+        found = {}
+        for start in range(0, len(names), 500):  # stay under SQLite's bound-parameter limit
+            chunk = names[start:start + 500]
+            rows = conn.execute(
+                f'SELECT name, version, data FROM matrices WHERE name IN ({", ".join("?" * len(chunk))})', chunk
+            ).fetchall()
+            found.update((name, (version, json.loads(data))) for name, version, data in rows)
+        return found
+
+    def list(self, after: Optional[str] = None, limit: int = 100) -> Tuple[int, int, List[Dict[str, Any]]]:
+        """
+        Read one page of matrix metadata, without the matrix data.
+
+        Pages are ordered by name and continue after a given name, so paging
+        stays consistent while other matrices are added or removed.
+
+        Args:
+            after: Return only matrices whose name sorts after this one.
+            limit: Maximum number of entries.
+
+        Returns:
+            Tuple of (generation, total number of matrices, entries), each entry a
+            dictionary with name, rows, cols, version, size (bytes of stored data)
+            and updated_at.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            generation = conn.execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()[0]
+            total = conn.execute('SELECT COUNT(*) FROM matrices').fetchone()[0]
+            rows = conn.execute(
+                'SELECT name, rows, cols, version, length(data), updated_at FROM matrices'
+                ' WHERE name > ? ORDER BY name LIMIT ?',
+                ('' if after is None else after, limit),
+            ).fetchall()
+        finally:
+            conn.execute('COMMIT')
+        keys = ('name', 'rows', 'cols', 'version', 'size', 'updated_at')
+        return generation, total, [dict(zip(keys, row)) for row in rows]
+
+    def get_all(self, at: Optional[int] = None) -> Dict[str, List[List[Any]]]:
+        """
+        Read every stored matrix.
+
+        Args:
+            at: Read the store as it was at this revision instead of now.
+
+        Returns:
+            Dictionary mapping names to matrix data, in insertion order.
+
+        Raises:
+            ValueError: If the revision is not available.
+        """
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            changes = [] if at is None else self._changes_since(conn, at)
+            rows = conn.execute('SELECT name, data FROM matrices ORDER BY rowid').fetchall()
+        finally:
+            conn.execute('COMMIT')
+        matrices = {name: json.loads(data) for name, data in rows}
+        for name, change in changes:
+            data = revert(matrices.get(name), change)
+            if data is None:
+                matrices.pop(name, None)
+            else:
+                matrices[name] = data
+        return matrices
+
+    def put(self, name: str, data: List[List[Any]]) -> int:
+        """
+        Create or replace a matrix.
+
+        Args:
+            name: Name of the matrix.
+            data: The matrix data as a nested list.
+
+        Returns:
+            The new version number of the matrix.
+        """
+        with self._transaction() as conn:
+            self._record(conn, name, self._read(conn, name), data)
+            return self._write(conn, name, data)
+
+    def update(self, name: str, data: List[List[Any]]) -> Optional[int]:
+        """
+        Replace an existing matrix.
+
+        Args:
+            name: Name of the matrix.
+            data: The matrix data as a nested list.
+
+        Returns:
+            The new version number, or None if the matrix does not exist.
+        """
+        with self._transaction() as conn:
+            before = self._read(conn, name)
+            if before is None:
+                return None
+            self._record(conn, name, before, data)
+            return self._write(conn, name, data)
+
+    def delete(self, name: str) -> bool:
+        """
+        Remove a matrix.
+
+        Args:
+            name: Name of the matrix.
+
+        Returns:
+            True if the matrix existed and was removed, False otherwise.
+        """
+        with self._transaction() as conn:
+            before = self._read(conn, name)
+            if before is None:
+                return False
+            self._record(conn, name, before, None)
+            conn.execute('DELETE FROM matrices WHERE name = ?', (name,))
+            return True
+
+    def undo(self) -> Optional[Dict[str, Any]]:
+        """
+        Revert the latest applied revision.
+
+        Returns:
+            Dictionary with the revision undone ("rev"), the matrix "name" and
+            the "kind" of change, or None if there is nothing to undo.
+        """
+        if self.revision() == 0:
+            return None
+        with self._transaction() as conn:
+            head = self._head(conn)
+            row = conn.execute('SELECT name, change FROM history WHERE rev = ?', (head,)).fetchone()
+            if row is None:
+                return None
+            name, change = row[0], json.loads(row[1])
+            self._restore(conn, name, revert(self._read(conn, name), change))
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'head'", (head - 1,))
+            return {'rev': head, 'name': name, 'kind': describe(change)}
+
+    def redo(self) -> Optional[Dict[str, Any]]:
+        """
+        Re-apply the revision most recently undone.
+
+        Returns:
+            Dictionary with the revision redone ("rev"), the matrix "name" and
+            the "kind" of change, or None if there is nothing to redo.
+        """
+        with self._transaction() as conn:
+            head = self._head(conn)
+            row = conn.execute('SELECT name, change FROM history WHERE rev = ?', (head + 1,)).fetchone()
+            if row is None:
+                return None
+            name, change = row[0], json.loads(row[1])
+            self._restore(conn, name, apply(self._read(conn, name), change))
+            conn.execute("UPDATE meta SET value = ? WHERE key = 'head'", (head + 1,))
+            return {'rev': head + 1, 'name': name, 'kind': describe(change)}
+
+    def history(self, limit: int = 50, before: Optional[int] = None) -> Tuple[int, List[Dict[str, Any]]]:
+        """
+        List revisions, newest first, including those that can be redone.
+
+        Args:
+            limit: Maximum number of revisions.
+            before: Return only revisions numbered below this one.
+
+        Returns:
+            Tuple of (head, entries), each entry a dictionary with rev, name,
+            kind, cells (number of cells changed by a delta, else None),
+            created_at and applied (False for revisions undone).
+        """
+        conn = self._connect()
+        conn.execute('BEGIN')
+        try:
+            head = self._head(conn)
+            rows = conn.execute(
+                'SELECT rev, name, change, created_at FROM history WHERE rev < ? ORDER BY rev DESC LIMIT ?',
+                (before if before is not None else 2 ** 62, limit),
+            ).fetchall()
+        finally:
+            conn.execute('COMMIT')
+        entries = []
+        for rev, name, change, created_at in rows:
+            change = json.loads(change)
+            entries.append({'rev': rev, 'name': name, 'kind': describe(change),
+                            'cells': len(change['delta']) if 'delta' in change else None,
+                            'created_at': created_at, 'applied': rev <= head})
+        return head, entries
+
+    # Helpers running inside a transaction
+    def _head(self, conn: sqlite3.Connection) -> int:
+        return conn.execute("SELECT value FROM meta WHERE key = 'head'").fetchone()[0]
+
+    def _read(self, conn: sqlite3.Connection, name: str) -> Optional[List[List[Any]]]:
+        row = conn.execute('SELECT data FROM matrices WHERE name = ?', (name,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _write(self, conn: sqlite3.Connection, name: str, data: List[List[Any]]) -> int:
+        rows, cols = self._shape(data)
+        conn.execute(
+            'INSERT INTO matrices (name, data, rows, cols, version, updated_at)'
+            " VALUES (?, ?, ?, ?, (SELECT value + 1 FROM meta WHERE key = 'generation'), ?)"
+            ' ON CONFLICT(name) DO UPDATE SET data = excluded.data, rows = excluded.rows,'
+            ' cols = excluded.cols, version = version + 1, updated_at = excluded.updated_at',
+            (name, json.dumps(data), rows, cols, time.time()),
+        )
+        return conn.execute('SELECT version FROM matrices WHERE name = ?', (name,)).fetchone()[0]
+
+    def _restore(self, conn: sqlite3.Connection, name: str, data: Optional[List[List[Any]]]) -> None:
+        if data is None:
+            conn.execute('DELETE FROM matrices WHERE name = ?', (name,))
+        else:
+            self._write(conn, name, data)
+
+    def _record(self, conn: sqlite3.Connection, name: str,
+                before: Optional[List[List[Any]]], after: Optional[List[List[Any]]]) -> None:
+        # A new revision discards the ones that could have been redone
+        rev = self._head(conn) + 1
+        conn.execute('DELETE FROM history WHERE rev >= ?', (rev,))
+        conn.execute('INSERT INTO history (rev, name, change, created_at) VALUES (?, ?, ?, ?)',
+                     (rev, name, json.dumps(diff(before, after)), time.time()))
+        conn.execute("UPDATE meta SET value = ? WHERE key = 'head'", (rev,))
+        conn.execute('DELETE FROM history WHERE rev <= ?', (rev - self.history_limit,))
+
+    def _changes_since(self, conn: sqlite3.Connection, at: int,
+                       name: Optional[str] = None) -> List[Tuple[str, Dict[str, Any]]]:
+        # Revisions after "at", newest first, to revert from the current state
+        head = self._head(conn)
+        oldest = conn.execute('SELECT MIN(rev) FROM history').fetchone()[0]
+        if not (oldest or head + 1) - 1 <= at <= head:
+            raise ValueError(f'Revision {at} is not available')
+        query = 'SELECT name, change FROM history WHERE rev > ? AND rev <= ?'
+        params = [at, head]
+        if name is not None:
+            query += ' AND name = ?'
+            params.append(name)
+        rows = conn.execute(query + ' ORDER BY rev DESC', params).fetchall()
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def migrate_from_json(self, json_path: str) -> int:
+        """
+        Import matrices from a legacy matrices.json file.
+
+        Entries already present in the store are kept. On success the JSON file
+        is renamed to ``<json_path>.migrated`` so the import runs only once, even
+        when several workers start at the same time.
+
+        Args:
+            json_path: Path of the legacy JSON file.
+
+        Returns:
+            Number of matrices imported.
+        """
+        if not os.path.exists(json_path):
+            return 0
+        with open(json_path, 'r') as f:
+            legacy = json.load(f)
+        imported = 0
+        now = time.time()
+        with self._transaction() as conn:
+            for name, data in legacy.items():
+                rows, cols = self._shape(data)
+                cur = conn.execute(
+                    'INSERT OR IGNORE INTO matrices (name, data, rows, cols, version, updated_at)'
+                    ' VALUES (?, ?, ?, ?, 1, ?)',
+                    (name, json.dumps(data), rows, cols, now),
+                )
+                imported += cur.rowcount
+        try:
+            os.replace(json_path, json_path + '.migrated')
+        except FileNotFoundError:
+            pass  # another worker finished the migration first
+        return imported
+
+
+# -----------------------------
+# Matrix Cache Class
+# -----------------------------
+class MatrixCache:
+    """
+    An in-process, read-through view of a MatrixStore.
+
+    The full listing is kept in memory and brought up to date when the store's
+    generation counter moves, which covers writes made by this process as well
+    as by other workers sharing the database. Only the versions are read on a
+    change; the data is reloaded for the matrices whose version differs from
+    the cached one. Parsed Matrix objects are kept per (name, version), so a
+    saved matrix is sympified once rather than on every operation that uses it.
+
+    Attributes:
+        store (MatrixStore): The underlying store; all writes go through it.
+    """
+
+    def __init__(self, store: MatrixStore) -> None:
+        self.store = store
+        self._lock = threading.Lock()
+        self._generation = None
+        self._entries = {}  # name -> (version, data)
+        self._parsed = {}   # name -> (version, Matrix)
+
+    def _refresh(self) -> None:
+        """
+        Bring the snapshot up to date if the store changed since it was taken.
+        """
+        generation = self.store.generation()
+        if generation == self._generation:
+            return
+        with self._lock:
+            if generation == self._generation:
+                return
+            generation, versions = self.store.versions()
+            stale = [name for name, version in versions.items()
+                     if name not in self._entries or self._entries[name][0] != version]
+            # Rows rewritten after the version scan come back newer; the next refresh settles them
+            loaded = self.store.get_many(stale)
+            entries = {}
+            for name in versions:
+                entry = loaded.get(name) or (self._entries.get(name) if name not in stale else None)
+                if entry is not None:
+                    entries[name] = entry
+            self._generation, self._entries = generation, entries
+            # Drop parsed matrices whose source was deleted or rewritten
+            self._parsed = {name: parsed for name, parsed in self._parsed.items()
+                            if name in entries and entries[name][0] == parsed[0]}
+
+    def snapshot(self) -> Dict[str, List[List[Any]]]:
+        """
+        Return every stored matrix.
+
+        Returns:
+            Dictionary mapping names to matrix data. Callers must not mutate it.
+        """
+        self._refresh()
+        return {name: data for name, (_, data) in self._entries.items()}
+
+    def get(self, name: str) -> Optional[List[List[Any]]]:
+        """
+        Return the raw data of one matrix, or None if it does not exist.
+        """
+        entry = self.entry(name)
+        return entry[1] if entry else None
+
+    def entry(self, name: str) -> Optional[Tuple[int, List[List[Any]]]]:
+        """
+        Return (version, data) of one matrix, or None if it does not exist.
+        """
+        self._refresh()
+        return self._entries.get(name)
+
+    def versioned(self) -> Tuple[int, Dict[str, Tuple[int, List[List[Any]]]]]:
+        """
+        Return the generation and every matrix's (version, data), consistent
+        with each other. Callers must not mutate the dictionary.
+        """
+        self._refresh()
+        with self._lock:
+            return self._generation, self._entries
+
+    def matrix(self, name: str) -> Optional[Matrix]:
+        """
+        Return the parsed Matrix for a stored name.
+
+        Args:
+            name: Name of the matrix.
+
+        Returns:
+            A Matrix instance shared between callers, or None if the name is unknown.
+        """
+        self._refresh()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            version, data = entry
+            parsed = self._parsed.get(name)
+        if parsed is None or parsed[0] != version:
+            # Parse outside the lock; a racing caller at worst parses the same version twice
+            parsed = (version, Matrix(data))
+            with self._lock:
+                if self._entries.get(name, (None,))[0] == version:
+                    self._parsed[name] = parsed
+        return parsed[1]
+
+    def invalidate(self) -> None:
+        """
+        Force the next read to reload from the store.
+        """
+        with self._lock:
+            self._generation = None
+
+
+# -----------------------------
+# Result Cache Class
+# -----------------------------
+class ResultCache:
+    """
+    A bounded LRU cache with per-entry expiry for computed results.
+
+    Lookups hit a per-process OrderedDict first. When a path is given, entries
+    are also written to a shared SQLite file, so a result computed by one worker
+    process is served to the others. Values must be JSON-serializable.
+
+    Attributes:
+        maxsize (int): Maximum number of entries kept in memory.
+        ttl (float): Seconds an entry stays valid.
+        path (Optional[str]): Shared SQLite file, or None for a process-local cache.
+        hits (int): Lookups answered from memory.
+        shared_hits (int): Lookups answered from the shared store.
+        misses (int): Lookups that found nothing.
+        evictions (int): Entries dropped from memory to respect maxsize.
+    """
+
+    def __init__(self, maxsize: int = 1024, ttl: float = 600.0, path: Optional[str] = None,
+                 timeout: float = 5.0) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.timeout = timeout
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._writes = 0
+        self._ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        return _schema_connection(self)
+
+    def _init_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)'
+        )
+        conn.execute('CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner INTEGER NOT NULL, expires_at REAL NOT NULL)')
+
+    def _remember(self, key: str, value: Any, expires_at: float) -> None:
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get(self, key: str) -> Tuple[bool, Any]:
+        """
+        Look up a cached value.
+
+        Args:
+            key: The cache key.
+
+        Returns:
+            Tuple of (found, value); value is None when nothing was found.
+        """
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return True, entry[1]
+                del self._entries[key]
+        if self.path:
+            try:
+                row = self._connect().execute(
+                    'SELECT value, expires_at FROM results WHERE key = ? AND expires_at > ?', (key, now)
+                ).fetchone()
+            except sqlite3.Error:
+                row = None  # the shared tier is best-effort
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value, row[1])
+                with self._lock:
+                    self.shared_hits += 1
+                return True, value
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def set(self, key: str, value: Any) -> None:
+        """
+        Store a value under a key.
+
+        Args:
+            key: The cache key.
+            value: A JSON-serializable value.
+        """
+        expires_at = time.time() + self.ttl
+        self._remember(key, value, expires_at)
+        if not self.path:
+            return
+        try:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO results (key, value, expires_at) VALUES (?, ?, ?)',
+                         (key, json.dumps(value), expires_at))
+            self._writes += 1
+            if self._writes % 256 == 0:
+                # Keep the shared file bounded: drop expired rows, then the oldest surplus
+                conn.execute('DELETE FROM results WHERE expires_at <= ?', (time.time(),))
+                conn.execute('DELETE FROM results WHERE key NOT IN'
+                             ' (SELECT key FROM results ORDER BY expires_at DESC LIMIT ?)', (self.maxsize * 8,))
+        except sqlite3.Error:
+            pass
+
+    def claim(self, key: str, lease: float) -> bool:
+        """
+        Try to become the process that computes the value for a key.
+
+        Args:
+            key: The cache key.
+            lease: Seconds after which an unreleased claim is considered abandoned.
+
+        Returns:
+            True if this process holds the claim (or there is no shared store),
+            False if another live process is already computing the value.
+        """
+        if not self.path:
+            return True
+        now = time.time()
+        try:
+            conn = self._connect()
+            conn.execute('BEGIN IMMEDIATE')
+            try:
+                conn.execute('DELETE FROM leases WHERE key = ? AND expires_at <= ?', (key, now))
+                cur = conn.execute('INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)',
+                                   (key, os.getpid(), now + lease))
+                conn.execute('COMMIT')
+            except BaseException:
+                conn.execute('ROLLBACK')
+                raise
+            return cur.rowcount > 0
+        except sqlite3.Error:
+            return True
+
+    def release(self, key: str) -> None:
+        """
+        Drop this process's claim on a key.
+        """
+        if not self.path:
+            return
+        try:
+            self._connect().execute('DELETE FROM leases WHERE key = ? AND owner = ?', (key, os.getpid()))
+        except sqlite3.Error:
+            pass
+
+    def clear(self) -> None:
+        """
+        Drop every entry, locally and in the shared store.
+        """
+        with self._lock:
+            self._entries.clear()
+        if self.path:
+            self._connect().execute('DELETE FROM results')
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Return hit/miss counters for this process.
+
+        Returns:
+            Dictionary with hits, shared_hits, misses, evictions, size and hit_rate.
+        """
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                'hits': self.hits,
+                'shared_hits': self.shared_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hit_rate': (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
+
+
+# -----------------------------
+# Profile Store Class
+# -----------------------------
+class ProfileStore:
+    """
+    Keeps the most recent profile reports, apart from computed results.
+
+    Reports are few and rarely read, so they get their own store rather than
+    competing with results for cache space: the newest ``keep`` reports stay
+    available, however busy the result cache is, and none expires with age.
+    When a path is given, reports are also written to a shared SQLite file, so
+    any worker process can serve a report made by another.
+
+    Attributes:
+        keep (int): Number of reports kept.
+        path (Optional[str]): Shared SQLite file, or None for a process-local store.
+    """
+
+    def __init__(self, keep: int = 100, path: Optional[str] = None, timeout: float = 5.0) -> None:
+        self.keep = keep
+        self.path = path
+        self.timeout = timeout
+        self._reports = OrderedDict()  # id -> report
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._ready = False
+        self._schema_lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        return _schema_connection(self)
+
+    def _init_schema(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            'CREATE TABLE IF NOT EXISTS profiles (id TEXT PRIMARY KEY, report TEXT NOT NULL, created_at REAL NOT NULL)'
+        )
+
+    def add(self, report_id: str, report: Dict[str, Any]) -> None:
+        """
+        Store a report, dropping the oldest beyond ``keep``.
+
+        Args:
+            report_id: The report's id.
+            report: A JSON-serializable report.
+        """
+        with self._lock:
+            self._reports[report_id] = report
+            while len(self._reports) > self.keep:
+                self._reports.popitem(last=False)
+        if not self.path:
+            return
+        try:
+            conn = self._connect()
+            conn.execute('INSERT OR REPLACE INTO profiles (id, report, created_at) VALUES (?, ?, ?)',
+                         (report_id, json.dumps(report), time.time()))
+            conn.execute('DELETE FROM profiles WHERE id NOT IN'
+                         ' (SELECT id FROM profiles ORDER BY rowid DESC LIMIT ?)', (self.keep,))
+        except sqlite3.Error:
+            pass  # the shared copy is best-effort, like the result cache's
+
+    def get(self, report_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return a report, or None if it is unknown or was dropped.
+        """
+        with self._lock:
+            report = self._reports.get(report_id)
+        if report is not None or not self.path:
+            return report
+        try:
+            row = self._connect().execute('SELECT report FROM profiles WHERE id = ?', (report_id,)).fetchone()
+        except sqlite3.Error:
+            return None
+        return json.loads(row[0]) if row else None
+
+
+# -----------------------------
+# Single Flight Class
+# -----------------------------
+class _Call:
+    def __init__(self) -> None:
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Coalesce concurrent computations of the same key.
+
+    The first caller for a key runs the computation; callers arriving while it
+    is in flight block and receive the same value (or exception). When a
+    ResultCache with a shared store is given, coalescing extends across
+    processes: a process that finds another process's claim polls the shared
+    cache for its result instead of computing it again.
+
+    Attributes:
+        cache (Optional[ResultCache]): Cache used for cross-process claims.
+        lease (float): Seconds a cross-process claim stays valid.
+        poll (float): Seconds between checks of the shared cache while waiting.
+        coalesced (int): Calls answered by another caller's computation.
+    """
+
+    def __init__(self, cache: Optional[ResultCache] = None, lease: float = 60.0, poll: float = 0.05) -> None:
+        self.cache = cache
+        self.lease = lease
+        self.poll = poll
+        self.coalesced = 0
+        self._lock = threading.Lock()
+        self._calls = {}  # key -> _Call
+
+    def in_flight(self) -> int:
+        """
+        Return the number of keys currently being computed in this process.
+        """
+        with self._lock:
+            return len(self._calls)
+
+    def _wait_for_peer(self, key: str) -> Tuple[bool, Any]:
+        """
+        Wait for another process holding the claim to publish its result.
+        """
+        deadline = time.time() + self.lease
+        while time.time() < deadline:
+            found, value = self.cache.get(key)
+            if found:
+                return True, value
+            if self.cache.claim(key, self.lease):
+                return False, None  # the peer gave up or died; compute here
+            time.sleep(self.poll)
+        return False, None
+
+    def do(self, key: str, fn) -> Tuple[Any, bool]:
+        """
+        Run fn once for all concurrent callers using the same key.
+
+        Args:
+            key: Identity of the computation.
+            fn: Zero-argument callable producing the value.
+
+        Returns:
+            Tuple of (value, shared); shared is True when another caller's
+            computation supplied the value.
+
+        Raises:
+            Exception: Whatever fn raised, re-raised in every waiting caller.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+            else:
+                call.waiters += 1
+        if not leader:
+            call.done.wait()
+            with self._lock:
+                self.coalesced += 1
+            if call.error is not None:
+                raise call.error
+            return call.value, True
+
+        shared = False
+        try:
+            if self.cache is not None and not self.cache.claim(key, self.lease):
+                shared, call.value = self._wait_for_peer(key)
+            if not shared:
+                try:
+                    call.value = fn()
+                finally:
+                    if self.cache is not None:
+                        self.cache.release(key)
+            return call.value, shared
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
@@ -1,4 +1,11 @@
 import math
+import operator
+import re
+from fractions import Fraction
+from functools import lru_cache, partial
+
+# Number of distinct (source, target) unit pairs whose compiled converters are kept
+CONVERTER_CACHE_SIZE = 4096
 
 # Temperature conversion functions (Kelvin as standard)
 def celsius_to_kelvin(c):
@@ -19,6 +26,15 @@ def rankine_to_kelvin(r):
 def kelvin_to_rankine(k):
     return k * 9 / 5
 
+# The same scales in closed form: kelvin = scale * x + offset. Exact fractions, so
+# that composed conversions such as celsius to fahrenheit come out exact
+temperature_affine = {
+    'celsius': (Fraction(1), Fraction('273.15')),
+    'fahrenheit': (Fraction(5, 9), Fraction('459.67') * 5 / 9),
+    'kelvin': (Fraction(1), Fraction(0)),
+    'rankine': (Fraction(5, 9), Fraction(0)),
+}
+
 # Fuel consumption conversion functions (liter/100km as standard)
 fuel_consumption_units = {
     'liter/100km': (lambda x: x, lambda x: x),
@@ -27,6 +43,13 @@ fuel_consumption_units = {
     'mpg (imp.)': (lambda mpg: 282.480936 / mpg, lambda l100: 282.480936 / l100),
 }
 
+# The same units in closed form: liter/100km = constant / x
+fuel_consumption_reciprocals = {
+    'mpg (us)': 235.214583,
+    'km/liter': 100,
+    'mpg (imp.)': 282.480936,
+}
+
 # Conversion factors for categories with multiplicative conversions
 # Length (meter as standard)
 length_factors = {
@@ -397,107 +420,543 @@ digital_storage_factors = {
 }
 
 # Categories dictionary
-categories = {
-    'length': {
-        'standard': 'meter',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in length_factors.items()}
-    },
-    'mass': {
-        'standard': 'kilogram',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in mass_factors.items()}
-    },
-    'temperature': {
-        'standard': 'kelvin',
-        'units': {
-            'celsius': (celsius_to_kelvin, kelvin_to_celsius),
-            'fahrenheit': (fahrenheit_to_kelvin, kelvin_to_fahrenheit),
-            'kelvin': (lambda x: x, lambda x: x),
-            'rankine': (rankine_to_kelvin, kelvin_to_rankine),
-        }
-    },
-    'speed': {
-        'standard': 'meter/second',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in speed_factors.items()}
-    },
-    'volume': {
-        'standard': 'cubic meter',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in volume_factors.items()}
-    },
-    'area': {
-        'standard': 'sq. meter',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in area_factors.items()}
-    },
-    'time': {
-        'standard': 'second',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in time_factors.items()}
-    },
-    'frequency': {
-        'standard': 'hertz',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in frequency_factors.items()}
-    },
-    'angle': {
-        'standard': 'radian',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in angle_factors.items()}
-    },
-    'force': {
-        'standard': 'newton',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in force_factors.items()}
-    },
-    'pressure': {
-        'standard': 'pascal',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in pressure_factors.items()}
-    },
-    'energy': {
-        'standard': 'joule',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in energy_factors.items()}
-    },
-    'power': {
-        'standard': 'watt',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in power_factors.items()}
-    },
-    'electric current': {
-        'standard': 'ampere',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in current_factors.items()}
-    },
-    'voltage': {
-        'standard': 'volt',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in voltage_factors.items()}
-    },
-    'resistance': {
-        'standard': 'ohm',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in resistance_factors.items()}
-    },
-    'digital storage': {
-        'standard': 'byte',
-        'units': {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) 
-                  for unit, factor in digital_storage_factors.items()}
-    },
-    'fuel consumption': {
-        'standard': 'liter/100km',
-        'units': fuel_consumption_units
-    },
+# Category tables are built on first use, so importing this module stays cheap
+_categories = None
+_unit_to_category = None
+
+def _scaled_units(factors):
+    return {unit: (lambda x, f=factor: x * f, lambda x, f=factor: x / f) for unit, factor in factors.items()}
+
+def _scaled_forms(factors):
+    return {unit: ('scale', factor, 0) for unit, factor in factors.items()}
+
+def _load_categories():
+    """
+    Build the category tables and the unit-to-category mapping once.
+
+    Each category has its standard unit, per-unit (to_standard, from_standard)
+    functions under 'units', and the same conversions in closed form under
+    'forms': (kind, a, b) where the value in the standard unit is a * x for
+    "scale", a * x + b for "affine" and a / x for "reciprocal".
+
+    Returns:
+        tuple: (categories, unit_to_category)
+    """
+    global _categories, _unit_to_category
+    if _categories is not None:
+        return _categories, _unit_to_category
+    categories = {
+        'length': {
+            'standard': 'meter',
+            'units': _scaled_units(length_factors),
+            'forms': _scaled_forms(length_factors),
+        },
+        'mass': {
+            'standard': 'kilogram',
+            'units': _scaled_units(mass_factors),
+            'forms': _scaled_forms(mass_factors),
+        },
+        'temperature': {
+            'standard': 'kelvin',
+            'units': {
+                'celsius': (celsius_to_kelvin, kelvin_to_celsius),
+                'fahrenheit': (fahrenheit_to_kelvin, kelvin_to_fahrenheit),
+                'kelvin': (lambda x: x, lambda x: x),
+                'rankine': (rankine_to_kelvin, kelvin_to_rankine),
+            },
+            'forms': {unit: ('affine', scale, offset) for unit, (scale, offset) in temperature_affine.items()}
+        },
+        'speed': {
+            'standard': 'meter/second',
+            'units': _scaled_units(speed_factors),
+            'forms': _scaled_forms(speed_factors),
+        },
+        'volume': {
+            'standard': 'cubic meter',
+            'units': _scaled_units(volume_factors),
+            'forms': _scaled_forms(volume_factors),
+        },
+        'area': {
+            'standard': 'sq. meter',
+            'units': _scaled_units(area_factors),
+            'forms': _scaled_forms(area_factors),
+        },
+        'time': {
+            'standard': 'second',
+            'units': _scaled_units(time_factors),
+            'forms': _scaled_forms(time_factors),
+        },
+        'frequency': {
+            'standard': 'hertz',
+            'units': _scaled_units(frequency_factors),
+            'forms': _scaled_forms(frequency_factors),
+        },
+        'angle': {
+            'standard': 'radian',
+            'units': _scaled_units(angle_factors),
+            'forms': _scaled_forms(angle_factors),
+        },
+        'force': {
+            'standard': 'newton',
+            'units': _scaled_units(force_factors),
+            'forms': _scaled_forms(force_factors),
+        },
+        'pressure': {
+            'standard': 'pascal',
+            'units': _scaled_units(pressure_factors),
+            'forms': _scaled_forms(pressure_factors),
+        },
+        'energy': {
+            'standard': 'joule',
+            'units': _scaled_units(energy_factors),
+            'forms': _scaled_forms(energy_factors),
+        },
+        'power': {
+            'standard': 'watt',
+            'units': _scaled_units(power_factors),
+            'forms': _scaled_forms(power_factors),
+        },
+        'electric current': {
+            'standard': 'ampere',
+            'units': _scaled_units(current_factors),
+            'forms': _scaled_forms(current_factors),
+        },
+        'voltage': {
+            'standard': 'volt',
+            'units': _scaled_units(voltage_factors),
+            'forms': _scaled_forms(voltage_factors),
+        },
+        'resistance': {
+            'standard': 'ohm',
+            'units': _scaled_units(resistance_factors),
+            'forms': _scaled_forms(resistance_factors),
+        },
+        'digital storage': {
+            'standard': 'byte',
+            'units': _scaled_units(digital_storage_factors),
+            'forms': _scaled_forms(digital_storage_factors),
+        },
+        'fuel consumption': {
+            'standard': 'liter/100km',
+            'units': fuel_consumption_units,
+            'forms': {'liter/100km': ('scale', 1, 0),
+                      **{unit: ('reciprocal', k, 0) for unit, k in fuel_consumption_reciprocals.items()}}
+        },
+    }
+
+    # Build unit-to-category mapping
+    unit_to_category = {}
+    for cat, data in categories.items():
+        for unit in data['units']:
+            unit_to_category[unit] = cat
+    _unit_to_category = unit_to_category
+    _categories = categories
+    return categories, unit_to_category
+
+def __getattr__(name):
+    # Module-level `categories` and `unit_to_category` are created on first access
+    if name == 'categories':
+        return _load_categories()[0]
+    if name == 'unit_to_category':
+        return _load_categories()[1]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Compound units
+# Every category's standard unit is coherent SI, so a unit's factor in its table is
+# also its factor in base units, with the dimensions of its category
+BASE_DIMENSIONS = ('length', 'mass', 'time', 'current', 'temperature', 'angle', 'data')
+
+def _dimensions(**exponents):
+    return tuple(exponents.get(base, 0) for base in BASE_DIMENSIONS)
+
+DIMENSIONLESS = _dimensions()
+
+category_dimensions = {
+    'length': _dimensions(length=1),
+    'mass': _dimensions(mass=1),
+    'temperature': _dimensions(temperature=1),
+    'speed': _dimensions(length=1, time=-1),
+    'volume': _dimensions(length=3),
+    'area': _dimensions(length=2),
+    'time': _dimensions(time=1),
+    'frequency': _dimensions(time=-1),
+    'angle': _dimensions(angle=1),
+    'force': _dimensions(mass=1, length=1, time=-2),
+    'pressure': _dimensions(mass=1, length=-1, time=-2),
+    'energy': _dimensions(mass=1, length=2, time=-2),
+    'power': _dimensions(mass=1, length=2, time=-3),
+    'electric current': _dimensions(current=1),
+    'voltage': _dimensions(mass=1, length=2, time=-3, current=-1),
+    'resistance': _dimensions(mass=1, length=2, time=-3, current=-2),
+    'digital storage': _dimensions(data=1),
+    # fuel consumption is left out: its units are reciprocals of one another
+}
+
+# Unit expressions for fuel consumption are volume per distance, an area in base units
+# ("L/100km"), or distance per volume ("mi/gal"), the reciprocal form of the table units
+FUEL_CONSUMPTION_FACTOR = Fraction(1, 10 ** 8)  # liter/100km in m³/m
+FUEL_DIMENSIONS = (_dimensions(length=2), _dimensions(length=-2))
+
+# Unit symbols, case-sensitive, each standing for a unit name or a unit expression
+unit_symbols = {
+    'm': 'meter', 'ft': 'foot', 'in': 'inch', 'yd': 'yard', 'mi': 'mile', 'nmi': 'nautical mile',
+    'au': 'astronomical unit', 'ly': 'light year', 'pc': 'parsec',
+    'g': 'gram', 't': 'metric ton', 'lb': 'pound', 'lbs': 'pound', 'oz': 'ounce',
+    's': 'second', 'sec': 'second', 'min': 'minute', 'h': 'hour', 'hr': 'hour', 'd': 'day',
+    'wk': 'week', 'yr': 'year',
+    'Hz': 'hertz', 'rad': 'radian', 'deg': 'degree', '°': 'degree', 'K': 'kelvin',
+    'N': 'newton', 'Pa': 'pascal', 'bar': 'bar', 'atm': 'standard atmosphere',
+    'J': 'joule', 'cal': 'calorie', 'eV': 'electron volt', 'Wh': 'watt*hour',
+    'W': 'watt', 'hp': 'horsepower', 'A': 'ampere', 'V': 'volt', 'Ω': 'ohm',
+    'B': 'byte', 'L': 'liter', 'l': 'liter', 'ha': 'hectare', 'mph': 'mile/hour', 'kn': 'knot',
 }
+# Symbols that take SI prefixes (km, kWh, ms, MB, ...)
+prefixable_symbols = {'m', 'g', 't', 's', 'Hz', 'rad', 'K', 'N', 'Pa', 'bar', 'J', 'cal', 'eV', 'Wh',
+                      'W', 'A', 'V', 'Ω', 'B', 'bit', 'L', 'l'}
+
+# SI prefixes: name -> (symbol, factor)
+si_prefixes = {
+    'yotta': ('Y', 1e24), 'zetta': ('Z', 1e21), 'exa': ('E', 1e18), 'peta': ('P', 1e15),
+    'tera': ('T', 1e12), 'giga': ('G', 1e9), 'mega': ('M', 1e6), 'kilo': ('k', 1e3),
+    'hecto': ('h', 1e2), 'deka': ('da', 1e1), 'deca': ('da', 1e1), 'deci': ('d', 1e-1),
+    'centi': ('c', 1e-2), 'milli': ('m', 1e-3), 'micro': ('µ', 1e-6), 'nano': ('n', 1e-9),
+    'pico': ('p', 1e-12), 'femto': ('f', 1e-15), 'atto': ('a', 1e-18), 'zepto': ('z', 1e-21),
+    'yocto': ('y', 1e-24),
+}
+_symbol_prefixes = {symbol: factor for symbol, factor in si_prefixes.values()}
+_symbol_prefixes.update({'u': 1e-6, 'μ': 1e-6})  # ASCII and Greek-letter micro
+# Binary prefixes, for bytes and bits only (KiB, Mibit, ...)
+binary_prefixes = {'Ki': 2 ** 10, 'Mi': 2 ** 20, 'Gi': 2 ** 30, 'Ti': 2 ** 40, 'Pi': 2 ** 50, 'Ei': 2 ** 60}
+
+_SUPERSCRIPTS = str.maketrans('⁰¹²³⁴⁵⁶⁷⁸⁹⁻', '0123456789-')
+# Letters, excluding the superscript digits that regular expressions count as word characters
+_LETTER = r"[^\W\d_⁰¹²³⁴⁵⁶⁷⁸⁹]"
+_UNIT_TOKEN = re.compile(
+    r"\s*(?:(\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)"                          # number
+    rf"|({_LETTER}(?:{_LETTER}|_)*(?:-{_LETTER}+)*|°|Ω)"                  # word, possibly hyphenated
+    r"|([⁰¹²³⁴⁵⁶⁷⁸⁹⁻]+)"                                                 # superscript exponent
+    r"|(\*\*|\S))")
+
+def format_dimensions(dimensions):
+    """
+    Describe a dimension vector, e.g. "length·time^-1".
+    """
+    parts = [base if power == 1 else f"{base}^{power}"
+             for base, power in zip(BASE_DIMENSIONS, dimensions) if power]
+    return '·'.join(parts) or 'dimensionless'
+
+def _exact(number):
+    # Factors are combined as fractions of their decimal values and rounded once at the end
+    return Fraction(repr(number)) if isinstance(number, float) else Fraction(number)
 
-# Build unit-to-category mapping
-unit_to_category = {}
-for cat, data in categories.items():
-    for unit in data['units']:
-        unit_to_category[unit] = cat
+def _table_atom(name):
+    # A unit name from the category tables, as (factor, dimensions)
+    categories, unit_to_category = _load_categories()
+    category = unit_to_category.get(name)
+    if category not in category_dimensions:
+        return None
+    kind, factor, offset = categories[category]['forms'][name]
+    if offset:
+        raise ValueError(f"{name} has an offset and cannot be part of a compound unit")
+    return _exact(factor), category_dimensions[category]
+
+def _name_atom(name):
+    # A unit name, possibly plural, possibly with a spelled-out SI prefix
+    for candidate in (name, name[:-1] if name.endswith('s') else None, name[:-2] if name.endswith('es') else None,
+                      'foot' if name == 'feet' else None):
+        if candidate:
+            atom = _table_atom(candidate)
+            if atom:
+                return atom
+    for prefix, (_, multiplier) in si_prefixes.items():
+        if name.startswith(prefix) and len(name) > len(prefix):
+            atom = _name_atom(name[len(prefix):])
+            if atom:
+                return atom[0] * _exact(multiplier), atom[1]
+    return None
+
+def _atom(word):
+    """
+    Resolve one word of a unit expression to (factor, dimensions), or None.
+
+    Tried in order: a unit name from the tables (any case, plurals allowed),
+    a name with an SI prefix ("kilonewton"), a unit symbol (case-sensitive),
+    then a symbol with an SI or binary prefix ("kWh", "ms", "GiB").
+    """
+    atom = _name_atom(word.lower())
+    if atom:
+        return atom
+    if word in unit_symbols:
+        return parse_unit(unit_symbols[word])
+    for length in (2, 1):
+        prefix, symbol = word[:length], word[length:]
+        if prefix in binary_prefixes and symbol in ('B', 'bit'):
+            multiplier = binary_prefixes[prefix]
+        elif prefix in _symbol_prefixes and symbol in prefixable_symbols:
+            multiplier = _exact(_symbol_prefixes[prefix])
+        else:
+            continue
+        factor, dimensions = parse_unit(unit_symbols.get(symbol, symbol))
+        return factor * multiplier, dimensions
+    return None
+
+class _UnitParser:
+    """
+    Recursive-descent parser for unit expressions.
+
+    Grammar (division and multiplication are left-associative, so "J/kg K"
+    means (J/kg)·K; use parentheses for J/(kg·K)):
+        product := power (("*" | "·" | "/" | "per" | <space>) power)*
+        power   := primary (("^" | "**") ["-"] integer | superscript)?
+        primary := number [power] | "(" product ")" | words
+
+    A number written against a unit binds to it, so "L/100km" is liters per
+    100 km. Consecutive words are matched against multi-word unit names
+    first ("kilowatt hour", "nautical miles"); otherwise each word is a unit
+    and the words are multiplied ("newton meter").
+    """
+
+    def __init__(self, text):
+        self.text = text
+        self.tokens = []
+        self.spans = []
+        position = 0
+        while position < len(text):
+            match = _UNIT_TOKEN.match(text, position)
+            if not match or not any(match.groups()):
+                break
+            self.tokens.append(match.groups())
+            self.spans.append(match.span(match.lastindex))
+            position = match.end()
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else (None, None, None, None)
+
+    def parse(self):
+        if not self.tokens or self.text[self.spans[-1][1]:].strip():
+            raise ValueError(f"Unit not recognized: {self.text}")
+        result = self.product()
+        if self.position != len(self.tokens):
+            raise ValueError(f"Unit not recognized: unexpected '{''.join(t for t in self.peek() if t)}' in {self.text}")
+        return result
+
+    def product(self):
+        factor, dimensions = self.power()
+        while True:
+            number, word, superscript, op = self.peek()
+            if word and word.lower() == 'per':
+                op = '/'
+            if op in ('*', '·', '⋅', '/'):
+                self.position += 1
+                right_factor, right_dimensions = self.power()
+                if op == '/':
+                    factor, dimensions = factor / right_factor, _combine_dimensions(dimensions, right_dimensions, -1)
+                    continue
+            elif number or word or op == '(':
+                right_factor, right_dimensions = self.power()
+            else:
+                return factor, dimensions
+            factor, dimensions = factor * right_factor, _combine_dimensions(dimensions, right_dimensions, 1)
+
+    def power(self):
+        factor, dimensions = self.primary()
+        number, word, superscript, op = self.peek()
+        if superscript:
+            self.position += 1
+            exponent = superscript.translate(_SUPERSCRIPTS)
+        elif op in ('^', '**'):
+            self.position += 1
+            sign = ''
+            if self.peek()[3] in ('-', '+'):
+                sign = self.peek()[3]
+                self.position += 1
+            exponent = sign + (self.peek()[0] or '')
+            self.position += 1
+        else:
+            return factor, dimensions
+        try:
+            exponent = int(exponent)
+        except ValueError:
+            raise ValueError(f"Unit not recognized: exponents must be integers in {self.text}")
+        return factor ** exponent, tuple(power * exponent for power in dimensions)
+
+    def primary(self):
+        number, word, superscript, op = self.peek()
+        if number:
+            self.position += 1
+            if self.peek()[1] and self.spans[self.position][0] == self.spans[self.position - 1][1]:
+                factor, dimensions = self.power()  # "100km"
+                return Fraction(number) * factor, dimensions
+            return Fraction(number), DIMENSIONLESS
+        if op == '(':
+            self.position += 1
+            result = self.product()
+            if self.peek()[3] != ')':
+                raise ValueError(f"Unit not recognized: missing ')' in {self.text}")
+            self.position += 1
+            return result
+        if not word:
+            raise ValueError(f"Unit not recognized: {self.text}")
+        words = []
+        while self.position + len(words) < len(self.tokens):
+            following = self.tokens[self.position + len(words)][1]
+            if not following or following.lower() == 'per':
+                break
+            words.append(following)
+        # Longest multi-word unit name first, then a single word
+        for count in range(len(words), 1, -1):
+            atom = _name_atom(' '.join(words[:count]).lower())
+            if atom:
+                self.position += count
+                return atom
+        self.position += 1
+        atom = _atom(word)
+        if atom is None and '-' in word:
+            atom = parse_unit(word.replace('-', '*'))  # "newton-meter"
+        if atom is None:
+            raise ValueError(f"Unit not recognized: {word}")
+        return atom
+
+def _combine_dimensions(left, right, sign):
+    return tuple(a + sign * b for a, b in zip(left, right))
+
+@lru_cache(maxsize=CONVERTER_CACHE_SIZE)
+def parse_unit(text):
+    """
+    Parse a unit expression into its factor and dimensions.
+
+    Units are names from the category tables or symbols, with optional SI
+    prefixes, combined with "*", "·", "/", spaces, parentheses and integer
+    exponents ("^2", "**-1", "²"). Results are cached, so repeated
+    conversions do not parse again.
+
+    Args:
+        text (str): The unit expression, e.g. "kWh/day" or "kg·m/s^2".
+
+    Returns:
+        tuple: (factor, dimensions), where factor is the Fraction converting
+        the unit to coherent SI base units, exact in terms of the decimal
+        factors in the tables, and dimensions holds the exponent of each of
+        BASE_DIMENSIONS.
+
+    Raises:
+        ValueError: If the expression or a unit in it is not recognized.
+
+    Examples:
+        >>> parse_unit('km/h')
+        (Fraction(5, 18), (1, 0, -1, 0, 0, 0, 0))
+    """
+    return _UnitParser(text).parse()
+
+def _unit_form(unit):
+    # (closed form, dimensions, category): table names keep their own form, which may
+    # be affine or reciprocal; unit expressions are a plain scale to SI base units
+    categories, unit_to_category = _load_categories()
+    name = unit.lower()
+    if name in unit_to_category:
+        category = unit_to_category[name]
+        kind, a, b = categories[category]['forms'][name]
+        return (kind, _exact(a), _exact(b)), category_dimensions.get(category), category
+    factor, dimensions = parse_unit(unit)
+    return ('scale', factor, 0), dimensions, None
+
+def _fuel_form(form, dimensions, category):
+    # Route a unit expression into the fuel consumption category, as a form to liter/100km
+    if category is None and dimensions == FUEL_DIMENSIONS[0]:
+        return ('scale', form[1] / FUEL_CONSUMPTION_FACTOR, 0), None, 'fuel consumption'
+    if category is None and dimensions == FUEL_DIMENSIONS[1]:
+        return ('reciprocal', 1 / (form[1] * FUEL_CONSUMPTION_FACTOR), 0), None, 'fuel consumption'
+    return form, dimensions, category
+
+def _combine(source, target):
+    """
+    Compose two closed forms into the single form from source to target.
+    """
+    kind1, a1, b1 = source
+    kind2, a2, b2 = target
+    if kind1 != 'reciprocal' and kind2 != 'reciprocal':
+        # (a1 * x + b1 - b2) / a2
+        offset = (b1 - b2) / a2
+        return ('affine', a1 / a2, offset) if offset else ('scale', a1 / a2, 0)
+    if kind1 == 'reciprocal' and kind2 == 'reciprocal':
+        return ('scale', a2 / a1, 0)  # a2 / (a1 / x)
+    if kind1 == 'reciprocal' and not b2:
+        return ('reciprocal', a1 / a2, 0)  # (a1 / x) / a2
+    if kind2 == 'reciprocal' and not b1:
+        return ('reciprocal', a2 / a1, 0)  # a2 / (a1 * x)
+    raise ValueError("Units have no closed-form conversion")
+
+@lru_cache(maxsize=CONVERTER_CACHE_SIZE)
+def conversion_form(source_unit, target_unit):
+    """
+    Find the closed form of the conversion between two units.
+
+    Units are names from the category tables or, failing that, unit
+    expressions understood by parse_unit(), which convert when they have the
+    same dimensions ("kilometer/hour" to "m/s", "kWh/day" to "watt").
+    Expressions of volume per distance and of distance per volume convert
+    to each other and to the fuel consumption units ("L/100km" to "mpg (us)").
+
+    Args:
+        source_unit (str): The unit to convert from.
+        target_unit (str): The unit to convert to.
+
+    Returns:
+        tuple: (kind, a, b), meaning target = a * x for "scale",
+        a * x + b for "affine" and a / x for "reciprocal".
+
+    Raises:
+        ValueError: If units are not recognized, not in the same category or
+            of different dimensions.
+    """
+    source = _unit_form(source_unit)
+    target = _unit_form(target_unit)
+    if 'fuel consumption' in (source[2], target[2]) or {source[1], target[1]} == set(FUEL_DIMENSIONS):
+        source, target = _fuel_form(*source), _fuel_form(*target)
+    (source_form, source_dimensions, source_cat), (target_form, target_dimensions, target_cat) = source, target
+    if source_cat and target_cat:
+        if source_cat != target_cat:
+            raise ValueError("Units are not in the same category")
+    elif source_dimensions is None or target_dimensions is None:
+        raise ValueError("Units are not in the same category")
+    elif source_dimensions != target_dimensions:
+        raise ValueError(f"Units have different dimensions: {format_dimensions(source_dimensions)} "
+                         f"and {format_dimensions(target_dimensions)}")
+    kind, a, b = _combine(source_form, target_form)
+    return kind, float(a), float(b)
+
+@lru_cache(maxsize=CONVERTER_CACHE_SIZE)
+def get_converter(source_unit, target_unit):
+    """
+    Get a function converting values from source_unit to target_unit.
+
+    The unit lookups and the composition of the two conversions are done
+    once per pair of units and cached, so each call of the returned function
+    costs a single multiplication (a multiply-add for temperatures, a
+    division for fuel consumption).
+
+    Args:
+        source_unit (str): The unit to convert from.
+        target_unit (str): The unit to convert to.
+
+    Returns:
+        callable: Function of one value returning the converted value.
+
+    Raises:
+        ValueError: If units are not recognized or not in the same category.
+
+    Examples:
+        >>> to_miles = get_converter('kilometer', 'mile')
+        >>> round(to_miles(42.195), 3)
+        26.219
+    """
+    kind, a, b = conversion_form(source_unit, target_unit)
+    if kind == 'scale':
+        return partial(operator.mul, a)
+    if kind == 'reciprocal':
+        return partial(operator.truediv, a)
+    return lambda x: x * a + b
 
 # Conversion function
 def convert(value, source_unit, target_unit):
@@ -515,23 +974,76 @@ def convert(value, source_unit, target_unit):
     Raises:
         ValueError: If units are not recognized or not in the same category.
     """
-    source_unit = source_unit.lower()
-    target_unit = target_unit.lower()
-    if source_unit not in unit_to_category or target_unit not in unit_to_category:
-        raise ValueError("Unit not recognized")
-    source_cat = unit_to_category[source_unit]
-    target_cat = unit_to_category[target_unit]
-    if source_cat != target_cat:
-        raise ValueError("Units are not in the same category")
-    category = categories[source_cat]
-    to_standard = category['units'][source_unit][0]
-    from_standard = category['units'][target_unit][1]
-    value_in_standard = to_standard(value)
-    value_in_target = from_standard(value_in_standard)
-    return value_in_target
+    return get_converter(source_unit, target_unit)(value)
+
+def _to_float(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+def convert_many(values, source_unit, target_unit, errors='raise'):
+    """
+    Convert many values at once from source_unit to target_unit.
+
+    The conversion is applied to the whole array in one vectorized step, so
+    it costs about one arithmetic operation per value.
+
+    Args:
+        values (list or numpy.ndarray): The values to convert, of any shape.
+        source_unit (str): The unit to convert from.
+        target_unit (str): The unit to convert to.
+        errors (str): What to do with values that cannot be converted, i.e.
+            non-numbers and zeros for reciprocal units such as mpg: "raise"
+            raises ValueError, "coerce" gives NaN for them. NaN input stays NaN.
+
+    Returns:
+        numpy.ndarray: The converted values as floats, in the shape of values.
+
+    Raises:
+        ValueError: If units are not recognized or not in the same category,
+            if errors is not "raise" or "coerce", or if errors is "raise" and
+            a value cannot be converted.
+
+    Examples:
+        >>> convert_many([0, 100], 'celsius', 'fahrenheit')
+        array([ 32., 212.])
+        >>> convert_many([25, 0], 'mpg (us)', 'liter/100km', errors='coerce')
+        array([9.40858332,        nan])
+    """
+    import numpy as np
+
+    if errors not in ('raise', 'coerce'):
+        raise ValueError("errors must be 'raise' or 'coerce'")
+    kind, a, b = conversion_form(source_unit, target_unit)
+    try:
+        x = np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        if errors == 'raise':
+            raise ValueError("Values must be numbers")
+        # Mixed input: parse element-wise, anything unparsable becomes NaN
+        array = np.asarray(values, dtype=object)
+        x = np.fromiter(map(_to_float, array.ravel()), dtype=float, count=array.size).reshape(array.shape)
+
+    if kind == 'scale':
+        return x * a
+    if kind == 'affine':
+        result = x * a
+        result += b
+        return result
+    zero = x == 0
+    if zero.any():
+        if errors == 'raise':
+            raise ValueError(f"Cannot convert 0 {source_unit} to {target_unit}")
+        with np.errstate(divide='ignore'):
+            result = a / x
+        result[zero] = np.nan
+        return result
+    return a / x
 
 # Main menu loop
 def main():
+    categories, _ = _load_categories()
     while True:
         print("\nSelect a category of conversion:")
         category_list = list(categories.keys())
@@ -1,155 +1,948 @@
-from flask import Flask, render_template, request, jsonify
-from Matrixcodes import Matrix
-import sympy as sp
+from flask import Flask, Response, g, render_template, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+from Matrixcodes import LazyModule, Matrix, OPERATIONS, PROPERTIES, apply_operation, current_progress
+from Matrixstore import MatrixStore, MatrixCache, ProfileStore, ResultCache, SingleFlight
+from Matrixjobs import FINISHED_STATES, JobQueue, QueueFullError
+from Matrixcost import AdmissionPolicy, estimate
+from Matrixexpr import evaluate, parse, plan, references, unparse
+from Matrixserial import check_precision, serialize_result, serialize_rows, to_array
+from Matrixmetrics import DIMENSION_BUCKETS, Registry
+from Matrixprofile import RequestProfile, in_phase, phase
+from concurrent.futures import ThreadPoolExecutor
+import functools
+import hashlib
+import io
 import json
 import os
+import time
+import uuid
+
+np = LazyModule('numpy', globals(), 'np')  # loaded by the first numeric request, not on import
+
+try:
+    import msgpack
+except ImportError:  # optional: only needed for msgpack requests and responses
+    msgpack = None
 
 app = Flask(__name__)
+# Request bodies are refused with 413 beyond this size, before any of them is parsed
+app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_CONTENT_LENGTH', 16 * 1024 * 1024))
+
+def data_path(variable, filename):
+    # Databases default to the instance folder; they are only created once used
+    return os.environ.get(variable, os.path.join(app.instance_path, filename))
 
 # Matrix storage
-MATRICES_FILE = 'matrices.json'
+MATRICES_DB = data_path('MATRICES_DB', 'matrices.db')
+MATRICES_FILE = 'matrices.json'  # legacy whole-file store, imported by create_app()
+
+store = MatrixStore(MATRICES_DB, history_limit=int(os.environ.get('HISTORY_LIMIT', 1000)))
+matrix_cache = MatrixCache(store)
+
+# Computed results, shared between worker processes through a local SQLite file
+result_cache = ResultCache(
+    maxsize=int(os.environ.get('RESULT_CACHE_SIZE', 1024)),
+    ttl=float(os.environ.get('RESULT_CACHE_TTL', 600)),
+    path=data_path('RESULT_CACHE_DB', 'results.db') or None,
+)
+# Streamed results above this many elements are sent without being kept for the cache
+STREAM_CACHE_MAX_ELEMENTS = int(os.environ.get('STREAM_CACHE_MAX_ELEMENTS', 250000))
+# Background jobs for long-running operations
+JOBS_DB = data_path('JOBS_DB', 'jobs.db')
+jobs = JobQueue(
+    JOBS_DB,
+    lambda payload: run_job(payload),
+    workers=int(os.environ.get('JOB_WORKERS', 2)),
+    maxsize=int(os.environ.get('JOB_QUEUE_SIZE', 100)),
+)
+# Server-Sent Events: how often a job's progress is checked, and the idle keep-alive period
+EVENTS_POLL = float(os.environ.get('EVENTS_POLL', 0.25))
+EVENTS_KEEPALIVE = float(os.environ.get('EVENTS_KEEPALIVE', 15))
+
+# Admission control: every computation is costed before it starts and then run inline,
+# downgraded to floating point, queued as a job or rejected, within per-operation limits
+admission = AdmissionPolicy(json.loads(os.environ.get('ADMISSION_LIMITS') or '{}'))
+COST_SCALE = float(os.environ.get('COST_SCALE', 1.0))  # >1 on hosts slower than the reference
+
+# Paginated matrix listings
+LIST_DEFAULT_LIMIT = int(os.environ.get('LIST_DEFAULT_LIMIT', 100))
+LIST_MAX_LIMIT = int(os.environ.get('LIST_MAX_LIMIT', 1000))
+
+# Batch requests
+BATCH_MAX_STEPS = int(os.environ.get('BATCH_MAX_STEPS', 64))
+BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', 4))
+
+# Identical requests arriving while a result is being computed wait for it
+inflight = SingleFlight(result_cache)
+raw_inflight = SingleFlight()  # streamed responses share the unserialized result in-process
+
+# Instrumentation, exposed in the Prometheus text format at /metrics
+metrics = Registry()
+request_count = metrics.counter(
+    'matrix_http_requests_total', 'HTTP requests by endpoint, method and status code.',
+    ['endpoint', 'method', 'status'])
+request_latency = metrics.histogram(
+    'matrix_http_request_duration_seconds', 'Time to build the HTTP response, by endpoint.', ['endpoint'])
+error_count = metrics.counter(
+    'matrix_errors_total', 'Failed requests by endpoint and exception type.', ['endpoint', 'exception'])
+operation_count = metrics.counter(
+    'matrix_operations_total', 'Computed operations by input kind and backend.', ['operation', 'kind', 'backend'])
+operation_latency = metrics.histogram(
+    'matrix_operation_duration_seconds', 'Wall time spent computing an operation.', ['operation'])
+operation_cpu = metrics.counter(
+    'matrix_operation_cpu_seconds_total', 'CPU time spent computing operations.', ['operation', 'backend'])
+operation_rows = metrics.histogram(
+    'matrix_operation_input_rows', 'Rows of the first operand.', ['operation'], buckets=DIMENSION_BUCKETS)
+operation_cols = metrics.histogram(
+    'matrix_operation_input_cols', 'Columns of the first operand.', ['operation'], buckets=DIMENSION_BUCKETS)
+for stat in ('hits', 'shared_hits', 'misses', 'evictions'):
+    metrics.counter(f'matrix_result_cache_{stat}_total', f'Result cache {stat.replace("_", " ")}.',
+                    callback=lambda stat=stat: result_cache.stats()[stat])
+metrics.gauge('matrix_result_cache_entries', 'Entries in the in-process result cache.',
+              callback=lambda: result_cache.stats()['size'])
+metrics.gauge('matrix_result_cache_hit_ratio', 'Fraction of result cache lookups that hit.',
+              callback=lambda: result_cache.stats()['hit_rate'])
+metrics.gauge('matrix_inflight_computations', 'Distinct computations currently running.',
+              callback=lambda: inflight.in_flight() + raw_inflight.in_flight())
+admission_count = metrics.counter(
+    'matrix_admission_decisions_total', 'Admission decisions by operation.', ['operation', 'action'])
+estimated_latency = metrics.histogram(
+    'matrix_operation_estimated_seconds', 'Estimated cost of admitted operations, to compare with '
+    'matrix_operation_duration_seconds.', ['operation'])
+metrics.gauge('matrix_jobs_pending', 'Background jobs waiting for a runner.', callback=lambda: jobs.pending())
+
+def measure(operation, matrix_a, compute, matrix_b=None):
+    # Time one computation and record what kind of input it ran on
+    numeric = matrix_a.is_numeric() and (matrix_b is None or matrix_b.is_numeric())
+    backend = 'numpy' if matrix_a.array is not None and (matrix_b is None or matrix_b.array is not None) else 'sympy'
+    operation_count.inc(operation, 'numeric' if numeric else 'symbolic', backend)
+    operation_rows.observe(operation, value=matrix_a.rows)
+    operation_cols.observe(operation, value=matrix_a.cols)
+    start, cpu_start = time.perf_counter(), time.thread_time()
+    try:
+        with phase('operation'):
+            return compute()
+    finally:
+        operation_latency.observe(operation, value=time.perf_counter() - start)
+        operation_cpu.inc(operation, backend, amount=time.thread_time() - cpu_start)
+
+def run_operation(operation, matrix_a, matrix_b=None, scalar=None):
+    label = operation if operation in OPERATIONS else 'invalid'  # keep label values bounded
+    return measure(label, matrix_a, lambda: apply_operation(operation, matrix_a, matrix_b, scalar), matrix_b)
+
+def record_error(e):
+    error_count.inc(request.endpoint or 'unknown', type(e).__name__)
+
+class TooLarge(ValueError):
+    # Inline input over the admission size limits, refused from its shape alone
+    pass
+
+def failure(e, **extra):
+    record_error(e)
+    return jsonify({'error': str(e), **extra}), 413 if isinstance(e, TooLarge) else 400
+
+def admit(operation, matrix_a, matrix_b=None, scalar=None, can_queue=False, prefer_queue=None, exact=None):
+    cost = estimate(operation, matrix_a, matrix_b, scalar, scale=COST_SCALE)
+    decision = admission.decide(cost, can_queue, prefer_queue, exact)
+    admission_count.inc(operation, decision['action'])
+    if decision['action'] != 'reject':
+        estimated_latency.observe(operation, value=decision['seconds'])
+    return decision
+
+def rejection(decision):
+    status = 413 if decision['exceeded'] in ('max_dim', 'max_elements') else 422
+    return jsonify({'error': decision['reason'], 'estimate': decision['seconds'], 'limit': decision['limit']}), status
+
+def admit_inline(operation, matrix_a, matrix_b=None, scalar=None, exact=None):
+    # For computations that must happen now: raise if too expensive, convert if downgraded
+    decision = admit(operation, matrix_a, matrix_b, scalar, exact=exact)
+    if decision['action'] == 'reject':
+        raise ValueError(decision['reason'])
+    if decision['action'] == 'downgrade':
+        matrix_a = matrix_a.to_numeric()
+        matrix_b = matrix_b.to_numeric() if matrix_b is not None else None
+    return decision, matrix_a, matrix_b
+
+@app.before_request
+def start_timer():
+    g.start = time.perf_counter()
+
+@app.before_request
+def read_body():
+    # Read the body up front, so that one over MAX_CONTENT_LENGTH is answered with 413
+    # here instead of surfacing as an error inside the view
+    if request.method in ('POST', 'PUT'):
+        request.get_data()
+
+@app.errorhandler(RequestEntityTooLarge)
+def body_too_large(e):
+    record_error(e)
+    return jsonify({'error': f"Request body exceeds the limit of {app.config['MAX_CONTENT_LENGTH']} bytes"}), 413
+
+@app.after_request
+def record_request(response):
+    if 'admission' in g:
+        response.headers['X-Cost-Estimate'] = f"{g.admission['seconds']:.6g}"
+        response.headers['X-Admission'] = g.admission['action']
+    endpoint = request.endpoint or 'unknown'
+    request_count.inc(endpoint, request.method, response.status_code)
+    if 'start' in g:
+        request_latency.observe(endpoint, value=time.perf_counter() - g.start)
+    return response
+
+# Opt-in profiling: clients listed here may send "X-Profile: 1" or "?profile=1"
+PROFILE_ALLOWLIST = {addr.strip() for addr in os.environ.get('PROFILE_ALLOWLIST', '').split(',') if addr.strip()}
+PROFILE_TOP = int(os.environ.get('PROFILE_TOP', 25))  # hotspots kept per report
+# The latest reports, shared between worker processes but kept apart from the result cache
+profiles = ProfileStore(
+    keep=int(os.environ.get('PROFILE_KEEP', 100)),
+    path=data_path('PROFILES_DB', 'profiles.db') or None,
+)
+
+def wants_profile():
+    return request.headers.get('X-Profile') == '1' or request.args.get('profile') == '1'
+
+def profile_allowed():
+    return request.remote_addr in PROFILE_ALLOWLIST
+
+def profiled(view):
+    # Run the view under cProfile when asked to; the report is kept in the profile
+    # store, named in an X-Profile-Id header and embedded in JSON responses
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        if not wants_profile():
+            return view(*args, **kwargs)
+        if not profile_allowed():
+            return jsonify({'error': 'Profiling is not enabled for this client'}), 403
+        profile = RequestProfile(top=PROFILE_TOP)
+        if not profile.start():
+            response = app.make_response(view(*args, **kwargs))
+            response.headers['X-Profile-Status'] = 'busy'
+            return response
+        g.profiling = True
+        try:
+            response = app.make_response(view(*args, **kwargs))
+        finally:
+            profile.stop()
+        profile_id = uuid.uuid4().hex
+        report = {'id': profile_id, 'endpoint': request.endpoint, **profile.report()}
+        profiles.add(profile_id, report)
+        response.headers['X-Profile-Id'] = profile_id
+        body = response.get_json(silent=True) if response.is_json else None
+        if isinstance(body, dict):
+            response.set_data(json.dumps({**body, 'profile': report}))
+        return response
+    return wrapper
+
+def lookup_result(key):
+    # A profiled request always computes, so that the report shows the real work
+    return (False, None) if g.get('profiling') else result_cache.get(key)
+
+# Wire formats besides JSON
+NPY_MIMETYPE = 'application/x-npy'
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack')
+
+def require_msgpack():
+    if msgpack is None:
+        raise ValueError('msgpack support is not installed on this server')
 
-def load_matrices():
-    if os.path.exists(MATRICES_FILE):
-        with open(MATRICES_FILE, 'r') as f:
-            return json.load(f)
-    return {}
+def decode_typed(value):
+    # {"dtype", "shape", "data"} typed arrays become array-backed matrices; other values pass through
+    if isinstance(value, dict) and 'dtype' in value and 'data' in value:
+        array = np.frombuffer(value['data'], dtype=np.dtype(value['dtype'])).reshape(value['shape'])
+        return Matrix.from_array(array)
+    return value
 
-def save_matrices(matrices):
-    with open(MATRICES_FILE, 'w') as f:
-        json.dump(matrices, f)
+def encode_typed(array):
+    array = np.ascontiguousarray(array)
+    return {'dtype': array.dtype.str, 'shape': list(array.shape), 'data': array.tobytes()}
+
+def read_payload():
+    # Decode the request body according to its Content-Type
+    if request.mimetype == NPY_MIMETYPE:
+        # Raw .npy body is matrixA; the other fields come from the query string
+        array = np.load(io.BytesIO(request.get_data()), allow_pickle=False)
+        data = {'operation': request.args.get('operation'), 'matrixA': Matrix.from_array(array)}
+        if 'scalar' in request.args:
+            data['scalar'] = json.loads(request.args['scalar'])
+        if 'matrixB' in request.args:
+            data['matrixB'] = {'ref': request.args['matrixB']}
+        return data
+    if request.mimetype in MSGPACK_MIMETYPES:
+        require_msgpack()
+        data = msgpack.unpackb(request.get_data())
+        for field in ('matrixA', 'matrixB', 'matrix'):
+            if field in data:
+                data[field] = decode_typed(data[field])
+        return data
+    return request.get_json()
+
+def response_mimetype():
+    return request.accept_mimetypes.best_match(
+        ['application/json', NPY_MIMETYPE, *MSGPACK_MIMETYPES], default='application/json')
+
+@in_phase('serialize')
+def send(payload, key='result'):
+    # Encode payload[key] in the negotiated format; JSON stays the default
+    mimetype = response_mimetype()
+    if mimetype == NPY_MIMETYPE:
+        array = to_array(payload[key])
+        if array is None:
+            return jsonify({'error': 'Result is not numeric and cannot be encoded as .npy'}), 406
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        return Response(buffer.getvalue(), mimetype=NPY_MIMETYPE)
+    if mimetype in MSGPACK_MIMETYPES:
+        require_msgpack()
+        value = payload[key]
+        if isinstance(value, list):
+            array = to_array(value)
+            value = encode_typed(array) if array is not None else value
+        return Response(msgpack.packb({**payload, key: value}), mimetype=mimetype)
+    return jsonify(payload)
+
+def matrix_payload(value):
+    # Matrices decoded from a binary body are stored in the JSON nested-list form
+    return value.array.tolist() if isinstance(value, Matrix) else value
 
 @app.route('/')
 def index():
     return render_template('index.html')
 
+def entity_tag(tag, mimetype=None):
+    # Strong validators differ per representation, since JSON, msgpack and .npy bodies differ
+    mimetype = mimetype or response_mimetype()
+    return tag if mimetype == 'application/json' else f"{tag}-{mimetype.rsplit('/', 1)[1]}"
+
+def not_modified(etag):
+    return request.if_none_match.contains_weak(etag)  # If-None-Match uses weak comparison
+
+def conditional(response, etag):
+    # Clients keep the body but revalidate it with If-None-Match on every use
+    response = app.make_response(response)
+    if response.status_code in (200, 304):
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'no-cache'
+        response.vary.add('Accept')
+    return response
+
+def listing_mimetype():
+    # Listings hold many matrices, so unlike single results they have no .npy form
+    if not request.accept_mimetypes:
+        return 'application/json'
+    return request.accept_mimetypes.best_match(['application/json', *MSGPACK_MIMETYPES])
+
+def list_matrices(mimetype):
+    # Metadata only, ordered by name; "next" is the "after" value for the following page
+    limit = int(request.args.get('limit', LIST_DEFAULT_LIMIT))
+    if not 1 <= limit <= LIST_MAX_LIMIT:
+        raise ValueError(f'Limit must be between 1 and {LIST_MAX_LIMIT}')
+    after = request.args.get('after')
+    etag = entity_tag(f'g{store.generation()}', mimetype)
+    if not_modified(etag):
+        return conditional(Response(status=304), etag)
+    generation, total, entries = store.list(after, limit + 1)
+    more = len(entries) > limit
+    entries = entries[:limit]
+    page = {'matrices': entries, 'total': total, 'next': entries[-1]['name'] if more else None}
+    body = Response(msgpack.packb(page), mimetype=mimetype) if mimetype in MSGPACK_MIMETYPES else jsonify(page)
+    return conditional(body, entity_tag(f'g{generation}', mimetype))
+
 @app.route('/matrices', methods=['GET'])
 def get_matrices():
-    return jsonify(load_matrices())
+    try:
+        mimetype = listing_mimetype()
+        if mimetype is None:
+            return jsonify({'error': 'Matrix listings are available as JSON or msgpack; '
+                                     'fetch single matrices from /matrices/<name> as .npy'}), 406
+        if mimetype in MSGPACK_MIMETYPES:
+            require_msgpack()
+        if 'at' in request.args:
+            # Past revisions are not cached: undo and new writes can rewrite them
+            return jsonify(store.get_all(at=int(request.args['at'])))
+        if 'limit' in request.args or 'after' in request.args:
+            return list_matrices(mimetype)
+        generation, entries = matrix_cache.versioned()
+        etag = entity_tag(f'g{generation}', mimetype)
+        if not_modified(etag):
+            return conditional(Response(status=304), etag)
+        if mimetype in MSGPACK_MIMETYPES:
+            encoded = {}
+            for name, (_, data) in entries.items():
+                array = to_array(data)
+                encoded[name] = encode_typed(array) if array is not None else data
+            return conditional(Response(msgpack.packb(encoded), mimetype=mimetype), etag)
+        return conditional(jsonify({name: data for name, (_, data) in entries.items()}), etag)
+    except Exception as e:
+        return failure(e)
+
+@app.route('/matrices/<name>', methods=['GET'])
+def get_matrix(name):
+    try:
+        if 'at' in request.args:
+            revision = int(request.args['at'])
+            data = store.get(name, at=revision)
+            if data is None:
+                return jsonify({'error': f'Matrix {name} did not exist at revision {revision}'}), 404
+            return send({'name': name, 'rows': len(data), 'cols': len(data[0]) if data else 0,
+                         'revision': revision, 'matrix': data}, key='matrix')
+        entry = matrix_cache.entry(name)
+        if entry is None:
+            return jsonify({'error': f'Matrix {name} not found'}), 404
+        version, data = entry
+        etag = entity_tag(f'v{version}')
+        if not_modified(etag):
+            return conditional(Response(status=304), etag)
+        payload = {'name': name, 'rows': len(data), 'cols': len(data[0]) if data else 0, 'version': version,
+                   'matrix': data}
+        return conditional(send(payload, key='matrix'), etag)
+    except Exception as e:
+        return failure(e)
 
 @app.route('/matrices', methods=['POST'])
 def save_matrix():
     try:
-        data = request.get_json()
+        data = read_payload()
         name = data['name']
-        matrix_data = data['matrix']
-        
-        matrices = load_matrices()
-        matrices[name] = matrix_data
-        save_matrices(matrices)
+        matrix_data = matrix_payload(data['matrix'])
         
+        store.put(name, matrix_data)
+
         return jsonify({'message': f'Matrix {name} saved successfully'})
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        return failure(e)
 
 @app.route('/matrices/<name>', methods=['DELETE'])
 def delete_matrix(name):
     try:
-        matrices = load_matrices()
-        if name in matrices:
-            del matrices[name]
-            save_matrices(matrices)
+        if store.delete(name):
             return jsonify({'message': f'Matrix {name} deleted successfully'})
         return jsonify({'error': f'Matrix {name} not found'}), 404
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        return failure(e)
 
 @app.route('/matrices/<name>', methods=['PUT'])
 def update_matrix(name):
     try:
-        data = request.get_json()
-        matrix_data = data['matrix']
+        data = read_payload()
+        matrix_data = matrix_payload(data['matrix'])
         
-        matrices = load_matrices()
-        if name in matrices:
-            matrices[name] = matrix_data
-            save_matrices(matrices)
+        if store.update(name, matrix_data) is not None:
             return jsonify({'message': f'Matrix {name} updated successfully'})
         return jsonify({'error': f'Matrix {name} not found'}), 404
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        return failure(e)
+
+@app.route('/history', methods=['GET'])
+def get_history():
+    try:
+        limit = int(request.args.get('limit', 50))
+        before = int(request.args['before']) if 'before' in request.args else None
+        head, revisions = store.history(limit, before)
+        return jsonify({'revision': head, 'revisions': revisions})
+    except Exception as e:
+        return failure(e)
+
+@app.route('/history/undo', methods=['POST'])
+def undo():
+    try:
+        undone = store.undo()
+        if undone is None:
+            return jsonify({'error': 'Nothing to undo'}), 409
+        return jsonify({'undone': undone, 'revision': undone['rev'] - 1})
+    except Exception as e:
+        return failure(e)
+
+@app.route('/history/redo', methods=['POST'])
+def redo():
+    try:
+        redone = store.redo()
+        if redone is None:
+            return jsonify({'error': 'Nothing to redo'}), 409
+        return jsonify({'redone': redone, 'revision': redone['rev']})
+    except Exception as e:
+        return failure(e)
+
+def result_cache_key(operation, matrix_a, matrix_b, scalar, options):
+    parts = [operation, matrix_a.fingerprint(), matrix_b.fingerprint() if matrix_b else None, scalar,
+             options['precision'], options['typed']]
+    return hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+
+def raw_cache_key(data):
+    # Keyed on the payload as sent, so exact repeats skip sympification entirely
+    parts = ['raw', data['operation'], data['matrixA'], data.get('matrixB'), data.get('scalar'),
+             data.get('precision'), data.get('format', 'float'), data.get('exact')]
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode()).hexdigest()
+
+def is_ref(spec):
+    return isinstance(spec, dict) and 'ref' in spec
+
+def is_inline(spec):
+    return not is_ref(spec) and not isinstance(spec, Matrix)
+
+def inline_shape(spec):
+    # Shape of raw inline rows, found without looking at a single element
+    rows = spec['array'] if isinstance(spec, dict) and 'array' in spec else spec
+    if not isinstance(rows, list) or not rows or not all(isinstance(row, list) for row in rows):
+        return None
+    return len(rows), max(len(row) for row in rows)
+
+def check_inline(operation, *specs):
+    # Apply the admission size limits to inline input before it is parsed
+    for spec in specs:
+        shape = inline_shape(spec) if spec is not None and is_inline(spec) else None
+        if shape:
+            kind = 'numpy' if isinstance(spec, dict) else 'exact'
+            rejected = admission.check_shape(operation, *shape, kind)
+            if rejected:
+                raise TooLarge(rejected['reason'])
+
+@in_phase('construct')
+def resolve_matrix(spec, operation=None):
+    # {"ref": name} points at a saved matrix, {"array": rows} is numeric data for the
+    # numpy backend; anything else is inline matrix data
+    if isinstance(spec, Matrix):
+        return spec
+    check_inline(operation, spec)
+    if isinstance(spec, dict) and 'array' in spec:
+        return Matrix.from_array(np.array(spec['array']))
+    if is_ref(spec):
+        matrix = matrix_cache.matrix(spec['ref'])
+        if matrix is None:
+            raise ValueError(f"Matrix {spec['ref']} not found")
+        return matrix
+    return Matrix(spec)
+
+def matrix_to_json(matrix):
+    # Exact storage form: integers and floats stay numbers, everything else is an expression string
+    if matrix.array is not None and matrix.array.dtype.kind != 'c':
+        return matrix.array.tolist()
+
+    def convert(elem):
+        if elem.is_Integer:
+            return int(elem)
+        if elem.is_Float:
+            return float(elem)
+        return str(elem)
+    return [[convert(elem) for elem in row] for row in matrix.data]
+
+def output_options(data):
+    # How results are rendered: significant digits and plain vs typed elements
+    fmt = data.get('format', 'float')
+    if fmt not in ('float', 'typed'):
+        raise ValueError("Format must be 'float' or 'typed'")
+    return {'precision': check_precision(data.get('precision')), 'typed': fmt == 'typed'}
+
+def wants_stream():
+    return request.args.get('stream') == '1' or 'application/x-ndjson' in request.headers.get('Accept', '')
+
+def stream_result(keys, options, result=None, result_data=None):
+    # NDJSON: a {"shape": ...} header, one line per matrix row, then {"done": true}.
+    # Rows of a fresh result are converted as they are sent and cached at the end,
+    # unless the result is too large to hold in memory while streaming.
+    def generate():
+        try:
+            if result is not None and not isinstance(result, Matrix):
+                value = serialize_result(result, **options)
+                for key in keys:
+                    result_cache.set(key, value)
+                yield json.dumps({'result': value}) + '\n'
+                return
+            if result is None and not (isinstance(result_data, list) and result_data and isinstance(result_data[0], list)):
+                yield json.dumps({'result': result_data}) + '\n'
+                return
+            if result is not None:
+                shape, rows = [result.rows, result.cols], serialize_rows(result, **options)
+            else:
+                shape, rows = [len(result_data), len(result_data[0])], result_data
+            yield json.dumps({'shape': shape}) + '\n'
+            cache = result is not None and shape[0] * shape[1] <= STREAM_CACHE_MAX_ELEMENTS
+            converted = []
+            for row in rows:
+                if cache:
+                    converted.append(row)
+                yield json.dumps(row) + '\n'
+            if cache:
+                for key in keys:
+                    result_cache.set(key, converted)
+            yield json.dumps({'done': True}) + '\n'
+        except Exception as e:
+            yield json.dumps({'error': str(e)}) + '\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def compute_result(key, operation, matrix_a, matrix_b, scalar, options):
+    result = run_operation(operation, matrix_a, matrix_b, scalar)
+    with phase('serialize'):
+        value = serialize_result(result, **options)
+    result_cache.set(key, value)
+    return value
+
+def compute_cached(key, operation, matrix_a, matrix_b, scalar, options):
+    # Compute once per key, sharing the result with concurrent identical requests
+    return inflight.do(key, lambda: compute_result(key, operation, matrix_a, matrix_b, scalar, options))[0]
+
+def run_job(payload):
+    operation = payload['operation']
+    matrix_a = resolve_matrix(payload['matrixA'], operation)
+    matrix_b = resolve_matrix(payload['matrixB'], operation) if payload.get('matrixB') else None
+    scalar = payload.get('scalar')
+    options = output_options(payload)
+    progress = current_progress()
+    if progress is not None:
+        # ETA for phases that cannot count their steps
+        progress.expected = estimate(operation, matrix_a, matrix_b, scalar, scale=COST_SCALE)['seconds']
+    key = result_cache_key(operation, matrix_a, matrix_b, scalar, options)
+    found, result_data = result_cache.get(key)
+    # Jobs stay out of the in-flight map: cancelling one must not fail a request sharing its computation
+    return result_data if found else compute_result(key, operation, matrix_a, matrix_b, scalar, options)
+
+def submit_job(data):
+    payload = {k: v for k, v in data.items() if k not in ('async', 'priority')}
+    for field in ('matrixA', 'matrixB'):
+        if isinstance(payload.get(field), Matrix):
+            payload[field] = {'array': payload[field].array.tolist()}
+    try:
+        job_id = jobs.submit(payload, priority=int(data.get('priority', 0)))
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    response = jsonify({'job': job_id, 'status': 'queued'})
+    response.status_code = 202
+    response.headers['Location'] = f'/jobs/{job_id}'
+    return response
 
 @app.route('/calculate', methods=['POST'])
+@profiled
 def calculate():
     try:
-        data = request.get_json()
+        with phase('parse'):
+            data = read_payload()
+        store_as = data.get('store_as')
+        if store_as:
+            # Storing needs the exact result, not the cached JSON form
+            operation = data['operation']
+            matrix_a = resolve_matrix(data['matrixA'], operation)
+            matrix_b = resolve_matrix(data['matrixB'], operation) if data.get('matrixB') else None
+            g.admission, matrix_a, matrix_b = admit_inline(
+                operation, matrix_a, matrix_b, data.get('scalar'), exact=data.get('exact'))
+            result = run_operation(operation, matrix_a, matrix_b, data.get('scalar'))
+            if not isinstance(result, Matrix):
+                return jsonify({'error': 'Only matrix results can be stored'}), 400
+            store.put(store_as, matrix_to_json(result))
+            with phase('serialize'):
+                result_data = serialize_result(result, **output_options(data))
+            return send({'result': result_data, 'stored': store_as})
+
+        stream = wants_stream()
+        options = output_options(data)
         operation = data['operation']
-        matrix_a = Matrix(data['matrixA'])
-        matrix_b = Matrix(data['matrixB']) if data.get('matrixB') else None
+        check_inline(operation, data['matrixA'], data.get('matrixB'))
+        raw_key = None
+        if is_inline(data['matrixA']) and is_inline(data.get('matrixB')):
+            raw_key = raw_cache_key(data)
+            found, result_data = lookup_result(raw_key)
+            if found:
+                return stream_result([], options, result_data=result_data) if stream else send({'result': result_data})
+
+        matrix_a = resolve_matrix(data['matrixA'], operation)
+        matrix_b = resolve_matrix(data['matrixB'], operation) if data.get('matrixB') else None
         scalar = data.get('scalar')
 
-        if operation == 'add':
-            result = matrix_a.add(matrix_b)
-        elif operation == 'subtract':
-            result = matrix_a.subtract(matrix_b)
-        elif operation == 'multiply':
-            result = matrix_a.multiply(matrix_b)
-        elif operation == 'scalar_multiply':
-            result = matrix_a.multiply(scalar)
-        elif operation == 'transpose':
-            result = matrix_a.transpose()
-        elif operation == 'determinant':
-            result = matrix_a.determinant()
-        elif operation == 'inverse':
-            result = matrix_a.inverse()
-        elif operation == 'eigenvalues':
-            result = matrix_a.eigenvalues(numeric=True)
-        elif operation == 'characteristic':
-            result = matrix_a.characteristic_equation()
-        elif operation == 'power':
-            if scalar is None:
-                return jsonify({'error': 'Please provide a power value'}), 400
-            result = matrix_a.power(scalar)
-        elif operation == 'trace':
-            result = matrix_a.trace()
-        else:
-            return jsonify({'error': 'Invalid operation'}), 400
-
-        # Convert result to a format suitable for JSON
-        if isinstance(result, Matrix):
-            result_data = [[float(sp.N(elem)) for elem in row] for row in result.data]
-        elif isinstance(result, list):
-            result_data = [float(sp.N(elem)) for elem in result]
-        else:
-            result_data = float(sp.N(result))
-
-        return jsonify({'result': result_data})
+        key = result_cache_key(operation, matrix_a, matrix_b, scalar, options)
+        found, result_data = lookup_result(key)
+        if not found:
+            prefer_queue = None if data.get('async') is None else bool(data['async'])
+            g.admission = decision = admit(operation, matrix_a, matrix_b, scalar, can_queue=True,
+                                           prefer_queue=prefer_queue, exact=data.get('exact'))
+            if decision['action'] == 'reject':
+                return rejection(decision)
+            if decision['action'] == 'queue':
+                return submit_job(data)
+            if decision['action'] == 'downgrade':
+                matrix_a = matrix_a.to_numeric()
+                matrix_b = matrix_b.to_numeric() if matrix_b is not None else None
+                key = result_cache_key(operation, matrix_a, matrix_b, scalar, options)
+                found, result_data = lookup_result(key)
+        if stream:
+            keys = [k for k in (key, raw_key) if k]
+            if found:
+                return stream_result(keys, options, result_data=result_data)
+            result = raw_inflight.do(key, lambda: run_operation(operation, matrix_a, matrix_b, scalar))[0]
+            return stream_result(keys, options, result=result)
+        if not found:
+            result_data = compute_cached(key, operation, matrix_a, matrix_b, scalar, options)
+        if raw_key:
+            result_cache.set(raw_key, result_data)
+
+        return send({'result': result_data})
+
+    except Exception as e:
+        return failure(e)
+
+def batch_levels(steps):
+    # Group steps so that each one only depends on steps in earlier groups
+    levels, depth = [], {}
+    for step in steps:
+        deps = [spec['step'] for spec in (step.get('matrixA'), step.get('matrixB'), step.get('scalar'))
+                if isinstance(spec, dict) and 'step' in spec]
+        for dep in deps:
+            if dep not in depth:
+                raise ValueError(f"Step {step['id']} refers to unknown or later step {dep}")
+        level = max((depth[dep] + 1 for dep in deps), default=0)
+        depth[step['id']] = level
+        if level == len(levels):
+            levels.append([])
+        levels[level].append(step)
+    return levels
+
+@app.route('/calculate/estimate', methods=['POST'])
+def estimate_cost():
+    try:
+        data = read_payload()
+        operation = data['operation']
+        matrix_a = resolve_matrix(data['matrixA'], operation)
+        matrix_b = resolve_matrix(data['matrixB'], operation) if data.get('matrixB') else None
+        cost = estimate(operation, matrix_a, matrix_b, data.get('scalar'), scale=COST_SCALE)
+        prefer_queue = None if data.get('async') is None else bool(data['async'])
+        decision = admission.decide(cost, True, prefer_queue, data.get('exact'))
+        return jsonify({'estimate': cost, 'decision': decision, 'limits': admission.limits_for(operation)})
+    except Exception as e:
+        return failure(e)
+
+@app.route('/evaluate', methods=['POST'])
+@profiled
+def evaluate_expression():
+    try:
+        with phase('parse'):
+            data = request.get_json()
+            tree = parse(data['expression'])
+        options = output_options(data)
+        # Names resolve to the inline "matrices" first, then to saved matrices
+        inline = data.get('matrices') or {}
+        env = {name: resolve_matrix(inline[name] if name in inline else {'ref': name}) for name in references(tree)}
+
+        # Floating-point input runs on numpy; exact or symbolic input stays on sympy, where
+        # integer powers are cheaper as repeated squaring than through diagonalization
+        numeric = not data.get('exact') and all(m.is_floating() for m in env.values())
+        if numeric:
+            env = {name: m.to_numeric() for name, m in env.items()}
+        backend = 'numpy' if numeric else 'sympy'
+        planned = plan(tree, {name: (m.rows, m.cols) for name, m in env.items()}, expand_powers=not numeric)
+        plan_text = unparse(planned)
+
+        parts = ['evaluate', plan_text, sorted((name, m.fingerprint()) for name, m in env.items()), backend,
+                 options['precision'], options['typed']]
+        key = hashlib.sha256(json.dumps(parts).encode()).hexdigest()
+        found, value = lookup_result(key)
+        if not found:
+            def step(operation, matrix_a, matrix_b, scalar):
+                _, matrix_a, matrix_b = admit_inline(operation, matrix_a, matrix_b, scalar, exact=True)
+                return run_operation(operation, matrix_a, matrix_b, scalar)
+
+            def compute():
+                result, stats = evaluate(planned, env, step)
+                with phase('serialize'):
+                    value = {'result': serialize_result(result, **options), **stats}
+                result_cache.set(key, value)
+                return value
+            value = inflight.do(key, compute)[0]
+        return send({**value, 'plan': plan_text, 'backend': backend})
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        return failure(e)
+
+@app.route('/calculate/batch', methods=['POST'])
+def calculate_batch():
+    try:
+        data = request.get_json()
+        steps = data['steps']
+        if len(steps) > BATCH_MAX_STEPS:
+            return jsonify({'error': f'A batch may contain at most {BATCH_MAX_STEPS} steps'}), 400
+        ids = [step['id'] for step in steps]
+        if len(set(ids)) != len(ids):
+            return jsonify({'error': 'Step ids must be unique'}), 400
+        outputs = data.get('outputs') or ids[-1:]
+        unknown = [name for name in outputs if name not in ids]
+        if unknown:
+            return jsonify({'error': f'Unknown output steps: {", ".join(unknown)}'}), 400
+        levels = batch_levels(steps)
+    except Exception as e:
+        return failure(e)
+
+    # Intermediate results stay as Matrix/sympy objects until the end
+    results = {}
+
+    def operand(spec, operation):
+        if isinstance(spec, dict) and 'step' in spec:
+            value = results[spec['step']]
+            if not isinstance(value, Matrix):
+                raise ValueError(f"Step {spec['step']} did not produce a matrix")
+            return value
+        return resolve_matrix(spec, operation)
+
+    def run(step):
+        scalar = step.get('scalar')
+        if isinstance(scalar, dict) and 'step' in scalar:
+            scalar = results[scalar['step']]
+            if isinstance(scalar, (Matrix, list)):
+                raise ValueError(f"Step {step.get('scalar')['step']} did not produce a scalar")
+        matrix_a = operand(step['matrixA'], step['operation'])
+        matrix_b = operand(step['matrixB'], step['operation']) if step.get('matrixB') else None
+        _, matrix_a, matrix_b = admit_inline(step['operation'], matrix_a, matrix_b, scalar,
+                                             exact=step.get('exact'))
+        return run_operation(step['operation'], matrix_a, matrix_b, scalar)
+
+    with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as pool:
+        for level in levels:
+            futures = [(step['id'], pool.submit(run, step)) for step in level]
+            for step_id, future in futures:
+                try:
+                    results[step_id] = future.result()
+                except Exception as e:
+                    return failure(e, step=step_id)
+
+    try:
+        options = output_options(data)
+        return jsonify({'results': {name: serialize_result(results[name], **options) for name in outputs}})
+    except Exception as e:
+        return failure(e)
+
+@app.route('/jobs', methods=['POST'])
+def create_job():
+    try:
+        data = request.get_json()
+        matrix_a = resolve_matrix(data['matrixA'], data['operation'])
+        matrix_b = resolve_matrix(data['matrixB'], data['operation']) if data.get('matrixB') else None
+        g.admission = decision = admit(data['operation'], matrix_a, matrix_b, data.get('scalar'),
+                                       can_queue=True, prefer_queue=True, exact=True)
+        if decision['action'] == 'reject':
+            return rejection(decision)
+        return submit_job(data)
+    except Exception as e:
+        return failure(e)
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    return jsonify(job)
+
+@app.route('/jobs/<job_id>/events', methods=['GET'])
+def job_events(job_id):
+    # Stream "progress" events while the job waits and runs, then one final
+    # "done", "failed" or "cancelled" event carrying the job record
+    if jobs.get(job_id) is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+
+    def event(name, data):
+        return f'event: {name}\ndata: {json.dumps(data)}\n\n'
+
+    def generate():
+        yield 'retry: 2000\n\n'
+        last, quiet_since = None, time.monotonic()
+        while True:
+            job = jobs.get(job_id)
+            if job is None:
+                yield event('failed', {'id': job_id, 'error': f'Job {job_id} not found'})
+                return
+            if job['status'] in FINISHED_STATES:
+                yield event(job['status'], job)
+                return
+            state = {'status': job['status'], **(job.get('progress') or {})}
+            if state != last:
+                last, quiet_since = state, time.monotonic()
+                yield event('progress', state)
+            elif time.monotonic() - quiet_since >= EVENTS_KEEPALIVE:
+                quiet_since = time.monotonic()
+                yield ': keep-alive\n\n'
+            time.sleep(EVENTS_POLL)
+    return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def cancel_job(job_id):
+    cancelled = jobs.cancel(job_id)
+    if cancelled is None:
+        return jsonify({'error': f'Job {job_id} not found'}), 404
+    if not cancelled:
+        return jsonify({'error': f'Job {job_id} has already finished'}), 409
+    return jsonify({'message': f'Job {job_id} cancelled'})
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/profiles/<profile_id>', methods=['GET'])
+def get_profile(profile_id):
+    if not profile_allowed():
+        return jsonify({'error': 'Profiling is not enabled for this client'}), 403
+    report = profiles.get(profile_id)
+    if report is None:
+        return jsonify({'error': f'Profile {profile_id} not found'}), 404
+    return jsonify(report)
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    return jsonify(result_cache.stats())
+
+def property_message(name, value):
+    label = name.replace('_', ' ')
+    if name == 'rank':
+        return f"Matrix has rank {value}"
+    if name == 'density':
+        return f"Matrix density is {value:.2f}"
+    if name == 'bandwidth':
+        return f"Matrix has lower bandwidth {value['lower']} and upper bandwidth {value['upper']}"
+    if value is None:
+        return f"Cannot determine whether the matrix is {label}"
+    return f"Matrix is {label}" if value else f"Matrix is not {label}"
 
 @app.route('/check_property', methods=['POST'])
+@profiled
 def check_property():
     try:
-        data = request.get_json()
+        with phase('parse'):
+            data = request.get_json()
+        matrix_a = resolve_matrix(data['matrixA'])
+
+        # Several properties at once share one analysis of the matrix
+        if 'properties' in data:
+            requested = data['properties']
+            names = None if requested == 'all' else requested
+            results = measure('analyze', matrix_a, lambda: matrix_a.analyze(names))
+            with phase('serialize'):
+                return jsonify({'results': results})
+
         property_name = data['property']
-        matrix_a = Matrix(data['matrixA'])
-
-        if property_name == 'symmetric':
-            result = matrix_a.is_symmetric()
-            message = "Matrix is symmetric" if result else "Matrix is not symmetric"
-        elif property_name == 'orthogonal':
-            result = matrix_a.is_orthogonal()
-            message = "Matrix is orthogonal" if result else "Matrix is not orthogonal"
-        elif property_name == 'invertible':
-            try:
-                matrix_a.inverse()
-                message = "Matrix is invertible"
-            except ValueError:
-                message = "Matrix is not invertible"
-        elif property_name == 'diagonalizable':
-            try:
-                matrix_a.power(1)  # Try to diagonalize
-                message = "Matrix is diagonalizable"
-            except ValueError:
-                message = "Matrix is not diagonalizable"
-        else:
+        if property_name not in PROPERTIES:
             return jsonify({'error': 'Invalid property'}), 400
-
-        return jsonify({'result': message})
+        value = measure('analyze', matrix_a, lambda: matrix_a.analyze([property_name]))[property_name]
+        return jsonify({'result': property_message(property_name, value)})
 
     except Exception as e:
-        return jsonify({'error': str(e)}), 400
+        return failure(e)
+
+def warm_up():
+    # Import sympy's lazily loaded submodules and numpy's linear algebra and fill their
+    # internal caches, so that worker processes forked afterwards start hot
+    symbolic = Matrix([['x', 1], [2, 3]])
+    numeric = Matrix.from_array(np.array([[2.0, 1.0], [1.0, 3.0]]))
+    for matrix in (symbolic, numeric):
+        for operation in ('add', 'multiply', 'transpose', 'determinant', 'inverse', 'eigenvalues',
+                          'characteristic', 'trace'):
+            result = apply_operation(operation, matrix, matrix)
+            serialize_result(result)
+            serialize_result(result, precision=6, typed=True)
+        matrix.analyze()
+        matrix.fingerprint()
+
+def create_app(warm=False):
+    # Entry point for WSGI servers and server.py. Storage, caches and job workers
+    # reconnect per process, so the same app object can be shared across forks.
+    store.migrate_from_json(MATRICES_FILE)
+    if warm:
+        warm_up()
+    return app
 
 if __name__ == '__main__':
-    app.run(debug=True) 
\ No newline at end of file
+    create_app().run(debug=True) 
\ No newline at end of file
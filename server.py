@@ -0,0 +1,235 @@
+import argparse
+import errno
+import os
+import random
+import signal
+import socket
+import sys
+import threading
+import time
+from typing import Callable, Dict, Optional, Set
+
+from werkzeug.serving import make_server
+
+
+# -----------------------------
+# Worker Supervisor Class
+# -----------------------------
+class Arbiter:
+    """
+    A pre-forking server: one parent process supervising N worker processes.
+
+    The parent imports and warms the application once, binds the listening
+    socket and forks the workers, which inherit the warm interpreter state and
+    accept connections from the shared socket. Each worker is a threaded
+    werkzeug server, so throughput scales with the number of cores.
+
+    Signals sent to the parent:
+        SIGHUP: Start a fresh set of workers, then retire the old ones once
+            they have finished their in-flight requests.
+        SIGTERM, SIGINT: Stop accepting connections, let workers finish their
+            requests for up to graceful_timeout seconds, then exit.
+
+    Attributes:
+        app: The WSGI application.
+        host (str): Interface to bind.
+        port (int): Port to bind.
+        workers (int): Number of worker processes.
+        max_requests (int): Requests after which a worker is replaced, or 0 to never recycle.
+        max_requests_jitter (int): Random extra requests per worker, so workers do not recycle together.
+        graceful_timeout (float): Seconds a stopping worker may take before being killed.
+        post_fork (Callable[[], None]): Called in each worker before it starts serving.
+        worker_exit (Callable[[float], None]): Called in each worker after its last request,
+            with the seconds left of graceful_timeout, to finish or hand off background work.
+    """
+
+    def __init__(self, app, host: str = '127.0.0.1', port: int = 8000, workers: int = 2,
+                 max_requests: int = 0, max_requests_jitter: int = 0, graceful_timeout: float = 30.0,
+                 post_fork: Optional[Callable[[], None]] = None,
+                 worker_exit: Optional[Callable[[float], None]] = None) -> None:
+        self.app = app
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_requests = max_requests
+        self.max_requests_jitter = max_requests_jitter
+        self.graceful_timeout = graceful_timeout
+        self.post_fork = post_fork
+        self.worker_exit = worker_exit
+        self.socket: Optional[socket.socket] = None
+        self._children: Dict[int, float] = {}  # pid -> time it was asked to stop, or 0
+        self._retiring: Set[int] = set()
+        self._reload = False
+        self._stopping = False
+
+    def _bind(self) -> socket.socket:
+        family = socket.AF_INET6 if ':' in self.host else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        sock.bind((self.host, self.port))
+        sock.listen(socket.SOMAXCONN)
+        sock.set_inheritable(True)
+        return sock
+
+    def run(self) -> None:
+        """
+        Bind, fork the workers and supervise them until told to stop.
+        """
+        self.socket = self._bind()
+        signal.signal(signal.SIGHUP, self._on_reload)
+        signal.signal(signal.SIGTERM, self._on_stop)
+        signal.signal(signal.SIGINT, self._on_stop)
+        print(f'Serving on http://{self.host}:{self.port} with {self.workers} workers (pid {os.getpid()})',
+              file=sys.stderr)
+
+        for _ in range(self.workers):
+            self._spawn()
+        while not self._stopping:
+            if self._reload:
+                self._reload = False
+                self._replace_workers()
+            self._reap()
+            live = len(self._children) - len(self._retiring)
+            for _ in range(self.workers - live):
+                self._spawn()
+            time.sleep(0.2)
+        self._shutdown()
+
+    def _on_reload(self, signum, frame) -> None:
+        self._reload = True
+
+    def _on_stop(self, signum, frame) -> None:
+        self._stopping = True
+
+    def _spawn(self) -> None:
+        pid = os.fork()
+        if pid == 0:
+            code = 0
+            try:
+                self._serve()
+            except Exception as e:
+                print(f'Worker {os.getpid()} failed: {e}', file=sys.stderr)
+                code = 1
+            finally:
+                os._exit(code)
+        self._children[pid] = 0
+
+    def _replace_workers(self) -> None:
+        # New workers start accepting before the old ones stop, so no request is refused
+        old = [pid for pid in self._children if pid not in self._retiring]
+        for _ in range(self.workers):
+            self._spawn()
+        for pid in old:
+            self._retire(pid)
+
+    def _retire(self, pid: int) -> None:
+        self._retiring.add(pid)
+        self._children[pid] = time.monotonic()
+        self._signal(pid, signal.SIGTERM)
+
+    def _signal(self, pid: int, signum: int) -> None:
+        try:
+            os.kill(pid, signum)
+        except ProcessLookupError:
+            pass
+
+    def _reap(self) -> None:
+        while self._children:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                self._children.clear()
+                self._retiring.clear()
+                return
+            if pid == 0:
+                break
+            self._children.pop(pid, None)
+            self._retiring.discard(pid)
+        now = time.monotonic()
+        for pid, since in list(self._children.items()):
+            if since and now - since > self.graceful_timeout:
+                self._signal(pid, signal.SIGKILL)
+
+    def _shutdown(self) -> None:
+        for pid in list(self._children):
+            if pid not in self._retiring:
+                self._retire(pid)
+        while self._children:
+            self._reap()
+            time.sleep(0.1)
+        self.socket.close()
+
+    def _serve(self) -> None:
+        """
+        Worker main loop: serve from the inherited socket until recycled or stopped.
+        """
+        signal.signal(signal.SIGHUP, signal.SIG_IGN)
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        random.seed()
+        limit = self.max_requests + random.randint(0, self.max_requests_jitter) if self.max_requests else 0
+        served = 0
+        lock = threading.Lock()
+        server = None
+        stopped = None
+
+        def stop():
+            nonlocal stopped
+            stopped = stopped or time.monotonic()
+            # shutdown() waits for serve_forever() to return, so it must not run on the serving thread
+            threading.Thread(target=server.shutdown, daemon=True).start()
+
+        def counted(environ, start_response):
+            nonlocal served
+            with lock:
+                served += 1
+                recycle = limit and served == limit
+            if recycle:
+                stop()
+            return self.app(environ, start_response)
+
+        if self.post_fork:
+            self.post_fork()
+        server = make_server(self.host, self.port, counted, threaded=True, fd=self.socket.fileno())
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop())
+        try:
+            server.serve_forever()
+        except OSError as e:
+            if e.errno != errno.EBADF:
+                raise
+        finally:
+            server.server_close()  # waits for the request threads to finish
+            if self.worker_exit:
+                # The parent kills a worker graceful_timeout seconds after asking it to stop
+                elapsed = time.monotonic() - stopped if stopped else 0.0
+                self.worker_exit(max(self.graceful_timeout - elapsed, 0.0))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Run the Matrix Calculator with pre-forked worker processes.')
+    parser.add_argument('--host', default=os.environ.get('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('PORT', 8000)))
+    parser.add_argument('--workers', type=int, default=int(os.environ.get('WORKERS', os.cpu_count() or 1)),
+                        help='number of worker processes (default: one per core)')
+    parser.add_argument('--max-requests', type=int, default=int(os.environ.get('MAX_REQUESTS', 0)),
+                        help='replace a worker after this many requests (0: never)')
+    parser.add_argument('--max-requests-jitter', type=int, default=int(os.environ.get('MAX_REQUESTS_JITTER', 0)),
+                        help='random extra requests per worker before it is replaced')
+    parser.add_argument('--graceful-timeout', type=float, default=float(os.environ.get('GRACEFUL_TIMEOUT', 30)),
+                        help='seconds a stopping worker may take to finish its requests')
+    parser.add_argument('--no-warm', action='store_true', help='skip warming the hot paths before forking')
+    args = parser.parse_args()
+
+    if not hasattr(os, 'fork'):
+        sys.exit('server.py needs a platform with fork(); use "python app.py" instead')
+
+    # Imported here, in the parent, so every worker inherits the loaded modules
+    from app import create_app, jobs
+    application = create_app(warm=not args.no_warm)
+
+    # Each worker runs background jobs, and lets them finish or fails them before exiting
+    Arbiter(application, args.host, args.port, args.workers, args.max_requests,
+            args.max_requests_jitter, args.graceful_timeout, post_fork=jobs.start, worker_exit=jobs.close).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,31 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# Keep the databases app.py uses out of the working tree and instance folder
+_DATA_DIR = tempfile.mkdtemp(prefix='matrix-tests-')
+os.environ.setdefault('MATRICES_DB', os.path.join(_DATA_DIR, 'matrices.db'))
+os.environ.setdefault('RESULT_CACHE_DB', os.path.join(_DATA_DIR, 'results.db'))
+os.environ.setdefault('JOBS_DB', os.path.join(_DATA_DIR, 'jobs.db'))
+os.environ.setdefault('PROFILES_DB', os.path.join(_DATA_DIR, 'profiles.db'))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def client():
+    from app import app
+    return app.test_client()
+
+
+@pytest.fixture
+def isolated(monkeypatch, tmp_path):
+    # A fresh store for the app, so listings and history only hold what the test wrote
+    import app as server
+    from Matrixstore import MatrixCache, MatrixStore
+    fresh = MatrixStore(str(tmp_path / 'matrices.db'))
+    monkeypatch.setattr(server, 'store', fresh)
+    monkeypatch.setattr(server, 'matrix_cache', MatrixCache(fresh))
+    return fresh
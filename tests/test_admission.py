@@ -0,0 +1,117 @@
+import json
+
+import numpy as np
+import pytest
+
+import app as server
+import Matrixcost
+from Matrixcodes import Matrix
+from Matrixcost import MAX_SECONDS, AdmissionPolicy, _seconds, estimate
+
+
+def described(n, kind, symbolic=0):
+    return {'rows': n, 'cols': n, 'density': 1.0, 'symbolic': symbolic, 'kind': kind, 'bits': 8}
+
+
+def test_estimates_grow_with_size_and_backend():
+    small, large = Matrix([[1, 2], [3, 4]]), Matrix([[i + j for j in range(8)] for i in range(8)])
+    assert estimate('inverse', small)['seconds'] < estimate('inverse', large)['seconds']
+    exact = estimate('inverse', large)
+    assert exact['backend'] == 'exact'
+    assert exact['numeric_seconds'] < exact['seconds']
+    assert estimate('inverse', Matrix.from_array(np.eye(8)))['backend'] == 'numpy'
+    assert estimate('inverse', Matrix([['x', 1], [1, 'y']]))['numeric_seconds'] is None
+
+
+@pytest.mark.parametrize('operation, kind, symbolic', [
+    ('power', 'exact', 0), ('inverse', 'symbolic', 720 * 720), ('eigenvalues', 'float', 0),
+])
+def test_large_operands_saturate_instead_of_overflowing(operation, kind, symbolic):
+    assert _seconds(operation, kind, described(1400, kind, symbolic), None, 3) == float('inf')
+
+
+def test_saturated_estimate_is_finite_and_rejected(monkeypatch):
+    monkeypatch.setitem(Matrixcost.GROWTH['exact'], 'power', 1e100)
+    cost = estimate('power', Matrix([[1, 2, 3, 4]] * 4), scalar=3, scale=10)
+    assert cost['seconds'] == MAX_SECONDS
+    decision = AdmissionPolicy().decide(cost)
+    assert decision['action'] == 'reject' and decision['exceeded'] == 'queue'
+
+
+def test_policy_decisions():
+    policy = AdmissionPolicy({'default': {'inline': 1.0, 'queue': 10.0}, 'inverse': {'max_dim': 3}})
+    cost = estimate('multiply', Matrix([[1]]), Matrix([[1]]))
+    assert policy.decide(cost)['action'] == 'inline'
+    assert policy.decide(cost, prefer_queue=True)['action'] == 'queue'
+    assert policy.decide(estimate('inverse', Matrix([[1] * 4] * 4)))['exceeded'] == 'max_dim'
+    expensive = {**cost, 'seconds': 5.0, 'numeric_seconds': 0.1, 'backend': 'exact'}
+    assert policy.decide(expensive)['action'] == 'queue'
+    assert policy.decide(expensive, exact=False)['action'] == 'downgrade'
+    assert policy.decide(expensive, can_queue=False)['exceeded'] == 'inline'
+
+
+@pytest.fixture
+def strict(monkeypatch):
+    monkeypatch.setattr(server, 'admission', AdmissionPolicy({'default': {'inline': 1e-3, 'queue': 1.0, 'max_dim': 6}}))
+
+
+def test_overflowing_cost_is_rejected_not_an_error(client, monkeypatch):
+    monkeypatch.setitem(Matrixcost.GROWTH['exact'], 'power', 1e100)
+    payload = {'operation': 'power', 'matrixA': [[1, 2, 3, 4]] * 4, 'scalar': 3}
+    response = client.post('/calculate', data=json.dumps(payload), content_type='application/json')
+    assert response.status_code == 422
+    assert response.get_json()['estimate'] == MAX_SECONDS
+    assert client.post('/jobs', json=payload).status_code == 422
+    assert client.post('/calculate/estimate', json=payload).get_json()['decision']['action'] == 'reject'
+
+
+def test_too_large_is_413(client, strict):
+    response = client.post('/calculate', json={'operation': 'transpose', 'matrixA': [[1] * 7]})
+    assert response.status_code == 413
+
+
+def test_expensive_request_is_queued_or_downgraded(client, strict):
+    matrix = [[(i * 5 + j) % 7 + (i == j) * 9 for j in range(6)] for i in range(6)]
+    response = client.post('/calculate', json={'operation': 'inverse', 'matrixA': matrix})
+    assert response.status_code == 202
+    response = client.post('/calculate', json={'operation': 'inverse', 'matrixA': matrix, 'exact': False})
+    assert response.status_code == 200
+    assert response.headers['X-Admission'] == 'downgrade'
+
+
+def test_shape_limits():
+    policy = AdmissionPolicy({'default': {'max_dim': 10, 'max_elements': 20}})
+    assert policy.check_shape('inverse', 4, 5) is None
+    assert policy.check_shape('inverse', 11, 1)['exceeded'] == 'max_dim'
+    assert policy.check_shape('inverse', 5, 5)['exceeded'] == 'max_elements'
+    assert policy.check_shape('inverse', 5, 5, kind='numpy') is None
+    assert policy.decide(estimate('transpose', Matrix([[1] * 5] * 5)))['exceeded'] == 'max_elements'
+
+
+def test_oversized_input_is_refused_before_parsing(client, monkeypatch):
+    monkeypatch.setattr(server, 'admission', AdmissionPolicy({'default': {'max_elements': 100}}))
+
+    def parsed(*args, **kwargs):
+        raise AssertionError('oversized input was parsed')
+
+    monkeypatch.setattr(Matrix, '__init__', parsed)
+    matrix = [[1] * 20] * 20
+    for endpoint, payload in [
+        ('/calculate', {'operation': 'transpose', 'matrixA': matrix}),
+        ('/calculate', {'operation': 'add', 'matrixA': [[1]], 'matrixB': matrix}),
+        ('/calculate/estimate', {'operation': 'transpose', 'matrixA': matrix}),
+        ('/jobs', {'operation': 'transpose', 'matrixA': matrix}),
+        ('/evaluate', {'expression': 'A', 'matrices': {'A': matrix}}),
+        ('/check_property', {'property': 'square', 'matrixA': matrix}),
+    ]:
+        response = client.post(endpoint, json=payload)
+        assert response.status_code == 413, endpoint
+        assert 'more than 100' in response.get_json()['error']
+
+
+def test_body_over_content_length_is_413(client, monkeypatch):
+    monkeypatch.setitem(server.app.config, 'MAX_CONTENT_LENGTH', 1000)
+    response = client.post('/calculate', json={'operation': 'transpose', 'matrixA': [[1] * 600]})
+    assert response.status_code == 413
+    assert 'exceeds the limit of 1000 bytes' in response.get_json()['error']
+    assert client.post('/calculate', json={'operation': 'transpose', 'matrixA': [[1, 2]]}).status_code == 200
@@ -0,0 +1,66 @@
+import numpy as np
+import pytest
+import sympy as sp
+
+from Matrixcodes import NUMERIC_TOLERANCE, PROPERTIES, Matrix
+
+MATRICES = [
+    [[2, 1], [1, 2]],
+    [[1, 2, 3], [0, 4, 5], [0, 0, 6]],
+    [[0, 1], [-1, 0]],
+    [[1, 1], [0, 1]],
+    [[1, 2], [2, 4]],
+    [[1, 2, 3], [4, 5, 6]],
+]
+
+
+@pytest.mark.parametrize('rows', MATRICES)
+def test_numpy_and_sympy_backends_agree(rows):
+    numeric, exact = Matrix.from_array(np.array(rows, dtype=float)).analyze(), Matrix(rows).analyze()
+    assert numeric.pop('tolerance') == NUMERIC_TOLERANCE and exact.pop('tolerance') is None
+    assert numeric == exact
+
+
+def test_symmetry_uses_one_tolerance():
+    # Rounding leaves the array a hair off symmetric; every check accepts it alike
+    matrix = Matrix.from_array(np.array([[1.0, 0.1 + 0.2], [0.3, 1.0]]))
+    assert matrix.is_symmetric()
+    assert matrix.analyze(['symmetric']) == {'symmetric': True, 'tolerance': NUMERIC_TOLERANCE}
+    assert not Matrix.from_array(np.array([[1.0, 0.31], [0.3, 1.0]])).is_symmetric()
+    assert Matrix([[1, 2], [2, 1]]).analyze(['symmetric', 'rank']) == {'symmetric': True, 'rank': 2, 'tolerance': None}
+    assert 'tolerance' not in Matrix([[1]]).analyze(['rank'])
+
+
+def test_values():
+    result = Matrix([[1, 2, 0], [0, 3, 4], [0, 0, 5]]).analyze()
+    assert result['upper_triangular'] and not result['lower_triangular']
+    assert result['bandwidth'] == {'lower': 0, 'upper': 1}
+    assert result['density'] == pytest.approx(5 / 9)
+    assert result['rank'] == 3
+    assert not Matrix([[1, 1], [0, 1]]).analyze(['diagonalizable'])['diagonalizable']
+    assert Matrix([[0, 1], [-1, 0]]).analyze(['orthogonal'])['orthogonal']
+
+
+def test_only_requested_properties_are_computed(monkeypatch):
+    matrix = Matrix([[1, 2], [3, 4]])
+    for name in ('rank', 'is_diagonalizable', 'eigenvects'):
+        monkeypatch.setattr(sp.Matrix, name, lambda *args, name=name, **kwargs: pytest.fail(f'{name} computed'))
+    assert matrix.analyze(['symmetric', 'density']) == {'symmetric': False, 'density': 1.0, 'tolerance': None}
+
+
+def test_undecidable_symbolic_property():
+    assert Matrix([['x', 0], [0, 1]]).analyze(['positive_definite']) == {'positive_definite': None, 'tolerance': None}
+
+
+def test_unknown_property():
+    with pytest.raises(ValueError, match='Unknown properties: shiny'):
+        Matrix([[1]]).analyze(['shiny'])
+
+
+def test_check_property_endpoint(client):
+    response = client.post('/check_property', json={'matrixA': [[1, 0], [0, 1]], 'properties': 'all'})
+    assert set(response.get_json()['results']) == {*PROPERTIES, 'tolerance'}
+    response = client.post('/check_property', json={'matrixA': [[1, 0], [0, 1]], 'properties': ['rank', 'diagonal']})
+    assert response.get_json()['results'] == {'rank': 2, 'diagonal': True}
+    response = client.post('/check_property', json={'matrixA': [[1, 2], [3, 4]], 'property': 'rank'})
+    assert response.get_json() == {'result': 'Matrix has rank 2'}
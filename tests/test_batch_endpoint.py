@@ -0,0 +1,43 @@
+import app as server
+
+
+def test_steps_feed_later_steps(client):
+    steps = [
+        {'id': 'sum', 'operation': 'add', 'matrixA': [[1, 2]], 'matrixB': [[3, 4]]},
+        {'id': 'twice', 'operation': 'scalar_multiply', 'matrixA': {'step': 'sum'}, 'scalar': 2},
+        {'id': 'det', 'operation': 'determinant', 'matrixA': [[2, 0], [0, 3]]},
+        {'id': 'scaled', 'operation': 'scalar_multiply', 'matrixA': {'step': 'twice'}, 'scalar': {'step': 'det'}},
+    ]
+    response = client.post('/calculate/batch', json={'steps': steps, 'outputs': ['sum', 'scaled']})
+    assert response.status_code == 200
+    assert response.get_json()['results'] == {'sum': [[4.0, 6.0]], 'scaled': [[48.0, 72.0]]}
+
+
+def test_levels_group_independent_steps():
+    steps = [{'id': 'a'}, {'id': 'b'}, {'id': 'c', 'matrixA': {'step': 'a'}, 'matrixB': {'step': 'b'}},
+             {'id': 'd', 'matrixA': {'step': 'a'}}]
+    assert [[step['id'] for step in level] for level in server.batch_levels(steps)] == [['a', 'b'], ['c', 'd']]
+
+
+def test_forward_reference_is_rejected(client):
+    steps = [{'id': 's1', 'operation': 'transpose', 'matrixA': {'step': 's2'}},
+             {'id': 's2', 'operation': 'transpose', 'matrixA': [[1]]}]
+    response = client.post('/calculate/batch', json={'steps': steps})
+    assert response.status_code == 400
+    assert 'later step s2' in response.get_json()['error']
+
+
+def test_failing_step_is_named(client):
+    steps = [{'id': 'ok', 'operation': 'transpose', 'matrixA': [[1, 2]]},
+             {'id': 'bad', 'operation': 'inverse', 'matrixA': {'step': 'ok'}}]
+    response = client.post('/calculate/batch', json={'steps': steps})
+    assert response.status_code == 400
+    assert response.get_json()['step'] == 'bad'
+
+
+def test_duplicate_ids_and_step_limit(client, monkeypatch):
+    steps = [{'id': 'x', 'operation': 'transpose', 'matrixA': [[1]]}] * 2
+    assert client.post('/calculate/batch', json={'steps': steps}).status_code == 400
+    monkeypatch.setattr(server, 'BATCH_MAX_STEPS', 1)
+    steps = [{'id': str(i), 'operation': 'transpose', 'matrixA': [[1]]} for i in range(2)]
+    assert 'at most 1' in client.post('/calculate/batch', json={'steps': steps}).get_json()['error']
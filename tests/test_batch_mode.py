@@ -0,0 +1,77 @@
+import io
+import json
+import sys
+
+import pytest
+
+from Matrixbatch import BatchRunner, JobError, main, parse_job, read_jobs
+from Matrixcodes import Matrix
+
+SCRIPT = """\
+# a comment, then a blank line
+
+{"id": "a", "operation": "transpose", "matrixA": [[1, 2]], "store": "A"}
+B = transpose(A) * A
+det(B)
+{"operation": "inverse", "matrixA": {"ref": "missing"}}
+{"id": "broken",
+"""
+
+
+def test_parse_job():
+    assert parse_job('  # note', 1) is None and parse_job('', 2) is None
+    assert parse_job('C = A + B', 3) == {'expression': 'A + B', 'store': 'C', 'id': 3}
+    assert parse_job('load ws.mtx A B', 4) == {'load': 'ws.mtx', 'names': ['A', 'B'], 'id': 4}
+    assert parse_job('{"id": "x", "operation": "trace"}', 5)['id'] == 'x'
+    with pytest.raises(ValueError):
+        parse_job('{"id": ', 6)
+
+
+def run(text, workers):
+    jobs = [job for n, line in enumerate(text.splitlines(), start=1) if (job := parse_job(line, n))]
+    output = io.StringIO()
+    failed = BatchRunner(output, workers=workers).run(jobs)
+    return failed, [json.loads(line) for line in output.getvalue().splitlines()]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_runner_keeps_input_order_and_dependencies(workers):
+    failed, records = run('\n'.join(SCRIPT.splitlines()[:-1]), workers)
+    assert [record['id'] for record in records] == ['a', 4, 5, 6]
+    assert records[0]['stored'] == 'A' and 'result' not in records[0]
+    assert records[2]['result'] == 5.0
+    assert 'missing' in records[3]['error'] and failed == 1
+
+
+def test_read_jobs_reports_bad_lines(tmp_path):
+    path = tmp_path / 'jobs.txt'
+    path.write_text(SCRIPT)
+    jobs = list(read_jobs([str(path)]))
+    assert isinstance(jobs[-1], JobError) and jobs[-1].id == f'{path}:7'
+    assert [job['id'] for job in jobs[:-1]] == ['a', f'{path}:4', f'{path}:5', f'{path}:6']
+
+
+def test_default_ids_are_unique_across_files(tmp_path, monkeypatch):
+    first, second = tmp_path / 'first.txt', tmp_path / 'second.txt'
+    first.write_text('det(A)\n')
+    second.write_text('det(B)\n')
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('det(C)\n'))
+    ids = [job['id'] for job in read_jobs([str(first), str(second), '-'])]
+    assert ids == [f'{first}:1', f'{second}:1', '<stdin>:1']
+
+
+def test_standard_input_stays_open(monkeypatch):
+    stdin = io.StringIO('det(A)\n')
+    monkeypatch.setattr(sys, 'stdin', stdin)
+    assert list(read_jobs(['-']))[0]['expression'] == 'det(A)'
+    assert not stdin.closed
+
+
+def test_main_with_workspace_and_save(tmp_path, monkeypatch, capsys):
+    from Matrixfile import load, save
+    save(str(tmp_path / 'in.mtx'), {'A': Matrix([[2, 0], [0, 3]])})
+    monkeypatch.setattr(sys, 'stdin', io.StringIO('B = inv(A)\ndet(B)\n'))
+    assert main(['--workspace', str(tmp_path / 'in.mtx'), '--save', str(tmp_path / 'out.mtx')]) == 0
+    records = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert [record['id'] for record in records] == ['workspace', '<stdin>:1', '<stdin>:2', 'save']
+    assert load(str(tmp_path / 'out.mtx'))['B'].data == Matrix([[2, 0], [0, 3]]).inverse().data
@@ -0,0 +1,77 @@
+import json
+import threading
+import time
+
+import pytest
+
+import app as server
+from Matrixcodes import current_progress
+from Matrixjobs import CANCELLED, DONE, FINISHED_STATES, JobQueue
+
+PAYLOAD = {'operation': 'inverse', 'matrixA': [[3, 1], [1, 7]]}
+INVERSE = [[0.35, -0.05], [-0.05, 0.15]]
+
+
+def job_status(client, job_id, statuses, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = client.get(f'/jobs/{job_id}').get_json()
+        if job['status'] in statuses:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} never reached {statuses}')
+
+
+@pytest.fixture
+def stalled(monkeypatch, tmp_path):
+    # Jobs spin on progress updates until cancelled; requests compute normally
+    real = server.run_operation
+
+    def run_operation(operation, matrix_a, matrix_b=None, scalar=None):
+        progress = current_progress()
+        if progress is None:
+            return real(operation, matrix_a, matrix_b, scalar)
+        progress.begin('eliminate', 1000)
+        while True:
+            time.sleep(0.01)
+            progress.advance(0)
+
+    monkeypatch.setattr(server, 'run_operation', run_operation)
+    # Runner processes are forked from the test process, so they need to start after the patch
+    jobs = JobQueue(str(tmp_path / 'jobs.db'), server.run_job, workers=1, interval=0.01, poll=0.01)
+    monkeypatch.setattr(server, 'jobs', jobs)
+    yield
+    jobs.close(0)
+
+
+def test_cancelling_a_running_job(client, stalled):
+    job_id = client.post('/jobs', json=PAYLOAD).get_json()['job']
+    job_status(client, job_id, ['running'])
+    assert client.delete(f'/jobs/{job_id}').status_code == 200
+    assert job_status(client, job_id, FINISHED_STATES)['status'] == CANCELLED
+
+
+def test_cancelled_job_does_not_fail_identical_request(client, stalled):
+    job_id = client.post('/jobs', json=PAYLOAD).get_json()['job']
+    job_status(client, job_id, ['running'])
+    outcome = {}
+    request = threading.Thread(target=lambda: outcome.update(response=client.post('/calculate', json=PAYLOAD)))
+    request.start()
+    time.sleep(0.05)
+    client.delete(f'/jobs/{job_id}')
+    request.join(10)
+    assert job_status(client, job_id, FINISHED_STATES)['status'] == CANCELLED
+    response = outcome['response']
+    assert response.status_code == 200
+    assert response.get_json()['result'] == INVERSE
+
+
+def test_events_stream_progress_then_result(client):
+    job_id = client.post('/jobs', json=PAYLOAD).get_json()['job']
+    body = client.get(f'/jobs/{job_id}/events').get_data(as_text=True)
+    events = [block for block in body.split('\n\n') if block.startswith('event:')]
+    name, data = events[-1].split('\n')
+    assert name == f'event: {DONE}'
+    assert json.loads(data[len('data: '):])['result'] == INVERSE
+    assert all(block.startswith('event: progress') for block in events[:-1])
+    assert client.get('/jobs/unknown/events').status_code == 404
@@ -0,0 +1,38 @@
+import numpy as np
+import pytest
+
+from Unitconv import convert, convert_many
+
+
+@pytest.mark.parametrize('source, target', [
+    ('kilometer', 'mile'), ('celsius', 'fahrenheit'), ('mpg (us)', 'liter/100km'), ('km/liter', 'mpg (imp.)'),
+])
+def test_matches_scalar_conversion(source, target):
+    values = np.linspace(1, 500, 1000).reshape(10, 100)
+    result = convert_many(values, source, target)
+    assert result.shape == values.shape and result.dtype == float
+    expected = [[convert(value, source, target) for value in row] for row in values]
+    np.testing.assert_allclose(result, expected, rtol=1e-12)
+
+
+def test_lists_and_input_left_unchanged():
+    values = np.array([0.0, 100.0])
+    assert convert_many(values, 'celsius', 'kelvin').tolist() == pytest.approx([273.15, 373.15])
+    assert values.tolist() == [0.0, 100.0]
+    assert convert_many([1, 2], 'meter', 'centimeter').tolist() == [100.0, 200.0]
+
+
+def test_zero_for_reciprocal_units():
+    with pytest.raises(ValueError, match='Cannot convert 0'):
+        convert_many([25, 0], 'mpg (us)', 'liter/100km')
+    result = convert_many([25, 0, np.nan], 'mpg (us)', 'liter/100km', errors='coerce')
+    assert result[0] == pytest.approx(9.40858332) and np.isnan(result[1:]).all()
+
+
+def test_invalid_values():
+    with pytest.raises(ValueError, match='must be numbers'):
+        convert_many([1, 'x'], 'meter', 'foot')
+    result = convert_many([1, 'x', None, '2'], 'meter', 'centimeter', errors='coerce')
+    np.testing.assert_array_equal(result, [100.0, np.nan, np.nan, 200.0])
+    with pytest.raises(ValueError, match='errors must be'):
+        convert_many([1], 'meter', 'foot', errors='ignore')
@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from Matrixcodes import Matrix
+from Matrixcost import MAX_POWER_BITS, check_scalar_power, power_bits
+from Matrixexpr import evaluate, parse, plan, unparse
+
+
+def test_planner_orders_chains_and_uses_solve():
+    shapes = {'A': (50, 5), 'B': (5, 100), 'C': (100, 10)}
+    assert unparse(plan(parse('A*B*C'), shapes)) == 'A * (B * C)'
+    assert unparse(plan(parse('inv(A)*B'), {'A': (3, 3), 'B': (3, 1)})) == 'solve(A, B)'
+    assert unparse(plan(parse('2^3*A'), {'A': (3, 3)})) == '8 * A'
+
+
+def test_repeated_subexpressions_are_evaluated_once():
+    calls = []
+
+    def step(operation, a, b, scalar):
+        calls.append(operation)
+        return a.transpose() if operation == 'transpose' else a.add(b)
+
+    tree = plan(parse('transpose(A) + transpose(A)'), {'A': (2, 2)})
+    result, stats = evaluate(tree, {'A': Matrix([[1, 2], [3, 4]])}, step)
+    assert calls == ['transpose', 'add']
+    assert stats['reused'] == 1
+    assert result.data == [[2, 6], [4, 8]]
+
+
+def test_power_bits_and_limit():
+    assert power_bits(9, 9) == 36
+    assert power_bits(1, 10 ** 9) == 0 and power_bits(-1, 10 ** 9) == 0
+    assert power_bits(2.0, 10 ** 9) == 0
+    check_scalar_power(2, MAX_POWER_BITS // 2 - 1)
+    with pytest.raises(ValueError, match='too large'):
+        check_scalar_power(9, 387420489)
+
+
+@pytest.mark.parametrize('expression', ['9^9^9 * A', '2 * A * (10^100000)'])
+def test_huge_scalar_powers_are_refused_quickly(client, expression):
+    start = time.perf_counter()
+    response = client.post('/evaluate', json={'expression': expression, 'matrices': {'A': [[1, 2], [3, 4]]}})
+    assert response.status_code == 400
+    assert 'too large' in response.get_json()['error']
+    assert time.perf_counter() - start < 1.0
+
+
+def test_huge_matrix_power_goes_through_admission(client):
+    response = client.post('/evaluate', json={'expression': 'A^(9^9)', 'matrices': {'A': [[2, 1], [1, 2]]}})
+    assert response.status_code == 400
+    assert 'Estimated cost' in response.get_json()['error']
+
+
+@pytest.mark.parametrize('matrix, backend', [
+    ([[2, 1], [1, 2]], 'sympy'),
+    ([['1/2', 1], [1, 2]], 'sympy'),
+    ([[2.0, 1], [1, 2]], 'numpy'),
+    ({'array': [[2, 1], [1, 2]]}, 'numpy'),
+])
+def test_only_floating_point_input_runs_on_numpy(client, matrix, backend):
+    response = client.post('/evaluate', json={'expression': 'A^3', 'matrices': {'A': matrix}})
+    assert response.status_code == 200
+    assert response.get_json()['backend'] == backend
+
+
+def test_is_floating():
+    assert not Matrix([[1, 2], [3, 4]]).is_floating()
+    assert not Matrix([['x', 1.5]]).is_floating()
+    assert Matrix([[1, 2.5]]).is_floating()
@@ -0,0 +1,69 @@
+import sqlite3
+
+import pytest
+
+import app as server
+from Matrixcodes import Matrix
+from Matrixhistory import VersionedMatrices, diff
+
+
+def test_single_cell_edit_is_stored_as_delta():
+    assert diff([[1, 2], [3, 4]], [[1, 2], [3, 5]]) == {'delta': [[1, 1, 4, 5]]}
+    assert 'before' in diff([[1, 2]], [[1, 2, 3]])
+    assert 'before' in diff(None, [[1]])
+
+
+def test_undo_redo_and_point_in_time_reads():
+    matrices = VersionedMatrices()
+    matrices['A'] = Matrix([[1, 2], [3, 4]])
+    matrices['A'] = Matrix([[1, 2], [3, 5]])
+    del matrices['A']
+    assert matrices.revision == 3 and 'A' not in matrices
+    assert matrices.undo() == ('A', 'delete')
+    assert matrices['A'].data == [[1, 2], [3, 5]]
+    assert matrices.undo()[0] == 'A'
+    assert matrices['A'].data == [[1, 2], [3, 4]]
+    assert matrices.redo()[0] == 'A'
+    assert matrices['A'].data == [[1, 2], [3, 5]]
+    assert matrices.at(0) == {} and matrices.at(1)['A'].data == [[1, 2], [3, 4]]
+    with pytest.raises(ValueError):
+        matrices.at(5)
+
+
+def test_new_change_discards_redo_and_limit_forgets_oldest():
+    matrices = VersionedMatrices(limit=2)
+    for value in range(4):
+        matrices['A'] = Matrix([[value]])
+    matrices.undo()
+    matrices['B'] = Matrix([[9]])
+    assert matrices.redo() is None
+    with pytest.raises(ValueError):
+        matrices.at(0)
+    assert matrices.undo() and matrices.undo() and matrices.undo() is None
+
+
+def test_history_endpoints(client, isolated):
+    client.post('/matrices', json={'name': 'A', 'matrix': [[1, 2], [3, 4]]})
+    client.put('/matrices/A', json={'matrix': [[1, 2], [3, 5]]})
+    history = client.get('/history').get_json()
+    assert history['revision'] == 2 and [entry['rev'] for entry in history['revisions']] == [2, 1]
+
+    undone = client.post('/history/undo').get_json()
+    assert undone['revision'] == 1 and undone['undone']['name'] == 'A'
+    assert client.get('/matrices/A').get_json()['matrix'] == [[1, 2], [3, 4]]
+    assert client.get('/matrices/A', query_string={'at': 0}).status_code == 404
+    assert client.post('/history/redo').get_json()['revision'] == 2
+    assert client.get('/matrices/A').get_json()['matrix'] == [[1, 2], [3, 5]]
+    assert client.post('/history/redo').status_code == 409
+
+
+def test_undo_failure_is_reported(client, isolated, monkeypatch):
+    def locked():
+        raise sqlite3.OperationalError('database is locked')
+
+    for action in ('undo', 'redo'):
+        monkeypatch.setattr(isolated, action, locked)
+        response = client.post(f'/history/{action}')
+        assert response.status_code == 400
+        assert response.get_json() == {'error': 'database is locked'}
+    assert 'exception="OperationalError"' in client.get('/metrics').get_data(as_text=True)
@@ -0,0 +1,139 @@
+import os
+import signal
+import time
+
+import pytest
+
+from Matrixjobs import CANCELLED, DONE, FAILED, FINISHED_STATES, INTERRUPTED, JobQueue, QueueFullError
+
+
+def wait_for(get, job_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = get(job_id)
+        if job and job['status'] in FINISHED_STATES:
+            return job
+        time.sleep(0.02)
+    raise AssertionError(f'job {job_id} did not finish')
+
+
+def wait_until(path, timeout=10):
+    deadline = time.monotonic() + timeout
+    while not path.exists():
+        assert time.monotonic() < deadline, f'{path} never appeared'
+        time.sleep(0.01)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    # Runners are separate processes, so tests coordinate with them through files
+    created = []
+
+    def make(runner, **options):
+        created.append(JobQueue(str(tmp_path / 'jobs.db'), runner, poll=0.01, **options))
+        return created[-1]
+
+    yield make
+    for jobs in created:
+        jobs.close(0)
+
+
+def test_job_result_and_error(queue):
+    def runner(payload):
+        if payload.get('fail'):
+            raise ValueError('bad input')
+        return payload['value'] * 2
+
+    jobs = queue(runner, workers=1)
+    done = wait_for(jobs.get, jobs.submit({'value': 21}))
+    assert done['status'] == DONE and done['result'] == 42
+    failed = wait_for(jobs.get, jobs.submit({'fail': True}))
+    assert failed['status'] == FAILED and failed['error'] == 'bad input'
+    assert jobs.get('unknown') is None
+
+
+def test_priority_order_and_queue_limit(queue, tmp_path):
+    gate, log = tmp_path / 'gate', tmp_path / 'started'
+
+    def runner(payload):
+        wait_until(gate)
+        with open(log, 'a') as f:
+            f.write(payload['name'] + '\n')
+
+    jobs = queue(runner, workers=1, maxsize=3)
+    first = jobs.submit({'name': 'blocker'})
+    while jobs.get(first)['status'] != 'running':
+        time.sleep(0.01)
+    low = jobs.submit({'name': 'low'})
+    high = jobs.submit({'name': 'high'}, priority=5)
+    normal = jobs.submit({'name': 'normal'})
+    with pytest.raises(QueueFullError):
+        jobs.submit({'name': 'overflow'})
+    assert jobs.pending() == 3
+    gate.touch()
+    for job_id in (low, high, normal):
+        wait_for(jobs.get, job_id)
+    assert log.read_text().split() == ['blocker', 'high', 'low', 'normal']
+
+
+def test_cancel_queued_job(queue, tmp_path):
+    gate = tmp_path / 'gate'
+    jobs = queue(lambda payload: wait_until(gate), workers=1)
+    blocker = jobs.submit({})
+    queued = jobs.submit({})
+    assert jobs.cancel(queued) is True
+    gate.touch()
+    wait_for(jobs.get, blocker)
+    assert jobs.get(queued)['status'] == CANCELLED
+    assert jobs.cancel(blocker) is False
+    assert jobs.cancel('unknown') is None
+
+
+def test_jobs_run_outside_the_submitting_process(queue):
+    jobs = queue(lambda payload: os.getpid(), workers=1)
+    assert wait_for(jobs.get, jobs.submit({}))['result'] != os.getpid()
+
+
+def test_close_fails_jobs_still_running_and_keeps_queued_ones(queue, tmp_path):
+    gate = tmp_path / 'gate'
+    jobs = queue(lambda payload: wait_until(gate, timeout=60), workers=1)
+    running = jobs.submit({})
+    queued = jobs.submit({})
+    while jobs.status(running) != 'running':
+        time.sleep(0.01)
+    jobs.close(0)
+    assert jobs.get(running)['status'] == FAILED
+    assert jobs.get(running)['error'] == INTERRUPTED
+    # The queued job waited in the table and runs once runners are back
+    gate.touch()
+    assert wait_for(jobs.get, queued)['status'] == DONE
+
+
+def test_job_of_a_killed_runner_fails(queue, tmp_path):
+    pid = tmp_path / 'pid'
+
+    def runner(payload):
+        if payload.get('stall'):
+            (tmp_path / 'pid.tmp').write_text(str(os.getpid()))
+            os.replace(tmp_path / 'pid.tmp', pid)
+            time.sleep(60)
+        return 'done'
+
+    jobs = queue(runner, workers=1)
+    job_id = jobs.submit({'stall': True})
+    wait_until(pid)
+    os.kill(int(pid.read_text()), signal.SIGKILL)
+    job = wait_for(jobs.get, job_id)
+    assert job['status'] == FAILED and job['error'] == INTERRUPTED
+    # A new runner replaced the dead one
+    assert wait_for(jobs.get, jobs.submit({}))['result'] == 'done'
+
+
+def test_job_api(client):
+    response = client.post('/jobs', json={'operation': 'inverse', 'matrixA': [[2, 0], [0, 4]]})
+    assert response.status_code == 202
+    assert response.headers['Location'] == f"/jobs/{response.get_json()['job']}"
+    job = wait_for(lambda job_id: client.get(f'/jobs/{job_id}').get_json(), response.get_json()['job'])
+    assert job['status'] == DONE
+    assert job['result'] == [[0.5, 0.0], [0.0, 0.25]]
+    assert client.get('/jobs/unknown').status_code == 404
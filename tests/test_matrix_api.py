@@ -0,0 +1,39 @@
+def test_get_single_matrix_with_etag(client, isolated):
+    client.post('/matrices', json={'name': 'A', 'matrix': [[1, 2], [3, 4]]})
+    response = client.get('/matrices/A')
+    assert response.status_code == 200
+    assert response.get_json() == {'name': 'A', 'rows': 2, 'cols': 2, 'version': 1, 'matrix': [[1, 2], [3, 4]]}
+    etag = response.headers['ETag']
+    assert etag.startswith('"') and not etag.startswith('W/')
+    assert client.get('/matrices/A', headers={'If-None-Match': etag}).status_code == 304
+
+    client.put('/matrices/A', json={'matrix': [[5, 6], [7, 8]]})
+    changed = client.get('/matrices/A', headers={'If-None-Match': etag})
+    assert changed.status_code == 200 and changed.headers['ETag'] != etag
+    assert client.get('/matrices/missing').status_code == 404
+
+
+def test_listing_revalidates_until_a_write(client, isolated):
+    client.post('/matrices', json={'name': 'A', 'matrix': [[1]]})
+    etag = client.get('/matrices').headers['ETag']
+    assert client.get('/matrices', headers={'If-None-Match': etag}).status_code == 304
+    client.post('/matrices', json={'name': 'B', 'matrix': [[2]]})
+    assert client.get('/matrices', headers={'If-None-Match': etag}).status_code == 200
+
+
+def test_pagination_returns_metadata_in_name_order(client, isolated):
+    names = [f'm{i:02d}' for i in range(7)]
+    for name in reversed(names):
+        client.post('/matrices', json={'name': name, 'matrix': [[1, 2, 3]]})
+    seen, after = [], None
+    while True:
+        query = {'limit': 3, **({'after': after} if after else {})}
+        page = client.get('/matrices', query_string=query).get_json()
+        assert page['total'] == 7 and len(page['matrices']) <= 3
+        assert all('matrix' not in entry and (entry['rows'], entry['cols']) == (1, 3) for entry in page['matrices'])
+        seen += [entry['name'] for entry in page['matrices']]
+        after = page['next']
+        if after is None:
+            break
+    assert seen == names
+    assert client.get('/matrices', query_string={'limit': 0}).status_code == 400
@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from Matrixstore import MatrixCache, MatrixStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MatrixStore(str(tmp_path / 'matrices.db'))
+
+
+def test_sees_writes_from_another_store_instance(store, tmp_path):
+    cache = MatrixCache(store)
+    assert cache.get('A') is None
+    MatrixStore(store.path).put('A', [[1, 2]])
+    assert cache.get('A') == [[1, 2]]
+
+
+def test_refresh_reloads_only_changed_rows(store, monkeypatch):
+    for name in 'ABC':
+        store.put(name, [[1]])
+    cache = MatrixCache(store)
+    assert set(cache.snapshot()) == {'A', 'B', 'C'}
+
+    requested = []
+    get_many = store.get_many
+    monkeypatch.setattr(store, 'get_many', lambda names: requested.append(list(names)) or get_many(names))
+    store.put('B', [[2]])
+    store.delete('C')
+    store.put('D', [[4]])
+    assert cache.snapshot() == {'A': [[1]], 'B': [[2]], 'D': [[4]]}
+    assert sorted(requested[-1]) == ['B', 'D']
+
+
+def test_keeps_insertion_order(store):
+    for name in 'CAB':
+        store.put(name, [[1]])
+    cache = MatrixCache(store)
+    cache.snapshot()
+    store.put('A', [[2]])
+    assert list(cache.snapshot()) == ['C', 'A', 'B']
+
+
+def test_parsed_matrix_is_shared_until_rewritten(store):
+    store.put('A', [[1, 2], [3, 4]])
+    cache = MatrixCache(store)
+    first = cache.matrix('A')
+    assert cache.matrix('A') is first
+    store.put('A', [[5]])
+    second = cache.matrix('A')
+    assert second is not first and second.rows == 1
+    store.delete('A')
+    assert cache.matrix('A') is None
+
+
+def test_concurrent_readers_and_writer(store):
+    store.put('A', [[0]])
+    cache = MatrixCache(store)
+    errors = []
+    stop = threading.Event()
+
+    def read():
+        try:
+            while not stop.is_set():
+                matrix = cache.matrix('A')
+                version, data = cache.entry('A')
+                assert matrix is not None and len(data) == 1
+        except Exception as e:
+            errors.append(e)
+
+    readers = [threading.Thread(target=read) for _ in range(4)]
+    for reader in readers:
+        reader.start()
+    for i in range(50):
+        store.put('A', [[i]])
+    stop.set()
+    for reader in readers:
+        reader.join()
+    assert not errors
+    assert cache.get('A') == [[49]]
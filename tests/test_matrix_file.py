@@ -0,0 +1,97 @@
+import os
+import stat
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from Matrixcodes import Matrix, MatrixManager
+from Matrixfile import MatrixFile, _from_srepr, is_matrix_file, load, save
+
+
+@pytest.fixture
+def workspace():
+    x = sp.Symbol('x')
+    return {
+        'ints': Matrix([[1, -2], [3, 2 ** 40]]),
+        'floats': Matrix([[0.5, 1.25]]),
+        'exact': Matrix([[sp.Rational(1, 3), 2 ** 80], [sp.sin(x) / x, sp.pi * sp.I]]),
+        'array': Matrix.from_array(np.arange(6, dtype=np.int32).reshape(2, 3)),
+    }
+
+
+def test_round_trip_is_lossless(tmp_path, workspace):
+    path = str(tmp_path / 'workspace.mtx')
+    save(path, workspace)
+    assert is_matrix_file(path)
+    loaded = load(path)
+    assert list(loaded) == list(workspace)
+    for name in ('ints', 'floats', 'exact'):
+        assert loaded[name].data == workspace[name].data
+    assert loaded['array'].array.dtype == np.int32
+    np.testing.assert_array_equal(loaded['array'].array, workspace['array'].array)
+
+
+def test_single_matrix_and_mapped_loading(tmp_path, workspace):
+    path = str(tmp_path / 'workspace.mtx')
+    save(path, workspace)
+    with MatrixFile(path) as f:
+        assert f.names() == list(workspace)
+        assert f.matrix('exact').data == workspace['exact'].data
+        with pytest.raises(KeyError):
+            f.matrix('missing')
+    mapped = load(path, names=['array'], mapped=True)
+    assert list(mapped) == ['array']
+    assert not mapped['array'].array.flags.writeable
+    np.testing.assert_array_equal(mapped['array'].array, [[0, 1, 2], [3, 4, 5]])
+
+
+def test_high_precision_floats_keep_their_precision(tmp_path):
+    matrix = Matrix([[sp.Float('0.5', 30), sp.Float('0.1', 30)]])
+    path = str(tmp_path / 'precise.mtx')
+    save(path, {'A': matrix})
+    assert load(path)['A'].data == matrix.data
+
+
+@pytest.mark.skipif(os.name != 'posix', reason='permission bits are POSIX')
+def test_save_keeps_permissions(tmp_path, workspace):
+    path = str(tmp_path / 'workspace.mtx')
+    umask = os.umask(0o022)
+    try:
+        save(path, workspace)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+        os.chmod(path, 0o640)
+        save(path, workspace)
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+    finally:
+        os.umask(umask)
+
+
+@pytest.mark.parametrize('text', [
+    "__import__('os').system('true')",
+    "Symbol('x').__class__.__base__",
+    "eval('1')",
+    "Integer(1) + Integer(2)",
+])
+def test_srepr_loader_refuses_code(text):
+    with pytest.raises(ValueError):
+        _from_srepr(text)
+
+
+def test_srepr_loader_rebuilds_sympy():
+    expr = sp.Function('f')(sp.Symbol('x')) + sp.Rational(-2, 7) * sp.pi
+    assert _from_srepr(sp.srepr(expr)) == expr
+
+
+@pytest.mark.parametrize('filename, binary', [('workspace.txt', False), ('workspace', False), ('workspace.mtx', True)])
+def test_manager_saves_text_unless_mtx(tmp_path, filename, binary):
+    path = str(tmp_path / filename)
+    manager = MatrixManager()
+    manager.matrices['A'] = Matrix([[1, 2], [3, 4]])
+    manager.save_matrices(path)
+    assert is_matrix_file(path) is binary
+    if not binary:
+        assert open(path).read().startswith('Matrix A:')
+    restored = MatrixManager()
+    restored.load_matrices(path)
+    assert restored.matrices['A'].data == [[1, 2], [3, 4]]
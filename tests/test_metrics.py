@@ -0,0 +1,52 @@
+import threading
+
+from Matrixmetrics import Registry
+
+
+def test_counter_and_histogram_rendering():
+    registry = Registry()
+    counter = registry.counter('requests_total', 'Requests.', ['code'])
+    histogram = registry.histogram('latency_seconds', 'Latency.', ['op'], buckets=(0.1, 1))
+    counter.inc('200')
+    counter.inc('200', amount=2)
+    for value in (0.05, 0.5, 5):
+        histogram.observe('add', value=value)
+    lines = registry.render().splitlines()
+    assert '# TYPE requests_total counter' in lines
+    assert 'requests_total{code="200"} 3' in lines
+    assert 'latency_seconds_bucket{op="add",le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{op="add",le="1"} 2' in lines
+    assert 'latency_seconds_bucket{op="add",le="+Inf"} 3' in lines
+    assert 'latency_seconds_count{op="add"} 3' in lines
+
+
+def test_label_values_are_escaped():
+    registry = Registry()
+    registry.counter('errors_total', 'Errors.', ['message']).inc('say "hi"\n')
+    assert 'errors_total{message="say \\"hi\\"\\n"} 1' in registry.render()
+
+
+def test_callback_gauge():
+    registry = Registry()
+    registry.gauge('queue_depth', 'Depth.', callback=lambda: 7)
+    assert 'queue_depth 7' in registry.render().splitlines()
+
+
+def test_concurrent_increments():
+    counter = Registry().counter('hits_total', 'Hits.')
+    threads = [threading.Thread(target=lambda: [counter.inc() for _ in range(1000)]) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert 'hits_total 8000' in counter.render()
+
+
+def test_metrics_endpoint(client):
+    client.post('/calculate', json={'operation': 'trace', 'matrixA': [[1, 2], [3, 40]]})
+    response = client.get('/metrics')
+    assert response.mimetype == 'text/plain'
+    text = response.get_data(as_text=True)
+    assert 'matrix_operations_total{operation="trace",kind="numeric",backend="sympy"}' in text
+    assert 'matrix_http_requests_total{endpoint="calculate",method="POST",status="200"}' in text
+    assert 'matrix_operation_input_rows_bucket{operation="trace"' in text
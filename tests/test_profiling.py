@@ -0,0 +1,48 @@
+import pytest
+
+import app as server
+from Matrixstore import ProfileStore
+
+
+@pytest.fixture
+def allowed(monkeypatch):
+    monkeypatch.setattr(server, 'PROFILE_ALLOWLIST', {'127.0.0.1'})
+
+
+def test_profile_report(client, allowed):
+    response = client.post('/calculate?profile=1', json={'operation': 'inverse', 'matrixA': [[4, 7], [2, 6]]})
+    assert response.status_code == 200
+    report = response.get_json()['profile']
+    assert report['id'] == response.headers['X-Profile-Id']
+    assert {'operation', 'serialize'} <= set(report['phases'])
+    # Reports outlive the result cache
+    server.result_cache.clear()
+    assert client.get(f"/profiles/{report['id']}").get_json() == report
+
+
+def test_profiling_needs_allowlist(client):
+    response = client.post('/calculate', json={'operation': 'trace', 'matrixA': [[1]]}, headers={'X-Profile': '1'})
+    assert response.status_code == 403
+    assert client.get('/profiles/anything').status_code == 403
+
+
+def test_unknown_profile(client, allowed):
+    assert client.get('/profiles/unknown').status_code == 404
+
+
+def test_reports_do_not_use_result_cache(client, allowed):
+    size = server.result_cache.stats()['size']
+    client.post('/check_property?profile=1', json={'matrixA': [[1, 2], [3, 4]], 'property': 'rank'})
+    assert server.result_cache.stats()['size'] == size
+
+
+def test_store_keeps_newest_reports(tmp_path):
+    path = str(tmp_path / 'profiles.db')
+    profiles = ProfileStore(keep=2, path=path)
+    for i in range(3):
+        profiles.add(str(i), {'id': str(i)})
+    assert profiles.get('0') is None
+    assert profiles.get('2') == {'id': '2'}
+    other = ProfileStore(keep=2, path=path)
+    assert other.get('0') is None
+    assert other.get('1') == {'id': '1'}
@@ -0,0 +1,51 @@
+import time
+
+import app as server
+from Matrixcodes import Matrix
+from Matrixstore import ResultCache
+
+
+def test_lru_eviction():
+    cache = ResultCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    assert cache.get('a') == (True, 1)
+    cache.set('c', 3)
+    assert cache.get('b') == (False, None)
+    assert cache.get('a') == (True, 1)
+    assert cache.stats()['evictions'] == 1
+
+
+def test_entries_expire():
+    cache = ResultCache(ttl=0.05)
+    cache.set('a', [[1]])
+    assert cache.get('a')[0]
+    time.sleep(0.1)
+    assert cache.get('a') == (False, None)
+
+
+def test_shared_tier_serves_other_processes(tmp_path):
+    path = str(tmp_path / 'results.db')
+    ResultCache(path=path).set('a', [[1, 2]])
+    other = ResultCache(path=path)
+    assert other.get('a') == (True, [[1, 2]])
+    assert other.stats()['shared_hits'] == 1
+
+
+def test_fingerprint_is_canonical():
+    assert Matrix([['x+1', 2]]).fingerprint() == Matrix([['1+x', 2]]).fingerprint()
+    assert Matrix([[1, 2]]).fingerprint() != Matrix([[2, 1]]).fingerprint()
+    assert Matrix([[1, 2]]).fingerprint() != Matrix([[1], [2]]).fingerprint()
+
+
+def test_calculate_computes_once(client, monkeypatch):
+    calls = []
+    apply = server.apply_operation
+    monkeypatch.setattr(server, 'apply_operation', lambda *args: calls.append(args) or apply(*args))
+    payload = {'operation': 'multiply', 'matrixA': [[1, 2], [3, 4]], 'matrixB': [[28, 0], [0, 1]]}
+    first = client.post('/calculate', json=payload)
+    assert first.status_code == 200
+    # The same matrices written differently share the fingerprint-keyed entry
+    again = client.post('/calculate', json={**payload, 'matrixB': [['28', 0], [0, '1']]})
+    assert again.get_json() == first.get_json()
+    assert len(calls) == 1
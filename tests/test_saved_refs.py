@@ -0,0 +1,27 @@
+def test_calculate_with_saved_matrices(client):
+    client.post('/matrices', json={'name': 'RefA', 'matrix': [[1, 2], [3, 4]]})
+    client.post('/matrices', json={'name': 'RefB', 'matrix': [[1, 0], [0, 1]]})
+    response = client.post('/calculate', json={'operation': 'multiply', 'matrixA': {'ref': 'RefA'},
+                                               'matrixB': {'ref': 'RefB'}})
+    assert response.status_code == 200
+    assert response.get_json()['result'] == [[1.0, 2.0], [3.0, 4.0]]
+
+
+def test_reference_follows_updates(client):
+    client.post('/matrices', json={'name': 'RefC', 'matrix': [[2]]})
+    payload = {'operation': 'determinant', 'matrixA': {'ref': 'RefC'}}
+    assert client.post('/calculate', json=payload).get_json()['result'] == 2.0
+    client.put('/matrices/RefC', json={'matrix': [[5]]})
+    assert client.post('/calculate', json=payload).get_json()['result'] == 5.0
+
+
+def test_check_property_with_saved_matrix(client):
+    client.post('/matrices', json={'name': 'RefSym', 'matrix': [[1, 2], [2, 1]]})
+    response = client.post('/check_property', json={'matrixA': {'ref': 'RefSym'}, 'property': 'symmetric'})
+    assert response.get_json() == {'result': 'Matrix is symmetric'}
+
+
+def test_unknown_reference(client):
+    response = client.post('/calculate', json={'operation': 'transpose', 'matrixA': {'ref': 'Missing'}})
+    assert response.status_code == 400
+    assert 'Missing not found' in response.get_json()['error']
@@ -0,0 +1,70 @@
+import json
+
+import numpy as np
+import pytest
+import sympy as sp
+
+from Matrixcodes import Matrix
+from Matrixserial import check_precision, serialize_result, serialize_value
+
+
+def test_default_form():
+    matrix = Matrix([['1/3', 2], ['x + 1', 'sqrt(2)']])
+    assert serialize_result(matrix) == [[pytest.approx(1 / 3), 2.0], ['x + 1', pytest.approx(2 ** 0.5)]]
+    assert serialize_value(sp.sympify('1 + 2*I')) == {'re': 1.0, 'im': 2.0}
+
+
+def test_typed_form_keeps_exact_values():
+    row = serialize_result(Matrix([['1/3', 10 ** 30, 'x', '2.5']]), typed=True)[0]
+    assert row[0] == {'type': 'rational', 'p': '1', 'q': '3', 'approx': pytest.approx(1 / 3)}
+    assert row[1] == {'type': 'integer', 'value': str(10 ** 30)}
+    assert row[2] == {'type': 'expr', 'value': 'x'}
+    assert row[3] == {'type': 'float', 'value': 2.5}
+    assert serialize_value(sp.pi, precision=3, typed=True) == {'type': 'expr', 'value': 'pi', 'approx': 3.14}
+
+
+def test_precision_rounds_significant_digits():
+    assert serialize_result(Matrix([['2/3', 12345]]), precision=3) == [[0.667, 12300.0]]
+    array = Matrix.from_array(np.array([[2 / 3, 12345.0, 0.0]]))
+    assert serialize_result(array, precision=3) == [[0.667, 12300.0, 0.0]]
+
+
+def test_array_backend_matches_sympy_backend():
+    values = [[1.25, -3.5], [1e-9, 7.0]]
+    assert serialize_result(Matrix.from_array(np.array(values))) == serialize_result(Matrix(values))
+    complex_array = Matrix.from_array(np.array([[1 + 2j, 3 + 0j]]))
+    assert serialize_result(complex_array) == [[{'re': 1.0, 'im': 2.0}, 3.0]]
+
+
+def test_lists_and_scalars():
+    assert serialize_result([sp.Integer(2), sp.Rational(1, 2)]) == [2.0, 0.5]
+    assert serialize_result(sp.Integer(7), typed=True) == {'type': 'integer', 'value': '7'}
+
+
+def test_non_finite_values_are_typed_strings():
+    inf, nan = {'type': 'float', 'value': 'inf'}, {'type': 'float', 'value': 'nan'}
+    array = Matrix.from_array(np.array([[np.inf, 1.5], [np.nan, -np.inf]]))
+    assert serialize_result(array) == [[inf, 1.5], [nan, {'type': 'float', 'value': '-inf'}]]
+    assert serialize_result(array, typed=True)[0] == [inf, {'type': 'float', 'value': 1.5}]
+    assert serialize_result(Matrix([[sp.oo, 2]])) == [[inf, 2.0]]
+    assert serialize_value(complex(np.inf, 1)) == {'re': 'inf', 'im': 1.0}
+
+
+def test_calculate_overflow_is_valid_json(client):
+    response = client.post('/calculate', json={'operation': 'multiply', 'matrixA': [[1e200]], 'matrixB': [[1e200]]})
+    assert response.status_code == 200
+    # The strict parser refuses the Infinity and NaN literals Python's json module writes by default
+    result = json.loads(response.get_data(as_text=True), parse_constant=lambda name: pytest.fail(name))
+    assert result['result'] == [[{'type': 'float', 'value': 'inf'}]]
+
+
+@pytest.mark.parametrize('value', [0, 101, 2.5, True, '3'])
+def test_invalid_precision(value):
+    with pytest.raises(ValueError):
+        check_precision(value)
+
+
+def test_calculate_format_option(client):
+    response = client.post('/calculate', json={'operation': 'inverse', 'matrixA': [[3]], 'format': 'typed'})
+    assert response.get_json()['result'] == [[{'type': 'rational', 'p': '1', 'q': '3', 'approx': pytest.approx(1 / 3)}]]
+    assert client.post('/calculate', json={'operation': 'inverse', 'matrixA': [[3]], 'format': 'xml'}).status_code == 400
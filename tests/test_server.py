@@ -0,0 +1,98 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import textwrap
+import time
+import urllib.request
+
+import pytest
+
+import app as server
+from Matrixjobs import DONE, JobQueue
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+pytestmark = pytest.mark.skipif(not hasattr(os, 'fork'), reason='the pre-forking server needs fork()')
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def get(url, timeout=10):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            with urllib.request.urlopen(url, timeout=2) as response:
+                return response.read().decode()
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.05)
+
+
+def test_workers_serve_recycle_and_stop():
+    port = free_port()
+    script = textwrap.dedent(f'''
+        import os
+        from server import Arbiter
+
+        def app(environ, start_response):
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [str(os.getpid()).encode()]
+
+        Arbiter(app, '127.0.0.1', {port}, workers=2, max_requests=2).run()
+    ''')
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=ROOT, stderr=subprocess.PIPE)
+    try:
+        pids = {get(f'http://127.0.0.1:{port}/') for _ in range(8)}
+        assert str(process.pid) not in pids
+        assert len(pids) > 2  # workers were replaced after two requests each
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_recycled_worker_finishes_its_job_and_leaves_queued_ones(tmp_path):
+    port, path = free_port(), str(tmp_path / 'jobs.db')
+    script = textwrap.dedent(f'''
+        import time
+        from Matrixjobs import JobQueue
+        from server import Arbiter
+
+        jobs = JobQueue({path!r}, lambda payload: time.sleep(payload['seconds']) or payload['seconds'], workers=1)
+
+        def app(environ, start_response):
+            ids = [jobs.submit({{'seconds': 0.5}}), jobs.submit({{'seconds': 0}})]
+            start_response('200 OK', [('Content-Type', 'text/plain')])
+            return [' '.join(ids).encode()]
+
+        Arbiter(app, '127.0.0.1', {port}, workers=1, max_requests=1,
+                post_fork=jobs.start, worker_exit=jobs.close).run()
+    ''')
+    process = subprocess.Popen([sys.executable, '-c', script], cwd=ROOT, stderr=subprocess.PIPE)
+    try:
+        # The worker is recycled after this request, while the first job runs and the second is queued
+        ids = get(f'http://127.0.0.1:{port}/').split()
+        jobs = JobQueue(path, None)
+        deadline = time.monotonic() + 15
+        while any(jobs.status(job_id) != DONE for job_id in ids):
+            assert time.monotonic() < deadline, [jobs.status(job_id) for job_id in ids]
+            time.sleep(0.05)
+        process.send_signal(signal.SIGTERM)
+        assert process.wait(timeout=15) == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_create_app_warms_up():
+    assert server.create_app(warm=True) is server.app
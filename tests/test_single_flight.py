@@ -0,0 +1,69 @@
+import threading
+import time
+
+import pytest
+
+from Matrixstore import ResultCache, SingleFlight
+
+
+def run_concurrently(count, target):
+    results, threads = [None] * count, []
+    for i in range(count):
+        def run(i=i):
+            try:
+                results[i] = target()
+            except Exception as e:
+                results[i] = e
+        threads.append(threading.Thread(target=run))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def test_concurrent_callers_share_one_computation():
+    flight = SingleFlight()
+    calls, release = [], threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(5)
+        return 42
+
+    threading.Timer(0.1, release.set).start()
+    results = run_concurrently(5, lambda: flight.do('key', compute))
+    assert len(calls) == 1
+    assert sorted(shared for _, shared in results) == [False, True, True, True, True]
+    assert {value for value, _ in results} == {42}
+    assert flight.coalesced == 4
+    assert flight.in_flight() == 0
+
+
+def test_error_reaches_every_waiter_and_is_not_kept():
+    flight = SingleFlight()
+    release = threading.Event()
+
+    def fail():
+        release.wait(5)
+        raise ValueError('boom')
+
+    threading.Timer(0.1, release.set).start()
+    results = run_concurrently(3, lambda: flight.do('key', fail))
+    assert all(isinstance(result, ValueError) for result in results)
+    assert flight.do('key', lambda: 1) == (1, False)
+
+
+def test_waits_for_a_peer_process_result(tmp_path):
+    path = str(tmp_path / 'results.db')
+    peer, cache = ResultCache(path=path), ResultCache(path=path)
+    assert peer.claim('key', lease=5)
+
+    def publish():
+        time.sleep(0.1)
+        peer.set('key', 'from peer')
+        peer.release('key')
+
+    threading.Thread(target=publish).start()
+    flight = SingleFlight(cache, poll=0.01)
+    assert flight.do('key', lambda: pytest.fail('computed twice')) == ('from peer', True)
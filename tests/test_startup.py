@@ -0,0 +1,78 @@
+import json
+import os
+import subprocess
+import sys
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY = ('numpy', 'sympy')
+IMPORT_BUDGET = 0.15  # seconds; importing sympy alone takes longer than this
+
+
+def cold_import(module, tmp_path, preload=()):
+    # Time an import in a fresh interpreter; preloaded modules are not counted
+    script = textwrap.dedent(f'''
+        import json, sys, time
+        for name in {list(preload)!r}:
+            __import__(name)
+        start = time.perf_counter()
+        __import__({module!r})
+        elapsed = time.perf_counter() - start
+        print(json.dumps({{'seconds': elapsed, 'loaded': [m for m in {HEAVY!r} if m in sys.modules]}}))
+    ''')
+    env = {**os.environ, 'MATRICES_DB': str(tmp_path / 'matrices.db'), 'RESULT_CACHE_DB': '',
+           'JOBS_DB': str(tmp_path / 'jobs.db'), 'PROFILES_DB': ''}
+    output = subprocess.run([sys.executable, '-c', script], cwd=ROOT, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output.splitlines()[-1])
+
+
+@pytest.mark.parametrize('module', ['Matrixcodes', 'Unitconv', 'Matrixbatch', 'Matrixfile', 'Matrixserial'])
+def test_library_imports_are_cheap(module, tmp_path):
+    result = cold_import(module, tmp_path)
+    assert result['loaded'] == []
+    assert result['seconds'] < IMPORT_BUDGET
+
+
+def test_app_import_defers_numpy_and_sympy(tmp_path):
+    # Flask's own import time is outside this project's control
+    result = cold_import('app', tmp_path, preload=['flask'])
+    assert result['loaded'] == []
+    assert result['seconds'] < IMPORT_BUDGET
+
+
+def test_app_import_creates_no_files(tmp_path):
+    script = textwrap.dedent('''
+        import os
+        import app
+        print(os.path.exists(app.app.instance_path) and sorted(os.listdir(app.app.instance_path)))
+    ''')
+    env = {name: value for name, value in os.environ.items() if not name.endswith('_DB')}
+    before = subprocess.run([sys.executable, '-c', 'import os; print(os.path.exists("instance") and '
+                             'sorted(os.listdir("instance")))'], cwd=ROOT, capture_output=True, text=True).stdout
+    after = subprocess.run([sys.executable, '-c', script], cwd=tmp_path, env={**env, 'PYTHONPATH': ROOT},
+                           capture_output=True, text=True, check=True).stdout
+    assert os.listdir(tmp_path) == []
+    assert after == before
+
+
+def test_create_app_migrates_legacy_json(isolated, tmp_path, monkeypatch):
+    import app as server
+
+    legacy = tmp_path / 'matrices.json'
+    legacy.write_text(json.dumps({'A': [[1, 2], [3, 4]]}))
+    monkeypatch.setattr(server, 'MATRICES_FILE', str(legacy))
+    assert server.create_app() is server.app
+    assert isolated.get('A') == [[1, 2], [3, 4]]
+    assert not legacy.exists()
+
+
+def test_lazy_module_replaces_itself():
+    from Matrixcodes import LazyModule
+
+    namespace = {}
+    namespace['js'] = LazyModule('json', namespace, 'js')
+    assert namespace['js'].dumps([1]) == '[1]'
+    assert namespace['js'] is json
@@ -0,0 +1,71 @@
+import json
+import threading
+
+import pytest
+
+from Matrixstore import MatrixStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    return MatrixStore(str(tmp_path / 'matrices.db'))
+
+
+def test_put_get_update_delete(store):
+    assert store.get('A') is None
+    assert store.put('A', [[1, 2], [3, 4]]) >= 1
+    assert store.get('A') == [[1, 2], [3, 4]]
+    assert store.update('B', [[1]]) is None
+    version = store.update('A', [[5]])
+    assert version == store.get_all_with_versions()[1]['A'][0]
+    assert store.get('A') == [[5]]
+    assert store.delete('A')
+    assert not store.delete('A')
+    assert store.get_all() == {}
+
+
+def test_generation_moves_with_every_write(store):
+    start = store.generation()
+    store.put('A', [[1]])
+    store.put('B', [[2]])
+    store.delete('A')
+    assert store.generation() == start + 3
+
+
+def test_recreated_name_does_not_reuse_version(store):
+    first = store.put('A', [[1]])
+    store.delete('A')
+    assert store.put('A', [[1]]) > first
+
+
+def test_writes_are_visible_to_other_instances(tmp_path):
+    path = str(tmp_path / 'matrices.db')
+    writer, reader = MatrixStore(path), MatrixStore(path)
+    writer.put('A', [[1]])
+    assert reader.get('A') == [[1]]
+    assert reader.generation() == writer.generation()
+
+
+def test_concurrent_writers_do_not_lose_updates(store):
+    def write(worker):
+        for i in range(20):
+            store.put(f'{worker}-{i}', [[i]])
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(store.get_all()) == 80
+    assert store.generation() == 80
+
+
+def test_migrate_from_json_runs_once(store, tmp_path):
+    legacy = tmp_path / 'matrices.json'
+    legacy.write_text(json.dumps({'A': [[1, 2]], 'B': [[3]]}))
+    store.put('A', [[9]])
+    assert store.migrate_from_json(str(legacy)) == 1
+    assert store.get('A') == [[9]]
+    assert store.get('B') == [[3]]
+    assert not legacy.exists()
+    assert store.migrate_from_json(str(legacy)) == 0
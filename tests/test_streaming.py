@@ -0,0 +1,40 @@
+import json
+
+
+def lines(response):
+    return [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+
+def test_matrix_result_is_streamed_by_rows(client):
+    payload = {'operation': 'transpose', 'matrixA': [[1, 2, 3], [4, 5, 6]]}
+    response = client.post('/calculate?stream=1', json=payload)
+    assert response.mimetype == 'application/x-ndjson'
+    expected = [{'shape': [3, 2]}, [1.0, 4.0], [2.0, 5.0], [3.0, 6.0], {'done': True}]
+    assert lines(response) == expected
+    # A repeat is answered from the cache in the same form
+    cached = client.post('/calculate', json=payload, headers={'Accept': 'application/x-ndjson'})
+    assert lines(cached) == expected
+    assert client.post('/calculate', json=payload).get_json()['result'] == [[1.0, 4.0], [2.0, 5.0], [3.0, 6.0]]
+
+
+def test_large_streamed_result_is_not_cached(client, monkeypatch):
+    import app as server
+
+    monkeypatch.setattr(server, 'STREAM_CACHE_MAX_ELEMENTS', 5)
+    payload = {'operation': 'transpose', 'matrixA': [[7, 8, 9], [1, 2, 3]]}
+    expected = [{'shape': [3, 2]}, [7.0, 1.0], [8.0, 2.0], [9.0, 3.0], {'done': True}]
+    assert lines(client.post('/calculate?stream=1', json=payload)) == expected
+    misses = server.result_cache.misses
+    # The repeat finds nothing cached and computes the result again
+    assert lines(client.post('/calculate?stream=1', json=payload)) == expected
+    assert server.result_cache.misses > misses
+
+
+def test_scalar_result_is_one_line(client):
+    response = client.post('/calculate?stream=1', json={'operation': 'determinant', 'matrixA': [[3, 1], [1, 3]]})
+    assert lines(response) == [{'result': 8.0}]
+
+
+def test_error_is_reported_before_streaming(client):
+    response = client.post('/calculate?stream=1', json={'operation': 'inverse', 'matrixA': [[1, 2], [2, 4]]})
+    assert response.status_code == 400
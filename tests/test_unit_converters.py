@@ -0,0 +1,40 @@
+import math
+
+import pytest
+
+import Unitconv
+from Unitconv import conversion_form, convert, get_converter
+
+
+@pytest.mark.parametrize('category', sorted(Unitconv.categories))
+def test_converters_match_the_unit_tables(category):
+    units = Unitconv.categories[category]['units']
+    for source, (to_standard, _) in units.items():
+        for target, (_, from_standard) in units.items():
+            converter = get_converter(source, target)
+            for value in (1.0, 37.5, -12.25):
+                expected = from_standard(to_standard(value))
+                assert converter(value) == pytest.approx(expected, rel=1e-12, abs=1e-9), (source, target)
+
+
+def test_converters_are_cached_and_case_insensitive():
+    assert get_converter('kilometer', 'mile') is get_converter('kilometer', 'mile')
+    assert convert(5, 'KiloMeter', 'METER') == 5000
+    assert conversion_form('celsius', 'fahrenheit') == ('affine', 1.8, pytest.approx(32))
+    assert conversion_form('mpg (us)', 'liter/100km')[0] == 'reciprocal'
+
+
+def test_temperature_and_fuel_consumption():
+    assert convert(100, 'celsius', 'fahrenheit') == pytest.approx(212)
+    assert convert(0, 'kelvin', 'celsius') == pytest.approx(-273.15)
+    assert convert(convert(30, 'mpg (us)', 'liter/100km'), 'liter/100km', 'mpg (us)') == pytest.approx(30)
+    with pytest.raises(ZeroDivisionError):
+        convert(0, 'mpg (us)', 'liter/100km')
+
+
+def test_unknown_or_mismatched_units():
+    with pytest.raises(ValueError, match='same category'):
+        convert(1, 'meter', 'kilogram')
+    with pytest.raises(ValueError):
+        convert(1, 'furlong-ish', 'meter')
+    assert math.isclose(convert(1, 'meter', 'meter'), 1)
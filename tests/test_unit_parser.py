@@ -0,0 +1,60 @@
+from fractions import Fraction
+
+import pytest
+
+from Unitconv import DIMENSIONLESS, category_dimensions, convert, format_dimensions, parse_unit
+
+
+@pytest.mark.parametrize('text, factor, category', [
+    ('km/h', Fraction(5, 18), 'speed'),
+    ('kilometer/hour', Fraction(5, 18), 'speed'),
+    ('kWh/day', Fraction(125, 3), 'power'),
+    ('N·m', 1, 'energy'),
+    ('newton-meter', 1, 'energy'),
+    ('kg·m/s^2', 1, 'force'),
+    ('kg m s**-2', 1, 'force'),
+    ('m²', 1, 'area'),
+    ('(cm)^3', Fraction(1, 10 ** 6), 'volume'),
+    ('KiB', 1024, 'digital storage'),
+    ('ms', Fraction(1, 1000), 'time'),
+])
+def test_parse_into_factor_and_dimensions(text, factor, category):
+    assert parse_unit(text) == (factor, category_dimensions[category])
+
+
+def test_compound_conversions():
+    assert convert(36, 'kilometer/hour', 'meter/second') == pytest.approx(10)
+    assert convert(24, 'kWh/day', 'watt') == pytest.approx(1000)
+    assert convert(1, 'N·m', 'joule') == pytest.approx(1)
+    assert convert(60, 'mph', 'km/h') == pytest.approx(96.56064)
+    assert parse_unit('m/m')[1] == DIMENSIONLESS
+
+
+def test_fuel_consumption_expressions():
+    # Volume per distance converts directly; distance per volume is its reciprocal
+    assert convert(10, 'L/100km', 'mpg (us)') == pytest.approx(23.5214583)
+    assert convert(23.5214583, 'mpg (us)', 'L/100km') == pytest.approx(10)
+    assert convert(10, 'L/100km', 'km/L') == pytest.approx(10)
+    assert convert(25, 'mile/us gallon', 'mpg (us)') == pytest.approx(25)
+    assert convert(4, 'L/100km', 'liter/100km') == pytest.approx(4)
+    with pytest.raises(ValueError, match='not in the same category'):
+        convert(1, 'km', 'mpg (us)')
+
+
+def test_incompatible_dimensions_are_named():
+    with pytest.raises(ValueError, match='different dimensions: length and time'):
+        convert(1, 'm', 's')
+    assert format_dimensions(category_dimensions['force']) == format_dimensions(parse_unit('kg*m/s^2')[1])
+
+
+@pytest.mark.parametrize('text', ['', 'xyz', 'm/', 'm^', 'm^1.5', '(m', 'km)'])
+def test_unrecognized_units(text):
+    with pytest.raises(ValueError):
+        parse_unit(text)
+
+
+def test_parsed_units_are_memoized():
+    parse_unit.cache_clear()
+    parse_unit('MJ/h')
+    parse_unit('MJ/h')
+    assert parse_unit.cache_info().hits >= 1
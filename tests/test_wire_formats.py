@@ -0,0 +1,63 @@
+import io
+
+import numpy as np
+import pytest
+
+NPY = 'application/x-npy'
+MSGPACK = 'application/msgpack'
+
+
+def npy_body(array):
+    buffer = io.BytesIO()
+    np.save(buffer, np.asarray(array))
+    return buffer.getvalue()
+
+
+def test_npy_request_and_response(client):
+    response = client.post('/calculate?operation=transpose', data=npy_body([[1.5, 2.0], [3.0, 4.0]]),
+                           content_type=NPY, headers={'Accept': NPY})
+    assert response.mimetype == NPY
+    np.testing.assert_array_equal(np.load(io.BytesIO(response.data)), [[1.5, 3.0], [2.0, 4.0]])
+
+
+def test_npy_rejects_symbolic_results(client):
+    response = client.post('/calculate', json={'operation': 'transpose', 'matrixA': [['x', 1]]},
+                           headers={'Accept': NPY})
+    assert response.status_code == 406
+
+
+def test_msgpack_typed_arrays(client):
+    msgpack = pytest.importorskip('msgpack')
+    array = np.array([[1, 2], [3, 4]], dtype='<i8')
+    body = msgpack.packb({'operation': 'add', 'matrixA': {'dtype': '<i8', 'shape': [2, 2], 'data': array.tobytes()},
+                          'matrixB': [[1, 1], [1, 1]]})
+    response = client.post('/calculate', data=body, content_type=MSGPACK, headers={'Accept': MSGPACK})
+    result = msgpack.unpackb(response.data)['result']
+    decoded = np.frombuffer(result['data'], dtype=result['dtype']).reshape(result['shape'])
+    np.testing.assert_array_equal(decoded, [[2, 3], [4, 5]])
+
+
+def test_single_matrix_as_npy(client):
+    client.post('/matrices', json={'name': 'Wire', 'matrix': [[1.0, 2.0]]})
+    response = client.get('/matrices/Wire', headers={'Accept': NPY})
+    np.testing.assert_array_equal(np.load(io.BytesIO(response.data)), [[1.0, 2.0]])
+    assert response.headers['ETag'].endswith('-x-npy"')
+
+
+@pytest.mark.parametrize('query', ['', '?limit=10'])
+def test_listings_are_not_offered_as_npy(client, query):
+    assert client.get(f'/matrices{query}', headers={'Accept': NPY}).status_code == 406
+    # With a fallback the listing is JSON, and its ETag is the JSON one
+    response = client.get(f'/matrices{query}', headers={'Accept': f'{NPY}, */*;q=0.1'})
+    assert response.is_json
+    assert response.headers['ETag'] == client.get(f'/matrices{query}').headers['ETag']
+    assert '-x-npy' not in response.headers['ETag']
+
+
+def test_listing_as_msgpack(client):
+    msgpack = pytest.importorskip('msgpack')
+    client.post('/matrices', json={'name': 'WirePacked', 'matrix': [[1, 2]]})
+    response = client.get('/matrices?limit=1000', headers={'Accept': MSGPACK})
+    assert response.mimetype == MSGPACK
+    assert 'WirePacked' in [entry['name'] for entry in msgpack.unpackb(response.data)['matrices']]
+    assert response.headers['ETag'].endswith('-msgpack"')